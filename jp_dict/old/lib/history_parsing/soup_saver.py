@@ -1,7 +1,6 @@
 from __future__ import annotations
 import sys
 import pickle
-import requests
 from bs4 import BeautifulSoup
 from logger import logger
 from common_utils.file_utils import file_exists, dir_exists, make_dir
@@ -9,6 +8,7 @@ from common_utils.check_utils import check_file_exists
 from common_utils.adv_file_utils import get_next_dump_path
 from .cache import SoupCacheHandler
 from .history_parser import HistoryParser
+from ....util.http_utils import get_default_http_client
 
 class SaveItem:
     def __init__(self, save_path: str):
@@ -113,9 +113,9 @@ class SoupSaveItem(SaveItem):
         return super().load()
 
     def get_soup(self) -> (int, BeautifulSoup):
-        response = requests.get(self.url)
-        soup = BeautifulSoup(response.text, 'html.parser') if response.status_code == 200 else None
-        return response.status_code, soup
+        response = get_default_http_client().get(self.url)
+        soup = BeautifulSoup(response.data, 'html.parser') if response.status == 200 else None
+        return response.status, soup
 
     def save(self, soup: BeautifulSoup, overwrite: bool=True):
         super().save(item=soup, overwrite=overwrite)
@@ -1,10 +1,11 @@
-import requests, pickle
+import pickle
 from bs4 import BeautifulSoup
 from logger import logger
 from common_utils.file_utils import file_exists
 from ..lib.history_parsing.cache import Cache, SearchWordCacheHandler
 from ..lib.history_parsing.history_parser import HistoryParser
 from qtpy.QtCore import Signal
+from ...util.http_utils import get_default_http_client
 
 class WordListUpdater:
     def __init__(self, history_json_path: str, save_file_path: str):
@@ -41,16 +42,16 @@ class WordListUpdater:
 
         found, duplicate = self.search_word_cache_handler.check_url(url=url, time_usec=time_usec)
         if not found:
-            response = requests.get(url)
-            if response.status_code != 200:
+            response = get_default_http_client().get(url)
+            if response.status != 200:
                 if message_sig is None:
-                    logger.warning(f"Encountered status_code: {response.status_code}")
+                    logger.warning(f"Encountered status_code: {response.status}")
                     logger.warning(f"Skipping {url}")
                 else:
-                    message_sig.emit(f"\nEncountered status_code: {response.status_code}")
+                    message_sig.emit(f"\nEncountered status_code: {response.status}")
                     message_sig.emit(f"\nSkipping {url}")
                 return self.is_done()
-            soup = BeautifulSoup(response.text, 'html.parser')
+            soup = BeautifulSoup(response.data, 'html.parser')
             search_word = soup.title.text.split('-')[0][:-1]
             if message_sig is None:
                 logger.blue(f"{self.current_index}: {search_word}")
@@ -1,8 +1,9 @@
 from __future__ import annotations
-from typing import List
+from typing import List, Set, Tuple, cast
 import os
 from common_utils.base.basic import BasicLoadableObject, BasicLoadableHandler, \
     BasicHandler
+from ..util.char_lists import convert_katakana2hiragana
 
 class AnkiExportTextDatum(BasicLoadableObject['AnkiExportTextDatum']):
     def __init__(self, writing: str, reading: str, definition: str):
@@ -91,6 +92,61 @@ class AnkiExportTextData(
         
         return False
 
+    def to_index(self, normalize_kana: bool=False) -> AnkiExportTextIndex:
+        index = AnkiExportTextIndex(normalize_kana=normalize_kana)
+        index.add_data(self)
+        return index
+
+class AnkiExportTextIndex:
+    """
+    Hash sets of the writings and readings in one or more Anki exports, for membership checks
+    that don't scan every exported note.
+    With normalize_kana=True, katakana is converted to hiragana on both sides of the comparison,
+    so e.g. a note written as カメラ also matches かめら.
+    """
+    def __init__(self, normalize_kana: bool=False):
+        self.normalize_kana = normalize_kana
+        self.writings = cast(Set[str], set())
+        self.readings = cast(Set[str], set())
+        self.writing_readings = cast(Set[Tuple[str, str]], set())
+
+    def __len__(self) -> int:
+        return len(self.writing_readings)
+
+    def _normalize(self, text: str) -> str:
+        return convert_katakana2hiragana(text) if self.normalize_kana else text
+
+    def add(self, datum: AnkiExportTextDatum):
+        writing, reading = self._normalize(datum.writing), self._normalize(datum.reading)
+        self.writings.add(writing)
+        self.readings.add(reading)
+        self.writing_readings.add((writing, reading))
+
+    def add_data(self, data: AnkiExportTextData):
+        for datum in data:
+            self.add(datum)
+
+    @classmethod
+    def from_paths(cls, paths: List[str], normalize_kana: bool=False) -> AnkiExportTextIndex:
+        """
+        One index over every export in paths. Each export is parsed once.
+        """
+        index = AnkiExportTextIndex(normalize_kana=normalize_kana)
+        for path in paths:
+            index.add_data(AnkiExportTextData.parse_from_txt(path))
+        return index
+
+    def contains(self, writing: str=None, reading: str=None) -> bool:
+        """
+        Same as AnkiExportTextData.contains: When both writing and reading are given, they have to belong to the same note.
+        """
+        if reading is None:
+            return self._normalize(writing) in self.writings
+        elif writing is None:
+            return self._normalize(reading) in self.readings
+        else:
+            return (self._normalize(writing), self._normalize(reading)) in self.writing_readings
+
 def parse_kanji_anki_export(path: str, field_idx: int) -> List[str]:
     kanji_list = []
     if not os.path.isfile(path):
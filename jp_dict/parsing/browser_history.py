@@ -1,7 +1,16 @@
 from __future__ import annotations
-from typing import List, Any, Dict, cast
+from typing import List, Any, Dict, Iterable, Iterator, cast
+import heapq
+import json
+from array import array
+from operator import attrgetter
+import numpy as np
 from tqdm import tqdm
 from common_utils.base.basic import BasicLoadableObject, BasicLoadableHandler, BasicHandler
+from common_utils.file_utils import file_exists
+from logger import logger
+from ..util.json_utils import iter_json_array_items
+from ..util.handler_utils import IdIndexedHandlerMixin
 
 class BrowserHistoryItem(BasicLoadableObject['BrowserHistoryItem']):
     def __init__(
@@ -75,16 +84,7 @@ class BrowserHistoryItemList(
     
     def search_by_url_base_and_group_by_url(self, url_base: str) -> CommonBrowserHistoryItemGroupList:
         relevant_items = self.search_by_url_base(url_base)
-        common_url_dict = cast(Dict[str, List[BrowserHistoryItem]], {})
-        for item in relevant_items:
-            if item.url not in common_url_dict:
-                common_url_dict[item.url] = [item]
-            else:
-                common_url_dict[item.url].append(item)
-        groups = CommonBrowserHistoryItemGroupList()
-        for title, item_list in common_url_dict.items():
-            groups.append(CommonBrowserHistoryItemGroup.from_list(item_list=item_list, id=len(groups)))
-        return groups
+        return CommonBrowserHistoryItemGroupList.group_by_url(relevant_items)
 
 class BrowserHistory(BasicLoadableObject['BrowserHistory']):
     def __init__(self, browser_history_item_list: BrowserHistoryItemList=None):
@@ -102,17 +102,34 @@ class BrowserHistory(BasicLoadableObject['BrowserHistory']):
             browser_history_item_list=BrowserHistoryItemList.from_dict_list(item_dict['Browser History'])
         )
 
+    @classmethod
+    def iter_items_from_path(cls, path: str, url_base: str=None) -> Iterator[BrowserHistoryItem]:
+        """
+        Reads the items of a BrowserHistory.json file one at a time instead of loading the whole file.
+        If url_base is given, only items whose url starts with url_base are yielded.
+        Example: BrowserHistory.iter_items_from_path(path, url_base='https://jisho.org/search/')
+        """
+        for item_dict in iter_json_array_items(path, key='Browser History'):
+            if url_base is None or item_dict['url'].startswith(url_base):
+                yield BrowserHistoryItem.from_dict(item_dict)
+
+    @classmethod
+    def load_from_path_streaming(cls, path: str, url_base: str=None) -> BrowserHistory:
+        return BrowserHistory(
+            browser_history_item_list=BrowserHistoryItemList(list(cls.iter_items_from_path(path, url_base=url_base)))
+        )
+
     @classmethod
     def combine(cls, browser_history_list: List[BrowserHistory], show_pbar: bool=True) -> BrowserHistory:
         result = BrowserHistory()
-        time_usec_list = []
+        time_usec_set = set()
         combine_pbar = tqdm(total=len(browser_history_list), unit='histories') if show_pbar else None
         if combine_pbar is not None:
             combine_pbar.set_description('Combining Histories')
         for browser_history in browser_history_list:
             for item in browser_history.browser_history_item_list:
-                if item.time_usec not in time_usec_list:
-                    time_usec_list.append(item.time_usec)
+                if item.time_usec not in time_usec_set:
+                    time_usec_set.add(item.time_usec)
                     result.browser_history_item_list.append(item)
             if combine_pbar is not None:
                 combine_pbar.update()
@@ -120,6 +137,50 @@ class BrowserHistory(BasicLoadableObject['BrowserHistory']):
             combine_pbar.close()
         return result
 
+    @classmethod
+    def merge(cls, browser_history_list: List[BrowserHistory], show_pbar: bool=True) -> BrowserHistory:
+        """
+        Equivalent to BrowserHistory.combine followed by sorting by time_usec,
+        but done as a k-way merge of the individual histories.
+        Each history is sorted by time_usec first. Takeout exports are already
+        ordered (newest first), so this is close to linear.
+        When the same time_usec appears more than once, the item that combine would
+        have kept (earliest history, then earliest position) is kept.
+        """
+        key = attrgetter('time_usec')
+        sorted_item_lists = []
+        merge_pbar = tqdm(total=len(browser_history_list), unit='histories') if show_pbar else None
+        if merge_pbar is not None:
+            merge_pbar.set_description('Sorting Histories')
+        for browser_history in browser_history_list:
+            sorted_item_lists.append(sorted(browser_history.browser_history_item_list, key=key))
+            if merge_pbar is not None:
+                merge_pbar.update()
+        if merge_pbar is not None:
+            merge_pbar.close()
+
+        result = BrowserHistory()
+        history_items = result.browser_history_item_list.history_items
+        last_time_usec = None
+        for item in heapq.merge(*sorted_item_lists, key=key):
+            if item.time_usec != last_time_usec:
+                history_items.append(item)
+                last_time_usec = item.time_usec
+        return result
+
+    @classmethod
+    def iter_merged_items(cls, item_iterables: List[Iterable[BrowserHistoryItem]]) -> Iterator[BrowserHistoryItem]:
+        """
+        Streaming version of BrowserHistory.merge for iterables that are already sorted by time_usec,
+        such as BrowserHistory.iter_items_from_path of histories saved in that order.
+        Ties on time_usec are resolved the same way as merge, in the order of item_iterables.
+        """
+        last_time_usec = None
+        for item in heapq.merge(*item_iterables, key=attrgetter('time_usec')):
+            if item.time_usec != last_time_usec:
+                yield item
+                last_time_usec = item.time_usec
+
 class BrowserHistoryHandler(
     BasicLoadableHandler['BrowserHistoryHandler', 'BrowserHistory'],
     BasicHandler['BrowserHistoryHandler', 'BrowserHistory']
@@ -133,8 +194,11 @@ class BrowserHistoryHandler(
         return BrowserHistoryHandler([BrowserHistory.from_dict(item_dict) for item_dict in dict_list])
 
     @classmethod
-    def load_from_path_list(cls, path_list: List[str]) -> BrowserHistoryHandler:
-        return BrowserHistoryHandler([BrowserHistory.load_from_path(path) for path in path_list])
+    def load_from_path_list(cls, path_list: List[str], streaming: bool=False, url_base: str=None) -> BrowserHistoryHandler:
+        if streaming or url_base is not None:
+            return BrowserHistoryHandler([BrowserHistory.load_from_path_streaming(path, url_base=url_base) for path in path_list])
+        else:
+            return BrowserHistoryHandler([BrowserHistory.load_from_path(path) for path in path_list])
 
 class CommonBrowserHistoryItemGroup(BasicLoadableObject['CommonBrowserHistoryItemGroup']):
     def __init__(
@@ -178,6 +242,20 @@ class CommonBrowserHistoryItemGroup(BasicLoadableObject['CommonBrowserHistoryIte
             time_usec.append(item.time_usec)
             page_transition.append(item.page_transition)
             favicon_url.append(item.favicon_url)
+        return cls.from_columns(
+            title=title, url=url, client_id=client_id, time_usec=time_usec,
+            page_transition=page_transition, favicon_url=favicon_url,
+            id=id
+        )
+
+    @classmethod
+    def from_columns(
+        cls, title: List[str], url: List[str], client_id: List[str], time_usec: List[int],
+        page_transition: List[str], favicon_url: List[str], id: int=None
+    ) -> CommonBrowserHistoryItemGroup:
+        """
+        Same as from_list, but takes one list per attribute instead of a list of items.
+        """
         if len(list(set(title))) == 1:
             title = title[0]
         assert len(list(set(url))) == 1
@@ -226,6 +304,7 @@ class CommonBrowserHistoryItemGroup(BasicLoadableObject['CommonBrowserHistoryIte
         return len(self.time_usec)
 
 class CommonBrowserHistoryItemGroupList(
+    IdIndexedHandlerMixin,
     BasicLoadableHandler['CommonBrowserHistoryItemGroupList', 'CommonBrowserHistoryItemGroup'],
     BasicHandler['CommonBrowserHistoryItemGroupList', 'CommonBrowserHistoryItemGroup']
 ):
@@ -235,4 +314,444 @@ class CommonBrowserHistoryItemGroupList(
     
     @classmethod
     def from_dict_list(cls, dict_list: List[dict]) -> CommonBrowserHistoryItemGroupList:
-        return CommonBrowserHistoryItemGroupList([CommonBrowserHistoryItemGroup.from_dict(item_dict) for item_dict in dict_list])
\ No newline at end of file
+        return CommonBrowserHistoryItemGroupList([CommonBrowserHistoryItemGroup.from_dict(item_dict) for item_dict in dict_list])
+
+    @classmethod
+    def group_by_url(cls, items: Iterable[BrowserHistoryItem]) -> CommonBrowserHistoryItemGroupList:
+        """
+        Groups items by url. Groups are ordered by the first appearance of each url.
+        items can be any iterable, such as BrowserHistory.iter_items_from_path.
+        """
+        builder = CommonBrowserHistoryItemGroupBuilder()
+        for item in items:
+            builder.add_item(item)
+        return builder.build()
+
+class _UrlGroupColumns:
+    """
+    Per-url state of CommonBrowserHistoryItemGroupBuilder.
+    A collapsible attribute is kept as a single value until a different value arrives,
+    at which point it is expanded into a list.
+    """
+    __slots__ = [
+        'id', 'url', 'time_usec', 'last_time_usec', 'is_sorted',
+        'title', 'title_list', 'client_id', 'client_id_list',
+        'page_transition', 'page_transition_list', 'favicon_url', 'favicon_url_list'
+    ]
+
+    def __init__(self, id: int, url: str, title: str, client_id: str, time_usec: int, page_transition: str, favicon_url: str):
+        self.id = id
+        self.url = url
+        self.time_usec = [time_usec]
+        self.last_time_usec = time_usec
+        self.is_sorted = True
+        self.title, self.title_list = title, None
+        self.client_id, self.client_id_list = client_id, None
+        self.page_transition, self.page_transition_list = page_transition, None
+        self.favicon_url, self.favicon_url_list = favicon_url, None
+
+    def add(self, title: str, client_id: str, time_usec: int, page_transition: str, favicon_url: str):
+        count = len(self.time_usec)
+        if time_usec > self.last_time_usec:
+            self.last_time_usec = time_usec
+        elif time_usec == self.last_time_usec:
+            raise AssertionError(f'Found duplicate time_usec in group of {self.url}: {time_usec}')
+        else:
+            # Duplicates can only be detected while appending when the input is sorted by time_usec.
+            self.is_sorted = False
+        self.time_usec.append(time_usec)
+
+        if self.title_list is not None:
+            self.title_list.append(title)
+        elif title != self.title:
+            self.title_list = [self.title] * count + [title]
+        if self.client_id_list is not None:
+            self.client_id_list.append(client_id)
+        elif client_id != self.client_id:
+            self.client_id_list = [self.client_id] * count + [client_id]
+        if self.page_transition_list is not None:
+            self.page_transition_list.append(page_transition)
+        elif page_transition != self.page_transition:
+            self.page_transition_list = [self.page_transition] * count + [page_transition]
+        if self.favicon_url_list is not None:
+            self.favicon_url_list.append(favicon_url)
+        elif favicon_url != self.favicon_url:
+            self.favicon_url_list = [self.favicon_url] * count + [favicon_url]
+
+    def build(self) -> CommonBrowserHistoryItemGroup:
+        if not self.is_sorted:
+            assert len(set(self.time_usec)) == len(self.time_usec)
+        return CommonBrowserHistoryItemGroup(
+            title=self.title_list if self.title_list is not None else self.title,
+            url=self.url,
+            client_id=self.client_id_list if self.client_id_list is not None else self.client_id,
+            time_usec=self.time_usec,
+            page_transition=self.page_transition_list if self.page_transition_list is not None else self.page_transition,
+            favicon_url=self.favicon_url_list if self.favicon_url_list is not None else self.favicon_url,
+            id=self.id
+        )
+
+class CommonBrowserHistoryItemGroupBuilder:
+    """
+    Groups history rows by url in a single pass.
+    Collapsing of identical values and duplicate time_usec detection are done while the rows are added,
+    so no per-group item lists or sets need to be built afterwards.
+    The result is the same as CommonBrowserHistoryItemGroup.from_list applied to each url group.
+    Ids are assigned in order of first appearance, like search_by_url_base_and_group_by_url.
+    """
+    def __init__(self, url_base: str=None):
+        self.url_base = url_base
+        self._groups = cast(Dict[str, _UrlGroupColumns], {})
+
+    def __len__(self) -> int:
+        return len(self._groups)
+
+    def add(
+        self, title: str, url: str, client_id: str, time_usec: int,
+        page_transition: str=None, favicon_url: str=None
+    ):
+        if self.url_base is not None and not url.startswith(self.url_base):
+            return
+        group = self._groups.get(url)
+        if group is None:
+            self._groups[url] = _UrlGroupColumns(
+                id=len(self._groups), url=url, title=title, client_id=client_id, time_usec=time_usec,
+                page_transition=page_transition, favicon_url=favicon_url
+            )
+        else:
+            group.add(
+                title=title, client_id=client_id, time_usec=time_usec,
+                page_transition=page_transition, favicon_url=favicon_url
+            )
+
+    def add_item(self, item: BrowserHistoryItem):
+        self.add(
+            title=item.title, url=item.url, client_id=item.client_id, time_usec=item.time_usec,
+            page_transition=item.page_transition, favicon_url=item.favicon_url
+        )
+
+    def add_dict(self, item_dict: dict):
+        self.add(
+            title=item_dict['title'], url=item_dict['url'], client_id=item_dict['client_id'],
+            time_usec=item_dict['time_usec'],
+            page_transition=item_dict.get('page_transition'), favicon_url=item_dict.get('favicon_url')
+        )
+
+    def build(self, sort_by_item_count: bool=False) -> CommonBrowserHistoryItemGroupList:
+        """
+        sort_by_item_count: Same order as CommonBrowserHistoryItemGroupList.sort(attr_name='item_count', reverse=True).
+        """
+        group_columns = list(self._groups.values())
+        if sort_by_item_count:
+            group_columns.sort(key=lambda columns: len(columns.time_usec), reverse=True)
+        return CommonBrowserHistoryItemGroupList([columns.build() for columns in group_columns])
+
+    @classmethod
+    def from_history_path(cls, path: str, url_base: str=None) -> CommonBrowserHistoryItemGroupBuilder:
+        """
+        Streams a BrowserHistory.json file (or a saved combined history) into the builder
+        without creating BrowserHistoryItem objects.
+        """
+        builder = CommonBrowserHistoryItemGroupBuilder(url_base=url_base)
+        for item_dict in iter_json_array_items(path, key='Browser History'):
+            builder.add_dict(item_dict)
+        return builder
+
+class _StringColumn:
+    """
+    Interned string column.
+    Each row holds an integer code into values. None is stored as -1.
+    """
+    def __init__(self, codes: np.ndarray=None, values: List[str]=None):
+        self.codes = codes if codes is not None else np.empty(0, dtype=np.int32)
+        self.values = values if values is not None else []
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    @classmethod
+    def builder(cls) -> _StringColumnBuilder:
+        return _StringColumnBuilder()
+
+    def decode(self, idx: int) -> str:
+        code = self.codes[idx]
+        return self.values[code] if code >= 0 else None
+
+    def decode_all(self) -> List[str]:
+        values = self.values + [None]
+        return [values[code] for code in self.codes.tolist()]
+
+    def take(self, idx: np.ndarray) -> _StringColumn:
+        return _StringColumn(codes=self.codes[idx], values=self.values)
+
+    def match_mask(self, predicate) -> np.ndarray:
+        # The predicate is evaluated once per unique value instead of once per row.
+        # The trailing False is what code -1 (None) maps to.
+        value_mask = np.array([bool(predicate(value)) for value in self.values] + [False], dtype=bool)
+        return value_mask[self.codes]
+
+    def concatenate(self, other: _StringColumn) -> _StringColumn:
+        builder = _StringColumnBuilder(values=list(self.values))
+        remapped = np.array([builder.code(value) for value in other.values] + [-1], dtype=np.int32)
+        return _StringColumn(
+            codes=np.concatenate([self.codes, remapped[other.codes]]).astype(np.int32),
+            values=builder.values
+        )
+
+class _StringColumnBuilder:
+    def __init__(self, values: List[str]=None):
+        self.values = values if values is not None else []
+        self._lookup = {value: code for code, value in enumerate(self.values)}
+        self._codes = array('i')
+
+    def code(self, value: str) -> int:
+        if value is None:
+            return -1
+        code = self._lookup.get(value)
+        if code is None:
+            code = len(self.values)
+            self._lookup[value] = code
+            self.values.append(value)
+        return code
+
+    def append(self, value: str):
+        self._codes.append(self.code(value))
+
+    def build(self) -> _StringColumn:
+        return _StringColumn(codes=np.array(self._codes, dtype=np.int32), values=self.values)
+
+class ColumnarBrowserHistoryItemList:
+    """
+    Array-backed alternative to BrowserHistoryItemList.
+    time_usec is held as an int64 array and the string attributes are interned into integer codes,
+    so a row costs a few dozen bytes instead of a full BrowserHistoryItem.
+    Filters are evaluated once per unique string and then applied to the whole column at once.
+    BrowserHistoryItem objects are only created when rows are accessed individually.
+    """
+    string_attr_names = ['title', 'url', 'client_id', 'page_transition', 'favicon_url']
+
+    def __init__(
+        self, time_usec: np.ndarray=None,
+        title: _StringColumn=None, url: _StringColumn=None, client_id: _StringColumn=None,
+        page_transition: _StringColumn=None, favicon_url: _StringColumn=None
+    ):
+        self.time_usec = time_usec if time_usec is not None else np.empty(0, dtype=np.int64)
+        self.title = title if title is not None else _StringColumn()
+        self.url = url if url is not None else _StringColumn()
+        self.client_id = client_id if client_id is not None else _StringColumn()
+        self.page_transition = page_transition if page_transition is not None else _StringColumn()
+        self.favicon_url = favicon_url if favicon_url is not None else _StringColumn()
+
+    def __len__(self) -> int:
+        return len(self.time_usec)
+
+    def __iter__(self) -> Iterator[BrowserHistoryItem]:
+        for i in range(len(self)):
+            yield self._get_item(i)
+
+    def __getitem__(self, idx):
+        if isinstance(idx, (int, np.integer)):
+            if idx < 0:
+                idx += len(self)
+            if idx < 0 or idx >= len(self):
+                raise IndexError(f'Index out of range: {idx}')
+            return self._get_item(idx)
+        else:
+            return self.take(idx)
+
+    def __add__(self, other: ColumnarBrowserHistoryItemList) -> ColumnarBrowserHistoryItemList:
+        return ColumnarBrowserHistoryItemList(
+            time_usec=np.concatenate([self.time_usec, other.time_usec]),
+            **{
+                attr_name: getattr(self, attr_name).concatenate(getattr(other, attr_name))
+                for attr_name in self.string_attr_names
+            }
+        )
+
+    def _get_item(self, idx: int) -> BrowserHistoryItem:
+        return BrowserHistoryItem(
+            title=self.title.decode(idx),
+            url=self.url.decode(idx),
+            client_id=self.client_id.decode(idx),
+            time_usec=int(self.time_usec[idx]),
+            page_transition=self.page_transition.decode(idx),
+            favicon_url=self.favicon_url.decode(idx)
+        )
+
+    def take(self, idx: np.ndarray) -> ColumnarBrowserHistoryItemList:
+        """
+        Returns the rows selected by a slice, a boolean mask or an array of indices.
+        """
+        return ColumnarBrowserHistoryItemList(
+            time_usec=self.time_usec[idx],
+            **{attr_name: getattr(self, attr_name).take(idx) for attr_name in self.string_attr_names}
+        )
+
+    def append(self, item: BrowserHistoryItem):
+        # Copies every column. Prefer from_items when adding many items.
+        other = ColumnarBrowserHistoryItemList.from_items([item])
+        combined = self + other
+        self.__dict__.update(combined.__dict__)
+
+    def extend(self, items: Iterable[BrowserHistoryItem]):
+        combined = self + ColumnarBrowserHistoryItemList.from_items(items)
+        self.__dict__.update(combined.__dict__)
+
+    @property
+    def history_items(self) -> List[BrowserHistoryItem]:
+        return list(self)
+
+    def copy(self) -> ColumnarBrowserHistoryItemList:
+        return self.take(np.arange(len(self)))
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, (ColumnarBrowserHistoryItemList, BrowserHistoryItemList)):
+            return self.to_dict_list() == other.to_dict_list()
+        return NotImplemented
+
+    @classmethod
+    def from_dict_iter(cls, dict_iter: Iterable[dict], url_base: str=None) -> ColumnarBrowserHistoryItemList:
+        time_usec = array('q')
+        builders = {attr_name: _StringColumnBuilder() for attr_name in cls.string_attr_names}
+        for item_dict in dict_iter:
+            if url_base is not None and not item_dict['url'].startswith(url_base):
+                continue
+            time_usec.append(item_dict['time_usec'])
+            for attr_name, builder in builders.items():
+                builder.append(item_dict.get(attr_name))
+        return ColumnarBrowserHistoryItemList(
+            time_usec=np.array(time_usec, dtype=np.int64),
+            **{attr_name: builder.build() for attr_name, builder in builders.items()}
+        )
+
+    @classmethod
+    def from_dict_list(cls, dict_list: List[dict]) -> ColumnarBrowserHistoryItemList:
+        return cls.from_dict_iter(dict_list)
+
+    @classmethod
+    def from_items(cls, items: Iterable[BrowserHistoryItem]) -> ColumnarBrowserHistoryItemList:
+        return cls.from_dict_iter(item.to_dict() for item in items)
+
+    @classmethod
+    def from_item_list(cls, item_list: BrowserHistoryItemList) -> ColumnarBrowserHistoryItemList:
+        return cls.from_items(item_list)
+
+    @classmethod
+    def from_history_path(cls, path: str, url_base: str=None) -> ColumnarBrowserHistoryItemList:
+        """
+        Streams a BrowserHistory.json file (or a saved combined history) directly into columns.
+        """
+        return cls.from_dict_iter(iter_json_array_items(path, key='Browser History'), url_base=url_base)
+
+    def to_item_list(self) -> BrowserHistoryItemList:
+        return BrowserHistoryItemList(list(self))
+
+    def to_dict_list(self) -> List[dict]:
+        return [item.to_dict() for item in self]
+
+    def save_to_path(self, save_path: str, overwrite: bool=False):
+        if file_exists(save_path) and not overwrite:
+            logger.error(f'File already exists at save_path: {save_path}')
+            raise Exception
+        json.dump(self.to_dict_list(), open(save_path, 'w'), indent=2, ensure_ascii=False)
+
+    @classmethod
+    def load_from_path(cls, json_path: str) -> ColumnarBrowserHistoryItemList:
+        return cls.from_dict_list(json.load(open(json_path, 'r')))
+
+    def sort(self, attr_name: str, reverse: bool=False):
+        if attr_name == 'time_usec':
+            keys = self.time_usec
+        elif attr_name in self.string_attr_names:
+            column = getattr(self, attr_name)
+            ranks = np.empty(len(column.values), dtype=np.int64)
+            ranks[sorted(range(len(column.values)), key=column.values.__getitem__)] = np.arange(len(column.values))
+            keys = ranks[column.codes]
+        else:
+            raise AttributeError(f'{BrowserHistoryItem.__name__} has no attribute: {attr_name}')
+        if reverse:
+            # Stable with respect to the original order, like list.sort(reverse=True).
+            order = len(keys) - 1 - np.argsort(keys[::-1], kind='stable')[::-1]
+        else:
+            order = np.argsort(keys, kind='stable')
+        self.__dict__.update(self.take(order).__dict__)
+
+    def search_mask(self, search_str: str, target: str='title') -> np.ndarray:
+        if target not in ['title', 'url']:
+            raise Exception(f'Invalid target: {target}')
+        return getattr(self, target).match_mask(lambda value: search_str in value)
+
+    def search(self, search_str: str, target: str='title') -> ColumnarBrowserHistoryItemList:
+        return self.take(self.search_mask(search_str, target=target))
+
+    def url_base_mask(self, url_base: str) -> np.ndarray:
+        return self.url.match_mask(lambda value: value.startswith(url_base))
+
+    def search_by_url_base(self, url_base: str) -> ColumnarBrowserHistoryItemList:
+        return self.take(self.url_base_mask(url_base))
+
+    def time_range_mask(self, start_time_usec: int=None, end_time_usec: int=None) -> np.ndarray:
+        """
+        Mask of rows with start_time_usec <= time_usec < end_time_usec.
+        Either bound can be omitted.
+        """
+        mask = np.ones(len(self), dtype=bool)
+        if start_time_usec is not None:
+            mask &= self.time_usec >= start_time_usec
+        if end_time_usec is not None:
+            mask &= self.time_usec < end_time_usec
+        return mask
+
+    def search_by_time_range(self, start_time_usec: int=None, end_time_usec: int=None) -> ColumnarBrowserHistoryItemList:
+        return self.take(self.time_range_mask(start_time_usec=start_time_usec, end_time_usec=end_time_usec))
+
+    def group_indices_by_url(self) -> List[np.ndarray]:
+        """
+        Row indices of each url, ordered by the first appearance of the url.
+        Within a group, rows keep their original order.
+        """
+        if len(self) == 0:
+            return []
+        unique_codes, first_idx, inverse = np.unique(self.url.codes, return_index=True, return_inverse=True)
+        group_order = np.argsort(first_idx, kind='stable')
+        group_rank = np.empty(len(group_order), dtype=np.int64)
+        group_rank[group_order] = np.arange(len(group_order))
+        row_group = group_rank[inverse.reshape(-1)]
+        row_order = np.argsort(row_group, kind='stable')
+        boundaries = np.cumsum(np.bincount(row_group, minlength=len(group_order)))[:-1]
+        return np.split(row_order, boundaries)
+
+    def group_by_url(self, sort_by_item_count: bool=False) -> CommonBrowserHistoryItemGroupList:
+        """
+        Same groups and ids as CommonBrowserHistoryItemGroupList.group_by_url.
+        sort_by_item_count: Same order as CommonBrowserHistoryItemGroupList.sort(attr_name='item_count', reverse=True).
+        """
+        groups = CommonBrowserHistoryItemGroupList()
+        title = self.title.decode_all()
+        url = self.url.decode_all()
+        client_id = self.client_id.decode_all()
+        time_usec = self.time_usec.tolist()
+        page_transition = self.page_transition.decode_all()
+        favicon_url = self.favicon_url.decode_all()
+        group_indices = self.group_indices_by_url()
+        group_ids = list(range(len(group_indices)))
+        if sort_by_item_count:
+            # Stable with respect to the first appearance, like list.sort(reverse=True).
+            group_ids.sort(key=lambda group_id: len(group_indices[group_id]), reverse=True)
+        for group_id in group_ids:
+            idx_list = group_indices[group_id].tolist()
+            groups.append(
+                CommonBrowserHistoryItemGroup.from_columns(
+                    title=[title[i] for i in idx_list],
+                    url=[url[i] for i in idx_list],
+                    client_id=[client_id[i] for i in idx_list],
+                    time_usec=[time_usec[i] for i in idx_list],
+                    page_transition=[page_transition[i] for i in idx_list],
+                    favicon_url=[favicon_url[i] for i in idx_list],
+                    id=group_id
+                )
+            )
+        return groups
+
+    def search_by_url_base_and_group_by_url(self, url_base: str) -> CommonBrowserHistoryItemGroupList:
+        return self.search_by_url_base(url_base).group_by_url()
@@ -0,0 +1,83 @@
+from __future__ import annotations
+import sqlite3
+from typing import Iterator
+from common_utils.file_utils import file_exists
+from .browser_history import BrowserHistoryItem, BrowserHistoryItemList, \
+    CommonBrowserHistoryItemGroupList
+
+# Chrome stores visit_time as microseconds since 1601-01-01 UTC.
+# Google Takeout's time_usec is microseconds since 1970-01-01 UTC.
+CHROME_EPOCH_OFFSET_USEC = 11644473600 * 10**6
+
+# Core transition types. Refer to ui::PageTransition in the Chromium source.
+CHROME_PAGE_TRANSITIONS = [
+    'LINK', 'TYPED', 'AUTO_BOOKMARK', 'AUTO_SUBFRAME', 'MANUAL_SUBFRAME',
+    'GENERATED', 'AUTO_TOPLEVEL', 'FORM_SUBMIT', 'RELOAD', 'KEYWORD', 'KEYWORD_GENERATED'
+]
+
+def chrome_time_to_time_usec(chrome_time: int) -> int:
+    return chrome_time - CHROME_EPOCH_OFFSET_USEC
+
+def time_usec_to_chrome_time(time_usec: int) -> int:
+    return time_usec + CHROME_EPOCH_OFFSET_USEC
+
+def chrome_transition_to_page_transition(transition: int) -> str:
+    core_type = transition & 0xFF
+    return CHROME_PAGE_TRANSITIONS[core_type] if core_type < len(CHROME_PAGE_TRANSITIONS) else None
+
+class ChromeHistoryDatabase:
+    """
+    Reads visits directly from a Chrome/Chromium History SQLite file.
+    Chrome keeps the file locked while it is running, so point this at a copy.
+    """
+    def __init__(self, path: str, client_id: str='chrome_history_db'):
+        assert file_exists(path), f"Couldn't find Chrome History database: {path}"
+        self.path = path
+        self.client_id = client_id
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(f'file:{self.path}?mode=ro', uri=True)
+
+    def iter_items(self, url_base: str=None, min_time_usec: int=None, batch_size: int=10000) -> Iterator[BrowserHistoryItem]:
+        """
+        Yields one BrowserHistoryItem per visit, ordered by time_usec.
+        url_base: Only visits to urls that start with url_base.
+                  Equivalent to url LIKE 'url_base%', but written as a range so that the urls.url index is used.
+        min_time_usec: Only visits with time_usec > min_time_usec (watermark).
+        """
+        conditions = []
+        params = []
+        if url_base is not None and len(url_base) > 0:
+            conditions.append('urls.url >= ? AND urls.url < ?')
+            params.extend([url_base, url_base[:-1] + chr(ord(url_base[-1]) + 1)])
+        if min_time_usec is not None:
+            conditions.append('visits.visit_time > ?')
+            params.append(time_usec_to_chrome_time(min_time_usec))
+        query = 'SELECT urls.url, urls.title, visits.visit_time, visits.transition FROM visits JOIN urls ON visits.url = urls.id'
+        if len(conditions) > 0:
+            query += f" WHERE {' AND '.join(conditions)}"
+        query += ' ORDER BY visits.visit_time'
+
+        connection = self._connect()
+        try:
+            cursor = connection.execute(query, params)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if len(rows) == 0:
+                    break
+                for url, title, visit_time, transition in rows:
+                    yield BrowserHistoryItem(
+                        title=title if title is not None else '',
+                        url=url,
+                        client_id=self.client_id,
+                        time_usec=chrome_time_to_time_usec(visit_time),
+                        page_transition=chrome_transition_to_page_transition(transition) if transition is not None else None
+                    )
+        finally:
+            connection.close()
+
+    def load_item_list(self, url_base: str=None, min_time_usec: int=None) -> BrowserHistoryItemList:
+        return BrowserHistoryItemList(list(self.iter_items(url_base=url_base, min_time_usec=min_time_usec)))
+
+    def load_groups(self, url_base: str=None, min_time_usec: int=None) -> CommonBrowserHistoryItemGroupList:
+        return CommonBrowserHistoryItemGroupList.group_by_url(self.iter_items(url_base=url_base, min_time_usec=min_time_usec))
@@ -1,18 +1,21 @@
 from __future__ import annotations
-from typing import List, Dict
+from typing import List, Dict, cast
 from tqdm import tqdm
 from datetime import datetime
 from collections import OrderedDict
+import numpy as np
 
 from common_utils.base.basic import BasicLoadableObject, BasicLoadableHandler, BasicHandler
 from common_utils.file_utils import dir_exists
 from ..jisho.jisho_matches import DictionaryEntryMatchList as JishoEntries, \
     DictionaryEntryMatch as JishoEntry
-from ..kotobank.kotobank_structs import KotobankResult, KotobankResultList
+from ..kotobank.kotobank_structs import KotobankResult, KotobankResultList, KotobankResultCache
+from ..dump_store import DumpStore, DirectoryDumpStore
+from ...util.handler_utils import IdIndexedHandlerMixin
 from ..util.char_lists import convert_katakana2hiragana, nonkanji_chars
-from ...util.time_utils import get_localtime_from_time_usec, \
-    get_utc_time_from_time_usec
-from ..anki.export_txt_parser import AnkiExportTextData
+from ...util.time_utils import get_utc_time_from_time_usec, \
+    get_localtimes_from_time_usec, format_localtimes_from_time_usec
+from ..anki.export_txt_parser import AnkiExportTextIndex
 from ...anki.note_structs import ParsedVocabularyFields, ParsedVocabularyFieldsList
 from .kanji_info import WritingKanjiInfo, WritingKanjiInfoList
 from ...anki.connect import AnkiConnect
@@ -21,6 +24,7 @@ class CombinedResult(BasicLoadableObject['CombinedResult']):
     def __init__(self, jisho_result: JishoEntry, kotobank_result: KotobankResult=None):
         self.jisho_result = jisho_result
         self.kotobank_result = kotobank_result
+        self._time_cache = cast(dict, None)
 
     @classmethod
     def from_dict(cls, item_dict: dict) -> CombinedResult:
@@ -29,6 +33,10 @@ class CombinedResult(BasicLoadableObject['CombinedResult']):
             kotobank_result=KotobankResult.from_dict(item_dict['kotobank_result']) if item_dict['kotobank_result'] is not None else None
         )
 
+    @property
+    def id(self) -> int:
+        return self.jisho_result.id
+
     def to_vocabulary_fields(self, order_idx: int=None) -> ParsedVocabularyFields:
         common = 'common' if self.jisho_result.entry.concept_labels.is_common else ''
         jlpt_level = self.jisho_result.entry.concept_labels.jlpt_level
@@ -37,17 +45,12 @@ class CombinedResult(BasicLoadableObject['CombinedResult']):
         wanikani_level = str(wanikani_level) if wanikani_level is not None else ''
         # searched_words = str(self.jisho_result.search_words).replace('[', '').replace(']', '')
         searched_words = ''
-        for search_word, datetime_list in self.localtime_info.items():
+        for search_word, time_usec_list in self.time_usec_info.items():
             if len(searched_words) == 0:
-                searched_words += f'{search_word}: {len(datetime_list)}'
+                searched_words += f'{search_word}: {len(time_usec_list)}'
             else:
-                searched_words += f', {search_word}: {len(datetime_list)}'
-        cumulative_search_localtimes = ''
-        for i, localtime in enumerate(self.cumulative_search_localtimes):
-            if i == 0:
-                cumulative_search_localtimes += localtime.strftime('%Y/%m/%d %H:%M:%S')
-            else:
-                cumulative_search_localtimes += f", {localtime.strftime('%Y/%m/%d %H:%M:%S')}"
+                searched_words += f', {search_word}: {len(time_usec_list)}'
+        cumulative_search_localtimes = ', '.join(self.get_cumulative_search_localtime_strs('%Y/%m/%d %H:%M:%S'))
 
         if self.kotobank_result is not None:
             daijisen = self.kotobank_result.digital_daijisen_content
@@ -103,11 +106,42 @@ class CombinedResult(BasicLoadableObject['CombinedResult']):
     def time_usec_info(self, time_usec_info: Dict[str, List[int]]):
         self.jisho_result.search_words_time_usec = time_usec_info
 
+    def _get_time_cache_key(self) -> tuple:
+        # Identity and length of each list instead of their contents, so checking the cache doesn't copy every time_usec.
+        # The cache holds on to the lists (see _set_time_cache), so their ids can't be reused by other lists.
+        return tuple([(search_word, id(time_usec_list), len(time_usec_list)) for search_word, time_usec_list in self.time_usec_info.items()])
+
+    def _set_time_cache(self, cache_key: tuple, time_usec_list: List[int], localtimes: List[datetime], formatted: Dict[str, List[str]]=None):
+        localtime_info = {}
+        start = 0
+        for search_word, search_word_time_usec_list in self.time_usec_info.items():
+            localtime_info[search_word] = localtimes[start:start+len(search_word_time_usec_list)]
+            start += len(search_word_time_usec_list)
+        self._time_cache = {
+            'key': cache_key,
+            'time_usec_lists': list(self.time_usec_info.values()),
+            'time_usec_list': time_usec_list,
+            'localtime_info': localtime_info,
+            'localtimes': localtimes,
+            'formatted': formatted if formatted is not None else {}
+        }
+
+    def _get_time_cache(self) -> dict:
+        """
+        The local times of time_usec_info, converted in bulk.
+        They are kept until time_usec_info or one of its lists is replaced, or a list is appended to or shortened in place.
+        """
+        cache_key = self._get_time_cache_key()
+        if self._time_cache is None or self._time_cache['key'] != cache_key:
+            time_usec_list = [time_usec for time_usec_list in self.time_usec_info.values() for time_usec in time_usec_list]
+            self._set_time_cache(cache_key, time_usec_list, get_localtimes_from_time_usec(time_usec_list))
+        return self._time_cache
+
     @property
     def localtime_info(self) -> Dict[str, List[datetime]]:
         return {
-            search_word: [get_localtime_from_time_usec(time_usec) for time_usec in time_usec_list]
-            for search_word, time_usec_list in self.time_usec_info.items()
+            search_word: list(localtime_list)
+            for search_word, localtime_list in self._get_time_cache()['localtime_info'].items()
         }
 
     @property
@@ -126,10 +160,16 @@ class CombinedResult(BasicLoadableObject['CombinedResult']):
 
     @property
     def cumulative_search_localtimes(self) -> List[datetime]:
-        cumulative_localtimes = []
-        for search_word, localtime_list in self.localtime_info.items():
-            cumulative_localtimes.extend(localtime_list)
-        return cumulative_localtimes
+        return list(self._get_time_cache()['localtimes'])
+
+    def get_cumulative_search_localtime_strs(self, fmt: str='%Y/%m/%d %H:%M:%S') -> List[str]:
+        """
+        cumulative_search_localtimes formatted with fmt.
+        """
+        time_cache = self._get_time_cache()
+        if fmt not in time_cache['formatted']:
+            time_cache['formatted'][fmt] = format_localtimes_from_time_usec(time_cache['time_usec_list'], fmt=fmt)
+        return list(time_cache['formatted'][fmt])
 
     @property
     def first_search_localtime(self) -> datetime:
@@ -175,12 +215,30 @@ class CombinedResult(BasicLoadableObject['CombinedResult']):
         return self.custom_str()
 
     @classmethod
-    def from_match(cls, entry_match: JishoEntry, kotobank_dump_dir: str, verbose: bool=False) -> CombinedResult:
-        assert dir_exists(kotobank_dump_dir)
+    def from_match(
+        cls, entry_match: JishoEntry, kotobank_dump_dir: str=None, verbose: bool=False,
+        kotobank_dump_store: DumpStore=None, kotobank_cache: KotobankResultCache=None
+    ) -> CombinedResult:
+        """
+        The linked Kotobank results are taken from kotobank_cache if it is given,
+        otherwise they are loaded from kotobank_dump_store, or from kotobank_dump_dir.
+        """
         kotobank_results = KotobankResultList()
-        for linked_query in entry_match.linked_kotobank_queries:
-            kotobank_result = KotobankResult.load_from_path(f'{kotobank_dump_dir}/{linked_query}.json')
-            kotobank_results.append(kotobank_result)
+        if kotobank_cache is not None:
+            cached_results = kotobank_cache.get_many(entry_match.linked_kotobank_queries)
+            for linked_query in entry_match.linked_kotobank_queries:
+                assert linked_query in cached_results, f"Couldn't find {linked_query} in {kotobank_cache.dump_store.path}"
+                kotobank_results.append(cached_results[linked_query])
+        elif kotobank_dump_store is not None:
+            result_dicts = kotobank_dump_store.load_dicts(entry_match.linked_kotobank_queries)
+            for linked_query in entry_match.linked_kotobank_queries:
+                assert linked_query in result_dicts, f"Couldn't find {linked_query} in {kotobank_dump_store.path}"
+                kotobank_results.append(KotobankResult.from_dict(result_dicts[linked_query]))
+        else:
+            assert dir_exists(kotobank_dump_dir)
+            for linked_query in entry_match.linked_kotobank_queries:
+                kotobank_result = KotobankResult.load_from_path(f'{kotobank_dump_dir}/{linked_query}.json')
+                kotobank_results.append(kotobank_result)
         
         # Use naive approach for now.
         if len(kotobank_results) == 0:
@@ -234,6 +292,7 @@ class CombinedResult(BasicLoadableObject['CombinedResult']):
         return chars
 
 class CombinedResultList(
+    IdIndexedHandlerMixin,
     BasicLoadableHandler['CombinedResultList', 'CombinedResult'],
     BasicHandler['CombinedResultList', 'CombinedResult']
 ):
@@ -263,10 +322,19 @@ class CombinedResultList(
 
     @classmethod
     def from_matches(
-        cls, entry_matches: JishoEntries, kotobank_dump_dir: str,
+        cls, entry_matches: JishoEntries, kotobank_dump_dir: str=None,
         show_pbar: bool=True, leave_pbar: bool=True,
-        verbose: bool=False
+        verbose: bool=False, kotobank_dump_store: DumpStore=None, kotobank_cache: KotobankResultCache=None
     ) -> CombinedResultList:
+        """
+        Kotobank results are read through kotobank_cache, so queries that are linked to several entries are only loaded once.
+        If no cache is given, one is made for kotobank_dump_store (or kotobank_dump_dir) that lasts for this call.
+        """
+        if kotobank_cache is None:
+            if kotobank_dump_store is None:
+                assert dir_exists(kotobank_dump_dir)
+                kotobank_dump_store = DirectoryDumpStore(kotobank_dump_dir)
+            kotobank_cache = KotobankResultCache(kotobank_dump_store)
         results = CombinedResultList()
         pbar = tqdm(total=len(entry_matches), unit='matches', leave=leave_pbar) if show_pbar else None
         if pbar is not None:
@@ -277,7 +345,8 @@ class CombinedResultList(
             result = CombinedResult.from_match(
                 entry_match=entry_match,
                 kotobank_dump_dir=kotobank_dump_dir,
-                verbose=verbose
+                verbose=verbose,
+                kotobank_cache=kotobank_cache
             )
             if result is not None:
                 results.append(result)
@@ -297,12 +366,11 @@ class CombinedResultList(
 
         cum_localtime_list = []
         for result in self:
-            for search_word, time_usec_list in result.time_usec_info.items():
-                if mode == 'localtime':
-                    localtime_list = [get_localtime_from_time_usec(time_usec) for time_usec in time_usec_list]
-                else:
-                    localtime_list = [get_utc_time_from_time_usec(time_usec) for time_usec in time_usec_list]
-                cum_localtime_list.extend(localtime_list)
+            if mode == 'localtime':
+                cum_localtime_list.extend(result.cumulative_search_localtimes)
+            else:
+                for search_word, time_usec_list in result.time_usec_info.items():
+                    cum_localtime_list.extend([get_utc_time_from_time_usec(time_usec) for time_usec in time_usec_list])
         
         ax = sns.displot(data=[localtime.hour for localtime in cum_localtime_list])
         plt.savefig(save_path)
@@ -327,41 +395,102 @@ class CombinedResultList(
         else:
             self.obj_list = (non_wanikani_results + wanikani_results).obj_list
 
-    def recommended_sort(self, show_pbar: bool=False, leave_pbar: bool=True):
-        # Note: The most important sorts come last while the least important ones come first.
-        pbar = tqdm(total=5, unit='sorts', leave=leave_pbar) if show_pbar else None
-        if pbar is not None:
-            pbar.set_description('Sorting by localtime')
-        self.sort(attr_name='first_search_localtime') # Initial order
-        if pbar is not None:
-            pbar.update()
-            pbar.set_description('Sorting by wanikani')
-        self.sort_by_wanikani(wanikani_first=True, reverse=False)
-        if pbar is not None:
-            pbar.update()
-            pbar.set_description('Sorting by jlpt')
-        self.sort_by_jlpt(jlpt_first=True, reverse=True)
-        if pbar is not None:
-            pbar.update()
-            pbar.set_description('Sorting by common words')
-        self.sort(attr_name='is_common_word', reverse=True)
+    # Fields of the recommended sort key, from most to least important.
+    # Ties on every field are broken by the current position in the list.
+    recommended_sort_fields = [
+        ('neg_hit_count', np.int64),        # search_word_hit_count, descending
+        ('not_common', np.int8),            # Common words first
+        ('not_jlpt', np.int8),              # JLPT words first
+        ('neg_jlpt_level', np.int64),       # jlpt_level, descending
+        ('not_wanikani', np.int8),          # Wanikani words first
+        ('wanikani_level', np.int64),       # wanikani_level, ascending
+        ('earliest_time_usec', np.int64),   # first_search_localtime, ascending
+        ('idx', np.int64)
+    ]
+
+    def get_recommended_sort_keys(self, show_pbar: bool=False, leave_pbar: bool=True) -> np.ndarray:
+        """
+        The recommended sort key of every result as a structured array with recommended_sort_fields.
+        Each key is computed once, so sorting doesn't go back to the result properties.
+        """
+        keys = np.zeros(len(self), dtype=self.recommended_sort_fields)
+        pbar = tqdm(total=len(self), unit='result(s)', leave=leave_pbar) if show_pbar else None
         if pbar is not None:
-            pbar.update()
-            pbar.set_description('Sorting by hit count')
-        self.sort(attr_name='search_word_hit_count', reverse=True) # Order by hit count
+            pbar.set_description('Computing sort keys')
+        for i, result in enumerate(self.obj_list):
+            concept_labels = result.jisho_result.entry.concept_labels
+            keys[i] = (
+                -result.search_word_hit_count,
+                0 if concept_labels.is_common else 1,
+                0 if concept_labels.is_jlpt else 1,
+                -concept_labels.jlpt_level if concept_labels.is_jlpt else 0,
+                0 if concept_labels.is_wanikani else 1,
+                concept_labels.wanikani_level if concept_labels.is_wanikani else 0,
+                result.earliest_time_usec,
+                i
+            )
+            if pbar is not None:
+                pbar.update()
         if pbar is not None:
-            pbar.update()
             pbar.close()
+        return keys
+
+    def get_recommended_order(self, top_k: int=None, show_pbar: bool=False, leave_pbar: bool=True) -> np.ndarray:
+        """
+        Indices of the results in recommended order.
+        top_k: Only the indices of the first top_k results. These are selected with a partition
+            before sorting, which is cheaper than a full sort when top_k is small.
+        """
+        keys = self.get_recommended_sort_keys(show_pbar=show_pbar, leave_pbar=leave_pbar)
+        field_names = [name for name, dtype in self.recommended_sort_fields]
+        if top_k is not None and top_k < len(keys):
+            if top_k <= 0:
+                return np.zeros(0, dtype=np.int64)
+            candidates = np.argpartition(keys, top_k - 1, order=field_names)[:top_k]
+            return candidates[np.argsort(keys[candidates], order=field_names)]
+        # np.lexsort takes the most important key last.
+        return np.lexsort([keys[name] for name in field_names[::-1]])
+
+    def recommended_sort(self, show_pbar: bool=False, leave_pbar: bool=True):
+        """
+        Sorts by hit count, then common words, then JLPT level, then Wanikani level, then the time of the first search.
+        This is the same order as the stable sorts that were done one after another before
+        (least important first), but in a single sort on precomputed keys.
+        """
+        if len(self) == 0:
+            return
+        order = self.get_recommended_order(show_pbar=show_pbar, leave_pbar=leave_pbar)
+        self._invalidate_id_index()
+        self.obj_list[:] = [self.obj_list[i] for i in order]
+
+    def get_recommended_top_k(self, k: int, show_pbar: bool=False, leave_pbar: bool=True) -> CombinedResultList:
+        """
+        The first k results of recommended_sort, without sorting the rest. The list itself isn't changed.
+        """
+        return CombinedResultList([
+            self.obj_list[i] for i in self.get_recommended_order(top_k=k, show_pbar=show_pbar, leave_pbar=leave_pbar)
+        ])
     
     def filter_out_anki_export(self, path: str, show_pbar: bool=True, leave_pbar: bool=True) -> CombinedResultList:
+        return self.filter_out_anki_exports([path], show_pbar=show_pbar, leave_pbar=leave_pbar)
+
+    def filter_out_anki_exports(
+        self, paths: List[str], normalize_kana: bool=False,
+        show_pbar: bool=True, leave_pbar: bool=True
+    ) -> CombinedResultList:
+        """
+        Removes the results whose writing is in any of the Anki exports in paths.
+        The exports are indexed once up front, so each result is a single set lookup.
+        normalize_kana: Ignore the difference between katakana and hiragana when comparing writings.
+        """
         filtered_results = CombinedResultList()
-        export_data = AnkiExportTextData.parse_from_txt(path)
+        export_index = AnkiExportTextIndex.from_paths(paths, normalize_kana=normalize_kana)
 
         pbar = tqdm(total=len(self), unit='result(s)', leave=leave_pbar) if show_pbar else None
         if pbar is not None:
             pbar.set_description('Filtering Out Results From Export')
         for result in self:
-            if not export_data.contains(writing=result.jisho_result.entry.word_representation.writing):
+            if not export_index.contains(writing=result.jisho_result.entry.word_representation.writing):
                 filtered_results.append(result)
             if pbar is not None:
                 pbar.update()
@@ -369,48 +498,98 @@ class CombinedResultList(
             pbar.close()
         return filtered_results
     
+    def load_localtimes(self, fmt: str=None):
+        """
+        Converts the search times of every result that doesn't have them memoized yet in one bulk conversion.
+        fmt: Also format them with fmt.
+        """
+        pending = []
+        for result in self:
+            cache_key = result._get_time_cache_key()
+            time_cache = result._time_cache
+            if time_cache is None or time_cache['key'] != cache_key or (fmt is not None and fmt not in time_cache['formatted']):
+                pending.append((result, cache_key))
+        if len(pending) == 0:
+            return
+        time_usec_lists = [
+            [time_usec for time_usec_list in result.time_usec_info.values() for time_usec in time_usec_list]
+            for result, cache_key in pending
+        ]
+        cum_time_usec_list = [time_usec for time_usec_list in time_usec_lists for time_usec in time_usec_list]
+        localtimes = get_localtimes_from_time_usec(cum_time_usec_list)
+        formatted = format_localtimes_from_time_usec(cum_time_usec_list, fmt=fmt) if fmt is not None else None
+        start = 0
+        for (result, cache_key), time_usec_list in zip(pending, time_usec_lists):
+            end = start + len(time_usec_list)
+            result._set_time_cache(
+                cache_key, time_usec_list, localtimes[start:end],
+                formatted={fmt: formatted[start:end]} if fmt is not None else None
+            )
+            start = end
+
     def to_vocabulary_fields_list(self) -> ParsedVocabularyFieldsList:
+        self.load_localtimes(fmt='%Y/%m/%d %H:%M:%S')
         fields_list = ParsedVocabularyFieldsList()
         for i, result in enumerate(self):
             fields_list.append(result.to_vocabulary_fields(order_idx=i))
         return fields_list
     
-    def get_all_writing_kanji(self, include_hit_count: bool=False, show_pbar: bool=True, leave_pbar: bool=True) -> WritingKanjiInfoList:
-        info_list = WritingKanjiInfoList()
+    def _aggregate_writing_kanji(
+        self, include_hit_count: bool=False, show_pbar: bool=True, leave_pbar: bool=True
+    ) -> (WritingKanjiInfoList, Dict[str, List[int]]):
+        """
+        Single pass over the results, keyed by kanji.
+        Returns the infos in order of first appearance, and kanji -> indices of the results whose writing uses it.
+        """
+        info_dict = cast(Dict[str, WritingKanjiInfo], {})
+        used_in_dict = cast(Dict[str, Dict[str, None]], {}) # Ordered sets of writings
+        result_index = cast(Dict[str, List[int]], {})
         pbar = tqdm(total=len(self), unit='result(s)', leave=leave_pbar) if show_pbar else None
-        for result in self:
+        for result_idx, result in enumerate(self):
+            writing = result.jisho_result.entry.word_representation.writing
             if pbar is not None:
-                pbar.set_description(f'Parsing Kanji From: {result.jisho_result.entry.word_representation.writing}')
-            for i, kanji in enumerate(result.writing_kanji_list):
-                if include_hit_count:
-                    hit_count = result.search_word_hit_count
-                else:
-                    hit_count = 1
+                pbar.set_description(f'Parsing Kanji From: {writing}')
+            writing_kanji_list = result.writing_kanji_list
+            if len(writing_kanji_list) > 0:
+                hit_count = result.search_word_hit_count if include_hit_count else 1
                 earliest_time_usec = result.earliest_time_usec
-                relevant_info_list = info_list.get(kanji=kanji)
-                if len(relevant_info_list) == 0:
-                    info = WritingKanjiInfo(
-                        kanji=kanji, hit_count=hit_count,
-                        used_in=[result.jisho_result.entry.word_representation.writing],
+            for i, kanji in enumerate(writing_kanji_list):
+                info = info_dict.get(kanji)
+                if info is None:
+                    info_dict[kanji] = WritingKanjiInfo(
+                        kanji=kanji, hit_count=hit_count, used_in=[],
                         earliest_time_usec=earliest_time_usec, earliest_pos_idx=i
                     )
-                    info_list.append(info)
-                elif len(relevant_info_list) == 1:
-                    relevant_info = relevant_info_list[0]
-                    relevant_info.hit_count += hit_count
-                    if result.jisho_result.entry.word_representation.writing not in relevant_info.used_in:
-                        relevant_info.used_in.append(result.jisho_result.entry.word_representation.writing)
-                    if earliest_time_usec < relevant_info.earliest_time_usec:
-                        relevant_info.earliest_time_usec = earliest_time_usec
-                        relevant_info.earliest_pos_idx = i
+                    used_in_dict[kanji] = {writing: None}
+                    result_index[kanji] = [result_idx]
                 else:
-                    raise Exception
+                    info.hit_count += hit_count
+                    used_in_dict[kanji][writing] = None
+                    if result_index[kanji][-1] != result_idx:
+                        result_index[kanji].append(result_idx)
+                    if earliest_time_usec < info.earliest_time_usec:
+                        info.earliest_time_usec = earliest_time_usec
+                        info.earliest_pos_idx = i
             if pbar is not None:
                 pbar.update()
         if pbar is not None:
             pbar.close()
-        info_list.sort(attr_name='hit_count', reverse=True)
+        for kanji, info in info_dict.items():
+            info.used_in = list(used_in_dict[kanji].keys())
+        return WritingKanjiInfoList(list(info_dict.values())), result_index
+
+    def get_all_writing_kanji(self, include_hit_count: bool=False, show_pbar: bool=True, leave_pbar: bool=True) -> WritingKanjiInfoList:
+        info_list, result_index = self._aggregate_writing_kanji(include_hit_count=include_hit_count, show_pbar=show_pbar, leave_pbar=leave_pbar)
+        if len(info_list) > 0:
+            info_list.sort(attr_name='hit_count', reverse=True)
         return info_list
+
+    def get_writing_kanji_index(self, show_pbar: bool=False, leave_pbar: bool=True) -> Dict[str, List[int]]:
+        """
+        kanji -> indices of the results whose writing uses that kanji, in list order.
+        """
+        info_list, result_index = self._aggregate_writing_kanji(show_pbar=show_pbar, leave_pbar=leave_pbar)
+        return result_index
     
     def add_or_update_anki(self, deck_name: str, open_browser: bool=False, anki_connect: AnkiConnect=None):
         if anki_connect is None:
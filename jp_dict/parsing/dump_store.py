@@ -0,0 +1,374 @@
+from __future__ import annotations
+import os
+import json
+import sqlite3
+import uuid
+import hashlib
+import threading
+from abc import ABC, abstractmethod
+from typing import List, Dict, Iterator, cast
+from tqdm import tqdm
+from common_utils.base.basic import BasicLoadableObject
+from common_utils.file_utils import file_exists, dir_exists
+from ..util.hash_utils import get_file_hash
+
+dump_store_backends = ['dir', 'sqlite']
+
+class DumpManifest(BasicLoadableObject['DumpManifest']):
+    def __init__(self, store_path: str=None, entries: Dict[str, list]=None):
+        """
+        A snapshot of the dumps in a store, used to find the dumps that were added, changed or removed since.
+        entries: key -> [size, mtime_ns, content_hash]
+        """
+        super().__init__()
+        self.store_path = store_path
+        self.entries = entries if entries is not None else {}
+
+    def get_changed_keys(self, previous: DumpManifest) -> List[str]:
+        """
+        Keys that are new, or whose content hash is different from previous.
+        """
+        return [
+            key for key, entry in self.entries.items()
+            if key not in previous.entries or previous.entries[key][2] != entry[2]
+        ]
+
+    def get_removed_keys(self, previous: DumpManifest) -> List[str]:
+        return [key for key in previous.entries.keys() if key not in self.entries]
+
+class DumpStore(ABC):
+    """
+    Parse dumps (one json dict per search query) keyed by the query.
+    Every change to the store rewrites a small version file next to it (see get_version_path),
+    which is what the pipeline hashes to decide whether the dumps changed.
+    Stores can be used as context managers, which close them on exit.
+    """
+    def __init__(self, path: str):
+        self.path = path
+
+    def __str__(self) -> str:
+        return f'{type(self).__name__}({self.path})'
+
+    def __repr__(self) -> str:
+        return self.__str__()
+
+    def __enter__(self) -> DumpStore:
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self.keys())
+
+    @property
+    def _version_path(self) -> str:
+        return f"{self.path.rstrip('/')}.version"
+
+    def _update_version(self):
+        # Called after every write. Written atomically since several threads can save dumps at once.
+        tmp_path = f'{self._version_path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write(uuid.uuid4().hex)
+        os.replace(tmp_path, self._version_path)
+
+    def get_version_path(self) -> str:
+        """
+        Path of a file that changes whenever a dump is saved or deleted, so that a change can be detected
+        without listing or reading the dumps. It is created if it doesn't exist yet, e.g. for stores
+        written before it was added.
+        """
+        if not file_exists(self._version_path):
+            version_dir = os.path.dirname(self._version_path)
+            if version_dir != '':
+                os.makedirs(version_dir, exist_ok=True)
+            self._update_version()
+        return self._version_path
+
+    @abstractmethod
+    def __contains__(self, key: str) -> bool:
+        raise NotImplementedError
+
+    @property
+    @abstractmethod
+    def exists(self) -> bool:
+        raise NotImplementedError
+
+    @abstractmethod
+    def keys(self) -> List[str]:
+        """
+        Every key in the store, sorted.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def load_dict(self, key: str) -> dict:
+        """
+        None if key isn't in the store.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def load_dicts(self, keys: List[str]) -> Dict[str, dict]:
+        """
+        Keys that aren't in the store are left out.
+        """
+        raise NotImplementedError
+
+    def save_dict(self, key: str, item_dict: dict):
+        self.save_dicts({key: item_dict})
+
+    @abstractmethod
+    def save_dicts(self, item_dicts: Dict[str, dict]):
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_manifest(self, previous: DumpManifest=None) -> DumpManifest:
+        """
+        The current size, mtime and content hash of every dump.
+        Hashes in previous are reused for dumps whose size and mtime haven't changed.
+        """
+        raise NotImplementedError
+
+    def iter_items(self, batch_size: int=1000) -> Iterator[tuple]:
+        """
+        Yields (key, item_dict) in key order.
+        """
+        keys = self.keys()
+        for i in range(0, len(keys), batch_size):
+            batch = self.load_dicts(keys[i:i+batch_size])
+            for key in keys[i:i+batch_size]:
+                if key in batch:
+                    yield key, batch[key]
+
+    @abstractmethod
+    def delete(self, key: str):
+        raise NotImplementedError
+
+    @abstractmethod
+    def clear(self):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+class DirectoryDumpStore(DumpStore):
+    """
+    One json file per key: dump_dir/<key>.json
+    This is the original layout of the parse dump directories.
+    """
+    def __init__(self, dump_dir: str):
+        super().__init__(path=dump_dir)
+
+    def _get_dump_path(self, key: str) -> str:
+        return f'{self.path}/{key}.json'
+
+    def __contains__(self, key: str) -> bool:
+        return file_exists(self._get_dump_path(key))
+
+    @property
+    def exists(self) -> bool:
+        return dir_exists(self.path)
+
+    def keys(self) -> List[str]:
+        if not self.exists:
+            return []
+        return sorted([filename[:-len('.json')] for filename in os.listdir(self.path) if filename.endswith('.json')])
+
+    def load_dict(self, key: str) -> dict:
+        dump_path = self._get_dump_path(key)
+        if not file_exists(dump_path):
+            return None
+        with open(dump_path, 'r') as f:
+            return json.load(f)
+
+    def load_dicts(self, keys: List[str]) -> Dict[str, dict]:
+        item_dicts = cast(Dict[str, dict], {})
+        for key in keys:
+            item_dict = self.load_dict(key)
+            if item_dict is not None:
+                item_dicts[key] = item_dict
+        return item_dicts
+
+    def save_dicts(self, item_dicts: Dict[str, dict]):
+        os.makedirs(self.path, exist_ok=True)
+        for key, item_dict in item_dicts.items():
+            with open(self._get_dump_path(key), 'w') as f:
+                json.dump(item_dict, f, indent=2, ensure_ascii=False)
+        self._update_version()
+
+    def get_manifest(self, previous: DumpManifest=None) -> DumpManifest:
+        manifest = DumpManifest(store_path=self.path)
+        for key in self.keys():
+            dump_path = self._get_dump_path(key)
+            stat = os.stat(dump_path)
+            previous_entry = previous.entries.get(key) if previous is not None else None
+            if previous_entry is not None and previous_entry[0] == stat.st_size and previous_entry[1] == stat.st_mtime_ns:
+                manifest.entries[key] = previous_entry
+            else:
+                manifest.entries[key] = [stat.st_size, stat.st_mtime_ns, get_file_hash(dump_path)]
+        return manifest
+
+    def delete(self, key: str):
+        if key in self:
+            os.remove(self._get_dump_path(key))
+            self._update_version()
+
+    def clear(self):
+        for key in self.keys():
+            os.remove(self._get_dump_path(key))
+        self._update_version()
+
+class SQLiteDumpStore(DumpStore):
+    """
+    Every dump in a single SQLite file, in a table with the key as its primary key:
+        dumps(key TEXT PRIMARY KEY, data TEXT, hash TEXT)
+    hash is the sha1 of data, so the manifest can be read without touching the data.
+    The primary key doubles as the index of the queries that were already parsed, so checking
+    for a dump doesn't touch the data, and a batch is written in one transaction instead of one file per word.
+    The database is opened in WAL mode, so readers aren't blocked while dumps are being written.
+    One connection is shared between threads. Call close when done so that the WAL is
+    checkpointed back into the database file.
+    """
+    def __init__(self, db_path: str):
+        super().__init__(path=db_path)
+        self._connection = cast(sqlite3.Connection, None)
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            db_dir = os.path.dirname(self.path)
+            if db_dir != '':
+                os.makedirs(db_dir, exist_ok=True)
+            connection = sqlite3.connect(self.path, check_same_thread=False)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute('CREATE TABLE IF NOT EXISTS dumps (key TEXT PRIMARY KEY, data TEXT NOT NULL, hash TEXT NOT NULL)')
+            columns = [row[1] for row in connection.execute('PRAGMA table_info(dumps)')]
+            if 'hash' not in columns:
+                # Stores created before the hash column was added. The hashes are filled in once here.
+                connection.create_function('sha1', 1, lambda data: hashlib.sha1(data.encode('utf-8')).hexdigest())
+                connection.execute('ALTER TABLE dumps ADD COLUMN hash TEXT')
+                connection.execute('UPDATE dumps SET hash = sha1(data)')
+            connection.commit()
+            self._connection = connection
+        return self._connection
+
+    def __getstate__(self) -> dict:
+        # Lets the store be sent to worker processes, which open their own connection.
+        return {'path': self.path}
+
+    def __setstate__(self, state: dict):
+        self.__init__(db_path=state['path'])
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            return self._connect().execute('SELECT 1 FROM dumps WHERE key = ?', (key,)).fetchone() is not None
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connect().execute('SELECT COUNT(*) FROM dumps').fetchone()[0]
+
+    @property
+    def exists(self) -> bool:
+        return file_exists(self.path)
+
+    def keys(self) -> List[str]:
+        with self._lock:
+            return [row[0] for row in self._connect().execute('SELECT key FROM dumps ORDER BY key')]
+
+    def load_dict(self, key: str) -> dict:
+        with self._lock:
+            row = self._connect().execute('SELECT data FROM dumps WHERE key = ?', (key,)).fetchone()
+        return json.loads(row[0]) if row is not None else None
+
+    def load_dicts(self, keys: List[str], batch_size: int=500) -> Dict[str, dict]:
+        # Chunked so that the number of parameters stays under SQLite's limit.
+        item_dicts = cast(Dict[str, dict], {})
+        keys = list(dict.fromkeys(keys))
+        with self._lock:
+            connection = self._connect()
+            for i in range(0, len(keys), batch_size):
+                batch = keys[i:i+batch_size]
+                rows = connection.execute(
+                    f"SELECT key, data FROM dumps WHERE key IN ({', '.join(['?'] * len(batch))})", batch
+                ).fetchall()
+                for key, data in rows:
+                    item_dicts[key] = json.loads(data)
+        return item_dicts
+
+    def save_dicts(self, item_dicts: Dict[str, dict]):
+        rows = []
+        for key, item_dict in item_dicts.items():
+            data = json.dumps(item_dict, ensure_ascii=False)
+            rows.append((key, data, hashlib.sha1(data.encode('utf-8')).hexdigest()))
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                connection.executemany('INSERT OR REPLACE INTO dumps (key, data, hash) VALUES (?, ?, ?)', rows)
+        self._update_version()
+
+    def get_manifest(self, previous: DumpManifest=None) -> DumpManifest:
+        with self._lock:
+            rows = self._connect().execute('SELECT key, length(data), hash FROM dumps ORDER BY key').fetchall()
+        return DumpManifest(store_path=self.path, entries={key: [size, None, content_hash] for key, size, content_hash in rows})
+
+    def iter_items(self, batch_size: int=1000) -> Iterator[tuple]:
+        with self._lock:
+            rows = self._connect().execute('SELECT key, data FROM dumps ORDER BY key').fetchall()
+        for key, data in rows:
+            yield key, json.loads(data)
+
+    def delete(self, key: str):
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                connection.execute('DELETE FROM dumps WHERE key = ?', (key,))
+        self._update_version()
+
+    def clear(self):
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                connection.execute('DELETE FROM dumps')
+        self._update_version()
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None:
+                self._connection.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+                self._connection.close()
+                self._connection = None
+
+def get_dump_store(dump_dir: str, backend: str='dir') -> DumpStore:
+    """
+    backend='dir': dump_dir itself, with one json file per key.
+    backend='sqlite': A single database file next to dump_dir, i.e. <dump_dir>.sqlite3
+    """
+    assert backend in dump_store_backends, f'Invalid dump store backend: {backend}. Valid backends: {dump_store_backends}'
+    if backend == 'dir':
+        return DirectoryDumpStore(dump_dir)
+    else:
+        return SQLiteDumpStore(f"{dump_dir.rstrip('/')}.sqlite3")
+
+def migrate_dump_store(src: DumpStore, dst: DumpStore, batch_size: int=1000, overwrite: bool=False, show_pbar: bool=True) -> int:
+    """
+    Copies every dump in src to dst in batches, e.g. an existing dump directory into a SQLiteDumpStore.
+    Keys that are already in dst are skipped unless overwrite is True, so an interrupted migration can be resumed.
+    Returns the number of dumps that were copied.
+    """
+    keys = src.keys()
+    if not overwrite:
+        existing_keys = set(dst.keys())
+        keys = [key for key in keys if key not in existing_keys]
+    pbar = tqdm(total=len(keys), unit='dump(s)') if show_pbar else None
+    if pbar is not None:
+        pbar.set_description(f'Migrating {src.path} to {dst.path}')
+    for i in range(0, len(keys), batch_size):
+        batch = keys[i:i+batch_size]
+        dst.save_dicts(src.load_dicts(batch))
+        if pbar is not None:
+            pbar.update(len(batch))
+    if pbar is not None:
+        pbar.close()
+    return len(keys)
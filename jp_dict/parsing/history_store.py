@@ -0,0 +1,202 @@
+from __future__ import annotations
+import os
+import json
+from typing import List, Dict, Iterable, Iterator, cast
+from common_utils.base.basic import BasicLoadableObject, BasicLoadableHandler, BasicHandler
+from common_utils.file_utils import file_exists, make_dir_if_not_exists, delete_file_if_exists
+from ..util.time_utils import get_utc_time_from_time_usec, get_time_usec_from_utc_time, \
+    get_current_time_usec
+from ..util.json_utils import iter_json_array_items
+from .browser_history import BrowserHistoryItem, BrowserHistoryItemList, \
+    CommonBrowserHistoryItemGroupList, CommonBrowserHistoryItemGroupBuilder
+
+class HistoryPartitionInfo(BasicLoadableObject['HistoryPartitionInfo']):
+    def __init__(
+        self, name: str, start_time_usec: int, end_time_usec: int,
+        min_time_usec: int=None, max_time_usec: int=None, item_count: int=0
+    ):
+        super().__init__()
+        self.name = name
+        self.start_time_usec = start_time_usec # Start of the month (inclusive)
+        self.end_time_usec = end_time_usec # Start of the next month (exclusive)
+        self.min_time_usec = min_time_usec
+        self.max_time_usec = max_time_usec
+        self.item_count = item_count
+
+    def overlaps(self, start_time_usec: int=None, end_time_usec: int=None) -> bool:
+        if self.item_count == 0:
+            return False
+        if start_time_usec is not None and self.max_time_usec < start_time_usec:
+            return False
+        if end_time_usec is not None and self.min_time_usec >= end_time_usec:
+            return False
+        return True
+
+class HistoryPartitionInfoList(
+    BasicLoadableHandler['HistoryPartitionInfoList', 'HistoryPartitionInfo'],
+    BasicHandler['HistoryPartitionInfoList', 'HistoryPartitionInfo']
+):
+    def __init__(self, info_list: List[HistoryPartitionInfo]=None):
+        super().__init__(obj_type=HistoryPartitionInfo, obj_list=info_list)
+        self.info_list = self.obj_list
+
+    @classmethod
+    def from_dict_list(cls, dict_list: List[dict]) -> HistoryPartitionInfoList:
+        return HistoryPartitionInfoList([HistoryPartitionInfo.from_dict(item_dict) for item_dict in dict_list])
+
+class PartitionedBrowserHistoryStore:
+    """
+    Browser history split into one segment per UTC month.
+    Each segment is a BrowserHistory json file sorted by time_usec, and index.json records
+    the time range covered by each segment.
+    Range queries only load the segments that overlap with the range,
+    and find the boundaries inside a segment by bisecting its timestamps.
+    """
+    def __init__(self, store_dir: str):
+        self.store_dir = store_dir
+        self.index = HistoryPartitionInfoList.load_from_path(self.index_path) if file_exists(self.index_path) else HistoryPartitionInfoList()
+
+    @property
+    def index_path(self) -> str:
+        return f'{self.store_dir}/index.json'
+
+    @property
+    def exists(self) -> bool:
+        return file_exists(self.index_path)
+
+    def __len__(self) -> int:
+        return sum([info.item_count for info in self.index])
+
+    @staticmethod
+    def get_partition_bounds(time_usec: int) -> (str, int, int):
+        utc_time = get_utc_time_from_time_usec(time_usec)
+        month_start = utc_time.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        if month_start.month == 12:
+            next_month_start = month_start.replace(year=month_start.year + 1, month=1)
+        else:
+            next_month_start = month_start.replace(month=month_start.month + 1)
+        return (
+            month_start.strftime('%Y-%m'),
+            get_time_usec_from_utc_time(month_start),
+            get_time_usec_from_utc_time(next_month_start)
+        )
+
+    def _get_partition_path(self, name: str) -> str:
+        return f'{self.store_dir}/{name}.json'
+
+    def _get_info(self, name: str) -> HistoryPartitionInfo:
+        for info in self.index:
+            if info.name == name:
+                return info
+        return None
+
+    def _load_partition(self, name: str) -> List[dict]:
+        return json.load(open(self._get_partition_path(name), 'r'))['Browser History']
+
+    def _save_index(self):
+        self.index.obj_list.sort(key=lambda info: info.start_time_usec)
+        self.index.save_to_path(self.index_path, overwrite=True)
+
+    def clear(self):
+        for info in self.index:
+            delete_file_if_exists(self._get_partition_path(info.name))
+        self.index = HistoryPartitionInfoList()
+        delete_file_if_exists(self.index_path)
+
+    def add_item_dicts(self, item_dicts: Iterable[dict]):
+        """
+        Adds rows to the segments of their months. Only the affected segments are rewritten.
+        Rows whose time_usec is already in the store are ignored.
+        """
+        make_dir_if_not_exists(self.store_dir)
+        partition_dicts = cast(Dict[str, List[dict]], {})
+        partition_bounds = cast(Dict[str, tuple], {})
+        for item_dict in item_dicts:
+            name, start_time_usec, end_time_usec = self.get_partition_bounds(item_dict['time_usec'])
+            if name not in partition_dicts:
+                partition_dicts[name] = []
+                partition_bounds[name] = (start_time_usec, end_time_usec)
+            partition_dicts[name].append(item_dict)
+
+        for name, new_item_dicts in partition_dicts.items():
+            info = self._get_info(name)
+            if info is None:
+                start_time_usec, end_time_usec = partition_bounds[name]
+                info = HistoryPartitionInfo(name=name, start_time_usec=start_time_usec, end_time_usec=end_time_usec)
+                self.index.append(info)
+                existing_item_dicts = []
+            else:
+                existing_item_dicts = self._load_partition(name)
+            time_usec_set = set([item_dict['time_usec'] for item_dict in existing_item_dicts])
+            merged_item_dicts = existing_item_dicts
+            for item_dict in new_item_dicts:
+                if item_dict['time_usec'] not in time_usec_set:
+                    time_usec_set.add(item_dict['time_usec'])
+                    merged_item_dicts.append(item_dict)
+            merged_item_dicts.sort(key=lambda item_dict: item_dict['time_usec'])
+            json.dump(
+                {'Browser History': merged_item_dicts},
+                open(self._get_partition_path(name), 'w'),
+                indent=2, ensure_ascii=False
+            )
+            info.item_count = len(merged_item_dicts)
+            info.min_time_usec = merged_item_dicts[0]['time_usec']
+            info.max_time_usec = merged_item_dicts[-1]['time_usec']
+        self._save_index()
+
+    def add_items(self, items: Iterable[BrowserHistoryItem]):
+        self.add_item_dicts(item.to_dict() for item in items)
+
+    @classmethod
+    def from_history_path(cls, store_dir: str, history_path: str) -> PartitionedBrowserHistoryStore:
+        """
+        Builds the store from a BrowserHistory.json file or a saved combined history,
+        replacing any segments that were already in store_dir.
+        """
+        store = PartitionedBrowserHistoryStore(store_dir)
+        store.clear()
+        store.add_item_dicts(iter_json_array_items(history_path, key='Browser History'))
+        return store
+
+    @staticmethod
+    def _bisect_time_usec(item_dicts: List[dict], time_usec: int) -> int:
+        # Same as bisect_left on the time_usec of the sorted rows, without building that list.
+        # (bisect only takes a key function from Python 3.10.)
+        lo, hi = 0, len(item_dicts)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if item_dicts[mid]['time_usec'] < time_usec:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def iter_item_dicts(self, start_time_usec: int=None, end_time_usec: int=None, url_base: str=None) -> Iterator[dict]:
+        """
+        Rows with start_time_usec <= time_usec < end_time_usec, ordered by time_usec.
+        Either bound can be omitted.
+        """
+        for info in self.index:
+            if not info.overlaps(start_time_usec=start_time_usec, end_time_usec=end_time_usec):
+                continue
+            item_dicts = self._load_partition(info.name)
+            start_idx = self._bisect_time_usec(item_dicts, start_time_usec) if start_time_usec is not None else 0
+            end_idx = self._bisect_time_usec(item_dicts, end_time_usec) if end_time_usec is not None else len(item_dicts)
+            for item_dict in item_dicts[start_idx:end_idx]:
+                if url_base is None or item_dict['url'].startswith(url_base):
+                    yield item_dict
+
+    def query(self, start_time_usec: int=None, end_time_usec: int=None, url_base: str=None) -> BrowserHistoryItemList:
+        return BrowserHistoryItemList.from_dict_list(
+            list(self.iter_item_dicts(start_time_usec=start_time_usec, end_time_usec=end_time_usec, url_base=url_base))
+        )
+
+    def query_groups(self, start_time_usec: int=None, end_time_usec: int=None, url_base: str=None) -> CommonBrowserHistoryItemGroupList:
+        builder = CommonBrowserHistoryItemGroupBuilder()
+        for item_dict in self.iter_item_dicts(start_time_usec=start_time_usec, end_time_usec=end_time_usec, url_base=url_base):
+            builder.add_dict(item_dict)
+        return builder.build()
+
+    def query_last_n_days(self, n: float, url_base: str=None, now_time_usec: int=None) -> BrowserHistoryItemList:
+        now_time_usec = now_time_usec if now_time_usec is not None else get_current_time_usec()
+        return self.query(start_time_usec=now_time_usec - int(n * 24 * 3600 * 10**6), url_base=url_base)
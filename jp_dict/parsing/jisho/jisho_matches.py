@@ -1,8 +1,9 @@
 from __future__ import annotations
-from typing import List, Dict
+from typing import List, Dict, cast
 from tqdm import tqdm
 from .jisho_structs import DictionaryEntry, DictionaryEntryList
 from ..browser_history import CommonBrowserHistoryItemGroupList
+from ...util.handler_utils import IdIndexedHandlerMixin
 from common_utils.base.basic import BasicLoadableIdObject, BasicLoadableIdHandler, BasicLoadableObject, BasicLoadableHandler, BasicHandler
 
 class DictionaryEntryMatch(BasicLoadableIdObject['DictionaryEntryMatch']):
@@ -48,6 +49,14 @@ class DictionaryEntryMatch(BasicLoadableIdObject['DictionaryEntryMatch']):
             else:
                 self.search_words_time_usec[search_word] = history_item.time_usec
     
+    @staticmethod
+    def get_content_id(content_hash: str) -> int:
+        """
+        Id derived from DictionaryEntry.content_hash, so that the same entry always gets the same id
+        no matter in which order the entries are pruned. The first 60 bits keep it a (json safe) int.
+        """
+        return int(content_hash[:15], 16)
+
     @property
     def unique_search_word(self) -> str:
         if len(self.search_words) == 1:
@@ -58,6 +67,7 @@ class DictionaryEntryMatch(BasicLoadableIdObject['DictionaryEntryMatch']):
             raise ValueError(f"len({type(self).__name__}.search_words) > 1")
 
 class DictionaryEntryMatchList(
+    IdIndexedHandlerMixin,
     BasicLoadableIdHandler['DictionaryEntryMatchList', 'DictionaryEntryMatch'],
     BasicLoadableHandler['DictionaryEntryMatchList', 'DictionaryEntryMatch'],
     BasicHandler['DictionaryEntryMatchList', 'DictionaryEntryMatch']
@@ -104,7 +114,22 @@ class DictionaryEntryMatchList(
     def entries(self) -> DictionaryEntryList:
         return DictionaryEntryList([item.entry for item in self])
 
-    def add_pruned_matches(self, handler: SearchWordMatchesHandler, mode: int=0, show_pbar: bool=True, leave_pbar: bool=True, debug_verbose: bool=False):
+    def get_content_hashes(self) -> Dict[int, str]:
+        """
+        id -> DictionaryEntry.content_hash of every item.
+        """
+        return {item.id: item.entry.content_hash for item in self}
+
+    def get_entry_signature_index(self) -> Dict[tuple, int]:
+        """
+        DictionaryEntry.nonstrict_signature -> index of the first item with that entry.
+        """
+        signature_index = cast(Dict[tuple, int], {})
+        for idx, item in enumerate(self):
+            signature_index.setdefault(item.entry.nonstrict_signature, idx)
+        return signature_index
+
+    def add_pruned_matches(self, handler: SearchWordMatchesHandler, mode: int=0, show_pbar: bool=True, leave_pbar: bool=True, debug_verbose: bool=False) -> Dict[int, str]:
         """
         Possible modes
             0: Process only first entry only. Ignore if entry already exists in matches.
@@ -117,31 +142,47 @@ class DictionaryEntryMatchList(
                 Cons: Overlooks some useful entries that are not listed first. May also pick up some redundant entries.
             1:
                 Pros: Strictly avoids redundant entries while resolving some non-unique cases.
-                Cons: Slow. Can ignores non-trivial entries if the same written form has already been matched.
+                Cons: Can ignores non-trivial entries if the same written form has already been matched.
             2:
                 Pros: Focuses on finding as many matches as possible, including those that have already been matched with the same written form.
-                Cons: Slow. Can pick up many redundant entries.
+                Cons: Can pick up many redundant entries.
+
+        Existing items are looked up by DictionaryEntry.nonstrict_signature, so every mode is linear in the number of matches.
+        Added matches get the id of their content (refer to DictionaryEntryMatch.get_content_id).
+        Pruned entries have distinct contents, so the next free id is only taken in the unlikely case of a hash collision.
+        Returns id -> DictionaryEntry.content_hash of the added matches.
         """
+        signature_index = self.get_entry_signature_index()
+        used_ids = set(self.ids)
+        content_hashes = cast(Dict[int, str], {})
+
+        def add_match(entry_match: DictionaryEntryMatch):
+            content_hash = entry_match.entry.content_hash
+            entry_id = DictionaryEntryMatch.get_content_id(content_hash)
+            while entry_id in used_ids:
+                entry_id += 1
+            used_ids.add(entry_id)
+            content_hashes[entry_id] = content_hash
+            entry_match.id = entry_id
+            signature_index.setdefault(entry_match.entry.nonstrict_signature, len(self))
+            self.append(entry_match)
+
         def process_first_match_only(handler: SearchWordMatchesHandler, pbar: tqdm=None):
             for match in handler.first_matches:
                 if pbar is not None:
                     pbar.set_description(match.unique_search_word)
-                found = False
-                for item in self:
-                    # if item.entry == match.entry:
-                    if item.entry.same_entry_as(match.entry, strict=False):
-                        if match.unique_search_word not in item.search_words:
-                            item.search_words.append(match.unique_search_word)
-                            item.history_group_id_list.extend(match.history_group_id_list)
-                        else:
-                            raise Exception(f"Encountered duplicate search_word: {match.unique_search_word}")
-                        found = True
-                        if debug_verbose:
-                            print(f'{item.entry.word_representation.simple_repr}: {item.search_words}')
-                        break
-                if not found:
-                    match.id = len(self)
-                    self.append(match)
+                idx = signature_index.get(match.entry.nonstrict_signature)
+                if idx is not None:
+                    item = self[idx]
+                    if match.unique_search_word not in item.search_words:
+                        item.search_words.append(match.unique_search_word)
+                        item.history_group_id_list.extend(match.history_group_id_list)
+                    else:
+                        raise Exception(f"Encountered duplicate search_word: {match.unique_search_word}")
+                    if debug_verbose:
+                        print(f'{item.entry.word_representation.simple_repr}: {item.search_words}')
+                else:
+                    add_match(match)
                 if pbar is not None:
                     pbar.update()
 
@@ -158,32 +199,26 @@ class DictionaryEntryMatchList(
             for sw_matches in handler:
                 if pbar is not None:
                     pbar.set_description(sw_matches.search_word)
-                found = False
-                for item in self:
-                    for entry in sw_matches.matches:
-                        # if item.entry == entry:
-                        if item.entry.same_entry_as(entry, strict=False):
-                            if sw_matches.search_word not in item.search_words:
-                                item.search_words.append(sw_matches.search_word)
-                                item.history_group_id_list.append(sw_matches.history_group_id)
-                            else:
-                                raise Exception(f"Encountered duplicate search_word: {sw_matches.search_word}")
-                            found = True
-                            if debug_verbose:
-                                print(f'{item.entry.word_representation.simple_repr}: {item.search_words}')
-                            break
-                    if found:
-                        break
-                if found:
-                    pass
+                # The earliest item that matches any of the entries.
+                matched_idx_list = [signature_index.get(entry.nonstrict_signature) for entry in sw_matches.matches]
+                matched_idx_list = [idx for idx in matched_idx_list if idx is not None]
+                if len(matched_idx_list) > 0:
+                    item = self[min(matched_idx_list)]
+                    if sw_matches.search_word not in item.search_words:
+                        item.search_words.append(sw_matches.search_word)
+                        item.history_group_id_list.append(sw_matches.history_group_id)
+                    else:
+                        raise Exception(f"Encountered duplicate search_word: {sw_matches.search_word}")
+                    if debug_verbose:
+                        print(f'{item.entry.word_representation.simple_repr}: {item.search_words}')
                 else:
-                    entry_match = DictionaryEntryMatch(
-                        entry=sw_matches.matches[0],
-                        search_words=[sw_matches.search_word],
-                        history_group_id_list=[sw_matches.history_group_id]
+                    add_match(
+                        DictionaryEntryMatch(
+                            entry=sw_matches.matches[0],
+                            search_words=[sw_matches.search_word],
+                            history_group_id_list=[sw_matches.history_group_id]
+                        )
                     )
-                    entry_match.id = len(self)
-                    self.append(entry_match)
                 if pbar is not None:
                     pbar.update()
         elif mode == 2:
@@ -195,27 +230,20 @@ class DictionaryEntryMatchList(
                 first_nonmatched_entry = None
                 first_matched_item = None
                 for entry in sw_matches.matches:
-                    matched_item = None
-                    for item in self:
-                        # if item.entry == entry:
-                        if item.entry.same_entry_as(entry, strict=False):
-                            if matched_item is None:
-                                matched_item = item
-                            else:
-                                pass
-                    if matched_item is None:
+                    idx = signature_index.get(entry.nonstrict_signature)
+                    if idx is None:
                         first_nonmatched_entry = entry
                         break
                     else:
-                        first_matched_item = matched_item
+                        first_matched_item = self[idx]
                 if first_nonmatched_entry is not None:
-                    entry_match = DictionaryEntryMatch(
-                        entry=first_nonmatched_entry,
-                        search_words=[sw_matches.search_word],
-                        history_group_id_list=[sw_matches.history_group_id]
+                    add_match(
+                        DictionaryEntryMatch(
+                            entry=first_nonmatched_entry,
+                            search_words=[sw_matches.search_word],
+                            history_group_id_list=[sw_matches.history_group_id]
+                        )
                     )
-                    entry_match.id = len(self)
-                    self.append(entry_match)
                 elif first_matched_item is not None:
                     if sw_matches.search_word not in first_matched_item.search_words:
                         first_matched_item.search_words.append(sw_matches.search_word)
@@ -233,6 +261,47 @@ class DictionaryEntryMatchList(
 
         if pbar is not None:
             pbar.close()
+        return content_hashes
+
+class DictionaryEntryMatchIdMap(BasicLoadableObject['DictionaryEntryMatchIdMap']):
+    """
+    How the ids of the pruned entries changed from one pruning to the next.
+        id_map: old id -> new id of every entry whose content is unchanged.
+        added_ids: New ids of the entries that weren't there before.
+        removed_ids: Old ids of the entries that are gone.
+    Ids that were assigned in processing order by older versions are mapped to content ids as well.
+    """
+    def __init__(self, id_map: Dict[int, int]=None, added_ids: List[int]=None, removed_ids: List[int]=None):
+        super().__init__()
+        self.id_map = id_map if id_map is not None else {}
+        self.added_ids = added_ids if added_ids is not None else []
+        self.removed_ids = removed_ids if removed_ids is not None else []
+
+    @classmethod
+    def from_dict(cls, item_dict: dict) -> DictionaryEntryMatchIdMap:
+        return DictionaryEntryMatchIdMap(
+            id_map={int(old_id): new_id for old_id, new_id in item_dict['id_map'].items()}, # json keys are strings
+            added_ids=item_dict['added_ids'],
+            removed_ids=item_dict['removed_ids']
+        )
+
+    @classmethod
+    def from_content_hashes(cls, old_content_hashes: Dict[int, str], new_content_hashes: Dict[int, str]) -> DictionaryEntryMatchIdMap:
+        """
+        old_content_hashes, new_content_hashes: id -> DictionaryEntry.content_hash before and after pruning.
+        """
+        new_id_index = {content_hash: new_id for new_id, content_hash in new_content_hashes.items()}
+        id_map = cast(Dict[int, int], {})
+        removed_ids = []
+        for old_id, content_hash in old_content_hashes.items():
+            new_id = new_id_index.get(content_hash)
+            if new_id is not None:
+                id_map[old_id] = new_id
+            else:
+                removed_ids.append(old_id)
+        mapped_new_ids = set(id_map.values())
+        added_ids = [new_id for new_id in new_content_hashes.keys() if new_id not in mapped_new_ids]
+        return DictionaryEntryMatchIdMap(id_map=id_map, added_ids=added_ids, removed_ids=removed_ids)
 
 class SearchWordMatches(BasicLoadableObject['SearchWordMatches']):
     def __init__(self, search_word: str, matches: DictionaryEntryList=None, history_group_id: int=None):
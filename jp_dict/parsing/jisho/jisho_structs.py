@@ -1,11 +1,12 @@
 from __future__ import annotations
 from typing import List, Any, cast
-import urllib3
-from bs4 import BeautifulSoup
 from bs4.element import Tag
 from common_utils.base.basic import BasicLoadableObject, BasicLoadableHandler, BasicHandler
 from logger import logger
 from ..util.char_lists import hiragana_chars, katakana_chars, misc_kana_chars
+from ...util.http_utils import HttpClient, get_default_http_client
+from ...util.hash_utils import get_json_hash
+from ..util.soup_utils import get_soup
 from ..common import Link, LinkList
 
 class WordRepresentationPart(BasicLoadableObject['WordRepresentationPart']):
@@ -1163,6 +1164,37 @@ class DictionaryEntry(BasicLoadableObject['DictionaryEntry']):
             meaning_section=MeaningSection.from_dict(item_dict['meaning_section'])
         )
     
+    @property
+    def nonstrict_signature(self) -> tuple:
+        """
+        Hashable key of the fields compared by same_entry_as(strict=False):
+        the word representation, the number of meaning groups and the other forms.
+        Two entries have the same signature exactly when they are the same non-strict entry.
+        """
+        word_representation = self.word_representation
+        other_forms = self.meaning_section.other_forms
+        return (
+            word_representation.writing, word_representation.reading,
+            tuple(word_representation.reading2writing_idx_list) if word_representation.reading2writing_idx_list is not None else None,
+            len(self.meaning_section.meaning_groups),
+            tuple([(other_form.writing, other_form.reading) for other_form in other_forms]) if other_forms is not None else None
+        )
+
+    @staticmethod
+    def get_content_hash_from_dict(item_dict: dict) -> str:
+        """
+        content_hash of the entry that item_dict (as given by to_dict) represents, without loading it.
+        """
+        return get_json_hash({'word_representation': item_dict['word_representation'], 'meaning_section': item_dict['meaning_section']})
+
+    @property
+    def content_hash(self) -> str:
+        """
+        sha1 of the word representation and the meaning section (senses, other forms, notes) of the entry.
+        Concept labels and supplementary links are left out, since they can change on Jisho without the entry changing.
+        """
+        return get_json_hash({'word_representation': self.word_representation.to_dict(), 'meaning_section': self.meaning_section.to_dict()})
+
     def same_entry_as(self, other, strict: bool=True) -> bool:
         if isinstance(other, DictionaryEntry):
             if strict:
@@ -1379,12 +1411,23 @@ class JishoSearchQueryHandler(
         return JishoSearchQueryHandler([JishoSearchQuery.from_dict(item_dict) for item_dict in dict_list])
 
 class JishoSearchHtmlParser:
-    def __init__(self, url: str):
+    def __init__(self, url: str, fetch_url: str=None, http: HttpClient=None, html: bytes=None, backend: str='html.parser'):
+        """
+        fetch_url: Where the html is actually downloaded from, e.g. a mirror or a local server.
+                   url is still used for the parsed results and as the key of the raw html cache,
+                   so that ParserManager.reparse_raw_html finds the page. Defaults to url.
+        http: Defaults to the HttpClient shared by the whole process.
+        html: The page that was already downloaded from url. Nothing is fetched when this is given.
+        backend: 'html.parser' builds the whole page. 'lxml' only builds <title> and div#main_results, which is all that parse uses.
+        """
         assert url.startswith('https://jisho.org/search/')
         self._url = url
-        self._http = urllib3.PoolManager()
-        page = self._http.request(method='GET', url=url)
-        self._soup = BeautifulSoup(page.data, 'html.parser')
+        if html is None:
+            self._http = http if http is not None else get_default_http_client()
+            html = self._http.get(fetch_url if fetch_url is not None else url, cache_key=url).data
+        else:
+            self._http = http
+        self._soup = get_soup(html, backend=backend, element_id='main_results')
 
     @property
     def url(self) -> str:
@@ -1402,9 +1445,13 @@ class JishoSearchHtmlParser:
         return decoded_search_word
 
     @classmethod
-    def from_search_word(cls, search_word: str) -> JishoSearchHtmlParser:
+    def from_search_word(cls, search_word: str, http: HttpClient=None, backend: str='html.parser') -> JishoSearchHtmlParser:
         search_url = f'https://jisho.org/search/{search_word}'
-        return JishoSearchHtmlParser(url=search_url)
+        return JishoSearchHtmlParser(url=search_url, http=http, backend=backend)
+
+    @classmethod
+    def from_html(cls, html: bytes, url: str, backend: str='html.parser') -> JishoSearchHtmlParser:
+        return JishoSearchHtmlParser(url=url, html=html, backend=backend)
 
     def parse(self, history_group_id: int=None) -> JishoSearchQuery:
         main_results_html = self._soup.find(name='div', attrs={'id': 'main_results'})
@@ -1,6 +1,5 @@
 from __future__ import annotations
 from typing import List
-import os
 from webbot import Browser
 from bs4 import BeautifulSoup
 from tqdm import tqdm
@@ -9,6 +8,7 @@ from common_utils.base.basic import BasicLoadableObject, BasicLoadableHandler, \
 from ..anki.note_structs import ParsedKanjiFields, ParsedKanjiFieldsList
 from ..parsing.combined.kanji_info import WritingKanjiInfoList
 from ..anki.connect import AnkiConnect
+from .dump_store import DumpStore, DirectoryDumpStore
 
 class KoohiiResult(BasicLoadableObject['KoohiiResult']):
     def __init__(
@@ -280,17 +280,20 @@ class KoohiiParser:
         save_dir: str='kanji_save',
         force: bool=False, show_pbar: bool=True, leave_pbar: bool=True,
         combined_save_path: str=None,
-        learned_kanji_txt_path: str=None, filtered_dump_path: str=None
+        learned_kanji_txt_path: str=None, filtered_dump_path: str=None,
+        dump_store: DumpStore=None
     ):
+        """
+        dump_store: Where the parsed kanji are kept, keyed by kanji. Takes precedence over save_dir.
+        """
+        dump_store = dump_store if dump_store is not None else DirectoryDumpStore(save_dir)
         combined_results = KoohiiResultList() if combined_save_path is not None else None
         pbar = tqdm(total=len(kanji_info_list), unit='kanji', leave=leave_pbar) if show_pbar else None
         for kanji_info in kanji_info_list:
             if pbar is not None:
                 pbar.set_description(f'Parsing Koohii Data For: {kanji_info.kanji}')
-            if not os.path.isdir(save_dir):
-                os.mkdir(save_dir)
-            save_path = f'{save_dir}/{kanji_info.kanji}.json'
-            if not os.path.isfile(save_path) or force:
+            result_dict = dump_store.load_dict(kanji_info.kanji)
+            if result_dict is None or force:
                 result = self.parse(
                     kanji_info.kanji,
                     hit_count=kanji_info.hit_count, used_in=kanji_info.used_in,
@@ -298,12 +301,12 @@ class KoohiiParser:
                     earliest_pos_idx=kanji_info.earliest_pos_idx
                 )
             else:
-                result = KoohiiResult.load_from_path(save_path)
+                result = KoohiiResult.from_dict(result_dict)
                 result.hit_count = kanji_info.hit_count
                 result.used_in = kanji_info.used_in
                 result.earliest_time_usec = kanji_info.earliest_time_usec
                 result.earliest_pos_idx = kanji_info.earliest_pos_idx
-            result.save_to_path(save_path, overwrite=True)
+            dump_store.save_dict(kanji_info.kanji, result.to_dict())
             if combined_results is not None:
                 combined_results.append(result)
             if pbar is not None:
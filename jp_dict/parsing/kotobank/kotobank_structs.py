@@ -1,14 +1,16 @@
 from __future__ import annotations
-import urllib3
-from bs4 import BeautifulSoup
 from bs4.element import Tag
-from typing import List, Dict
+from typing import List, Dict, cast
+import threading
 from common_utils.base.basic import BasicLoadableObject, BasicLoadableHandler, BasicHandler
 from common_utils.path_utils import get_all_files_of_extension
 from common_utils.file_utils import dir_exists
 from typing import Any
 from collections import OrderedDict
 from tqdm import tqdm
+from ...util.http_utils import HttpClient, get_default_http_client
+from ..util.soup_utils import get_soup
+from ..dump_store import DumpStore
 
 from .digital_daijisen import parse as parse_digital_daijisen, ParsedItemListHandler as DigitalDaijisenDataHandler
 from .seisenpan import parse as parse_seisenpan, ParsedArticleList as SeisenpanDataHandler
@@ -252,6 +254,21 @@ class KotobankResultList(
             pbar.close()
         return results
 
+    @classmethod
+    def load_from_dump_store(cls, dump_store: DumpStore, show_pbar: bool=True) -> KotobankResultList:
+        assert dump_store.exists, f'Dump store not found: {dump_store.path}'
+        pbar = tqdm(total=len(dump_store), unit='dump(s)') if show_pbar else None
+        if pbar is not None:
+            pbar.set_description('Loading Kotobank results from dump store')
+        results = KotobankResultList()
+        for key, item_dict in dump_store.iter_items():
+            results.append(KotobankResult.from_dict(item_dict))
+            if pbar is not None:
+                pbar.update()
+        if pbar is not None:
+            pbar.close()
+        return results
+
     def get_dictionary_count(self, exclude_results_containing: List[str]=None) -> OrderedDict:
         count_dict = {}
         for result in self:
@@ -318,13 +335,113 @@ class KotobankResultList(
                 break
         return priority_dict
 
+class KotobankResultCacheStats(BasicLoadableObject['KotobankResultCacheStats']):
+    def __init__(self, hits: int=0, misses: int=0, evictions: int=0):
+        """
+        hits: Served from memory.
+        misses: Loaded and deserialized from the dump store (or not found there).
+        evictions: Dropped to stay within max_size.
+        """
+        super().__init__()
+        self.hits = hits
+        self.misses = misses
+        self.evictions = evictions
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total > 0 else 0.0
+
+class KotobankResultCache:
+    """
+    Bounded LRU cache of deserialized KotobankResults, keyed by search query.
+    Misses are loaded from dump_store, so a query that is linked to many entries is only read
+    and deserialized once while it stays in the cache.
+    Queries that aren't in dump_store aren't cached.
+    The same KotobankResult object is returned on every hit, so don't modify it.
+    """
+    def __init__(self, dump_store: DumpStore, max_size: int=4096):
+        assert max_size > 0, f'max_size must be positive: {max_size}'
+        self.dump_store = dump_store
+        self.max_size = max_size
+        self.stats = KotobankResultCacheStats()
+        self._results = cast(Dict[str, KotobankResult], OrderedDict())
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._results)
+
+    def __contains__(self, search_query: str) -> bool:
+        return search_query in self._results
+
+    def _put(self, search_query: str, result: KotobankResult):
+        # Expects self._lock to be held.
+        self._results[search_query] = result
+        self._results.move_to_end(search_query)
+        while len(self._results) > self.max_size:
+            self._results.popitem(last=False)
+            self.stats.evictions += 1
+
+    def put(self, search_query: str, result: KotobankResult):
+        """
+        Adds a result that was just parsed, e.g. right after it was saved to dump_store.
+        """
+        with self._lock:
+            self._put(search_query, result)
+
+    def get(self, search_query: str) -> KotobankResult:
+        """
+        None if search_query isn't in dump_store.
+        """
+        return self.get_many([search_query]).get(search_query)
+
+    def get_many(self, search_queries: List[str]) -> Dict[str, KotobankResult]:
+        """
+        Queries that aren't in dump_store are left out.
+        Every miss is loaded with a single load_dicts call.
+        """
+        results = cast(Dict[str, KotobankResult], {})
+        missing_queries = []
+        with self._lock:
+            for search_query in search_queries:
+                if search_query in results:
+                    continue
+                result = self._results.get(search_query)
+                if result is not None:
+                    self._results.move_to_end(search_query)
+                    self.stats.hits += 1
+                    results[search_query] = result
+                elif search_query not in missing_queries:
+                    self.stats.misses += 1
+                    missing_queries.append(search_query)
+        if len(missing_queries) > 0:
+            result_dicts = self.dump_store.load_dicts(missing_queries)
+            with self._lock:
+                for search_query, result_dict in result_dicts.items():
+                    result = KotobankResult.from_dict(result_dict)
+                    self._put(search_query, result)
+                    results[search_query] = result
+        return results
+
+    def clear(self):
+        with self._lock:
+            self._results.clear()
+
 class KotobankWordHtmlParser:
-    def __init__(self, url: str):
+    def __init__(self, url: str, http: HttpClient=None, html: bytes=None, backend: str='html.parser'):
+        """
+        http: Defaults to the HttpClient shared by the whole process.
+        html: The page that was already downloaded from url. Nothing is fetched when this is given.
+        backend: 'html.parser' builds the whole page. 'lxml' only builds <title> and div#contentArea, which is all that parse uses.
+        """
         assert url.startswith('https://kotobank.jp/word/')
         self._url = url
-        self._http = urllib3.PoolManager()
-        page = self._http.request(method='GET', url=url)
-        self._soup = BeautifulSoup(page.data, 'html.parser')
+        if html is None:
+            self._http = http if http is not None else get_default_http_client()
+            html = self._http.get(url).data
+        else:
+            self._http = http
+        self._soup = get_soup(html, backend=backend, element_id='contentArea')
 
     @property
     def url(self) -> str:
@@ -342,9 +459,13 @@ class KotobankWordHtmlParser:
         return decoded_search_word
 
     @classmethod
-    def from_search_word(cls, search_word: str) -> KotobankWordHtmlParser:
+    def from_search_word(cls, search_word: str, http: HttpClient=None, backend: str='html.parser') -> KotobankWordHtmlParser:
         search_url = f'https://kotobank.jp/word/{search_word}'
-        return KotobankWordHtmlParser(url=search_url)
+        return KotobankWordHtmlParser(url=search_url, http=http, backend=backend)
+
+    @classmethod
+    def from_html(cls, html: bytes, url: str, backend: str='html.parser') -> KotobankWordHtmlParser:
+        return KotobankWordHtmlParser(url=url, html=html, backend=backend)
 
     def parse(self) -> KotobankResult:
         content_area_html = self._soup.find(name='div', attrs={'id': 'contentArea'})
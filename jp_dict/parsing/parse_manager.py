@@ -1,48 +1,181 @@
 from __future__ import annotations
+import os
+import gzip
 import urllib
-from typing import List
+import threading
+from array import array
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from typing import List, Dict, Tuple, cast
 from tqdm import tqdm
 import json
-from common_utils.base.basic import BasicLoadableObject
+import numpy as np
+from common_utils.base.basic import BasicLoadableObject, BasicLoadableHandler, BasicHandler
 from common_utils.file_utils import dir_exists, file_exists, make_dir_if_not_exists, \
     delete_all_files_in_dir, delete_file_if_exists, delete_dir_if_exists
 from common_utils.path_utils import recursively_get_all_matches_under_dirpath, \
     get_all_files_of_extension, get_rootname_from_path, get_all_files_of_extension
 from logger import logger
 
-from .browser_history import BrowserHistoryHandler, BrowserHistory, \
-    CommonBrowserHistoryItemGroupList
-from .jisho.jisho_structs import JishoSearchHtmlParser, JishoSearchQuery
+from ..util.hash_utils import get_file_hash
+from ..util.time_utils import get_current_time_usec
+from ..util.json_utils import iter_json_array_items, append_json_array_items, write_json_array_items, JsonlJournal
+from ..util.rate_limit_utils import HostRateLimiter
+from ..util.http_utils import HttpClient, HttpResponseCache, get_default_http_client
+from .browser_history import BrowserHistoryHandler, BrowserHistory, BrowserHistoryItem, \
+    BrowserHistoryItemList, CommonBrowserHistoryItemGroup, CommonBrowserHistoryItemGroupList, \
+    ColumnarBrowserHistoryItemList
+from .chrome_history import ChromeHistoryDatabase
+from .history_store import PartitionedBrowserHistoryStore
+from .pipeline import PipelineStage, Pipeline, PipelineStageReportList
+from .dump_store import DumpStore, DirectoryDumpStore, DumpManifest, dump_store_backends, get_dump_store, migrate_dump_store
+from .util.soup_utils import html_parser_backends
+from .jisho.jisho_structs import JishoSearchHtmlParser, JishoSearchQuery, DictionaryEntry
 from .jisho.jisho_matches import SearchWordMatchesHandler, \
     DictionaryEntryList, SearchWordMatches, \
-    DictionaryEntryMatch, DictionaryEntryMatchList
+    DictionaryEntryMatch, DictionaryEntryMatchList, DictionaryEntryMatchIdMap
 from .kotobank.kotobank_structs import KotobankWordHtmlParser, \
-    KotobankResult, KotobankResultList
+    KotobankResult, KotobankResultList, KotobankResultCache
 from .combined.combined_structs import CombinedResultList
 from .koohii import KoohiiParser
 
+def _reparse_jisho_html(task: tuple) -> Tuple[str, dict, str]:
+    # Runs in a worker process. Returns the dump key, the dump and an error message if parsing failed.
+    # The dumps are written by the main process, so that they can be saved to any DumpStore in batches.
+    body_path, url, history_group_id, key, backend = task
+    try:
+        with gzip.open(body_path, 'rb') as f:
+            html = f.read()
+        search_query = JishoSearchHtmlParser.from_html(html, url=url, backend=backend).parse(history_group_id=history_group_id)
+        return key, search_query.to_dict(), None
+    except Exception as e:
+        return key, None, f'{type(e).__name__}: {e}'
+
+def _reparse_kotobank_html(task: tuple) -> Tuple[str, dict, str]:
+    body_path, url, key, backend = task
+    try:
+        with gzip.open(body_path, 'rb') as f:
+            html = f.read()
+        result = KotobankWordHtmlParser.from_html(html, url=url, backend=backend).parse()
+        return key, result.to_dict(), None
+    except Exception as e:
+        return key, None, f'{type(e).__name__}: {e}'
+
+def _get_search_word_matches(search_word: str, query_dict: dict) -> SearchWordMatches:
+    # Entries whose writing is the search word, or if there are none, the entries whose reading is.
+    exact_matches = DictionaryEntryList()
+    query = JishoSearchQuery.from_dict(query_dict)
+    writing_match_idx_list = []
+    reading_match_idx_list = []
+    all_matches = query.exact_matches + query.nonexact_matches
+    for i in range(len(all_matches)):
+        if all_matches[i].word_representation.writing == search_word:
+            writing_match_idx_list.append(i)
+        if all_matches[i].word_representation.reading == search_word:
+            reading_match_idx_list.append(i)
+    if len(writing_match_idx_list) > 0:
+        for idx in writing_match_idx_list:
+            exact_matches.append(all_matches[idx])
+    elif len(reading_match_idx_list) > 0:
+        for idx in reading_match_idx_list:
+            exact_matches.append(all_matches[idx])
+    else:
+        pass
+    return SearchWordMatches(search_word=search_word, matches=exact_matches, history_group_id=query.history_group_id)
+
+def _load_search_word_matches(task: tuple) -> List[SearchWordMatches]:
+    # Can run in a worker process.
+    dump_store, keys = task
+    query_dicts = dump_store.load_dicts(keys)
+    return [_get_search_word_matches(key, query_dicts[key]) for key in keys if key in query_dicts]
+
+class BrowserHistoryExportInfo(BasicLoadableObject['BrowserHistoryExportInfo']):
+    def __init__(
+        self, path: str, content_hash: str, file_size: int=None, mtime: float=None,
+        max_time_usec: int=None
+    ):
+        super().__init__()
+        self.path = path
+        self.content_hash = content_hash
+        self.file_size = file_size
+        self.mtime = mtime
+        self.max_time_usec = max_time_usec # Watermark
+
+    @classmethod
+    def from_path(cls, path: str, max_time_usec: int=None) -> BrowserHistoryExportInfo:
+        return BrowserHistoryExportInfo(
+            path=path, content_hash=get_file_hash(path),
+            file_size=os.path.getsize(path), mtime=os.path.getmtime(path),
+            max_time_usec=max_time_usec
+        )
+
+    def is_unchanged(self, path: str) -> bool:
+        # Avoids rehashing exports that haven't been touched since they were ingested.
+        return self.path == path and file_exists(path) \
+            and self.file_size == os.path.getsize(path) and self.mtime == os.path.getmtime(path)
+
+class BrowserHistoryExportInfoList(
+    BasicLoadableHandler['BrowserHistoryExportInfoList', 'BrowserHistoryExportInfo'],
+    BasicHandler['BrowserHistoryExportInfoList', 'BrowserHistoryExportInfo']
+):
+    def __init__(self, info_list: List[BrowserHistoryExportInfo]=None):
+        super().__init__(obj_type=BrowserHistoryExportInfo, obj_list=info_list)
+        self.info_list = self.obj_list
+
+    @classmethod
+    def from_dict_list(cls, dict_list: List[dict]) -> BrowserHistoryExportInfoList:
+        return BrowserHistoryExportInfoList([BrowserHistoryExportInfo.from_dict(item_dict) for item_dict in dict_list])
+
+    @property
+    def content_hashes(self) -> List[str]:
+        return [info.content_hash for info in self]
+
 class ParserManagerMetaData(BasicLoadableObject['ParserManagerMetaData']):
     def __init__(
-        self, browser_history_paths: List[str]=None, requires_jisho_grouping: bool=False,
+        self, browser_history_paths: List[str]=None,
+        browser_history_exports: BrowserHistoryExportInfoList=None,
+        chrome_history_watermark: int=None,
+        requires_jisho_grouping: bool=False,
         requires_jisho_matching: bool=False, requires_jisho_match_pruning: bool=False,
         requires_load_time_usec: bool=False,
         requires_postmatching_redo: bool=False,
+        requires_kotobank_linking: bool=True,
         requires_kotobank_combine: bool=False,
         requires_jisho_kotobank_results_combine: bool=False,
         requires_filter_and_sort: bool=False,
         requires_parse_and_combine_koohii: bool=False
     ):
         self.browser_history_paths = browser_history_paths if browser_history_paths is not None else []
+        self.browser_history_exports = browser_history_exports if browser_history_exports is not None else BrowserHistoryExportInfoList()
+        self.chrome_history_watermark = chrome_history_watermark
         self.requires_jisho_grouping = requires_jisho_grouping
         self.requires_jisho_matching = requires_jisho_matching
         self.requires_jisho_match_pruning = requires_jisho_match_pruning
         self.requires_load_time_usec = requires_load_time_usec
         self.requires_postmatching_redo = requires_postmatching_redo
+        self.requires_kotobank_linking = requires_kotobank_linking
         self.requires_kotobank_combine = requires_kotobank_combine
         self.requires_jisho_kotobank_results_combine = requires_jisho_kotobank_results_combine
         self.requires_filter_and_sort = requires_filter_and_sort
         self.requires_parse_and_combine_koohii = requires_parse_and_combine_koohii
 
+    @classmethod
+    def from_dict(cls, item_dict: dict) -> ParserManagerMetaData:
+        return ParserManagerMetaData(
+            browser_history_paths=item_dict['browser_history_paths'],
+            browser_history_exports=BrowserHistoryExportInfoList.from_dict_list(item_dict['browser_history_exports']) if 'browser_history_exports' in item_dict else None,
+            chrome_history_watermark=item_dict['chrome_history_watermark'] if 'chrome_history_watermark' in item_dict else None,
+            requires_jisho_grouping=item_dict['requires_jisho_grouping'],
+            requires_jisho_matching=item_dict['requires_jisho_matching'],
+            requires_jisho_match_pruning=item_dict['requires_jisho_match_pruning'],
+            requires_load_time_usec=item_dict['requires_load_time_usec'],
+            requires_postmatching_redo=item_dict['requires_postmatching_redo'],
+            requires_kotobank_linking=item_dict['requires_kotobank_linking'] if 'requires_kotobank_linking' in item_dict else True,
+            requires_kotobank_combine=item_dict['requires_kotobank_combine'],
+            requires_jisho_kotobank_results_combine=item_dict['requires_jisho_kotobank_results_combine'],
+            requires_filter_and_sort=item_dict['requires_filter_and_sort'],
+            requires_parse_and_combine_koohii=item_dict['requires_parse_and_combine_koohii']
+        )
+
 class KotobankParseConfig(BasicLoadableObject['KotobankParseConfig']):
     def __init__(
         self,
@@ -80,7 +213,14 @@ class ParserManager(BasicLoadableObject['ParserManager']):
         filtered_koohii_dump_path: str,
         manager_save_path: str,
         learned_kanji_txt_path: str=None,
-        kotobank_parse_config: KotobankParseConfig=None
+        kotobank_parse_config: KotobankParseConfig=None,
+        chrome_history_db_path: str=None,
+        partitioned_history_dir: str=None,
+        raw_html_cache_dir: str=None,
+        raw_html_cache_ttl: float=30*24*3600,
+        html_parser_backend: str='html.parser',
+        dump_store_backend: str='dir',
+        kotobank_cache_size: int=4096
     ):
         assert dir_exists(browser_history_dir), f"Couldn't find browser history folder: {browser_history_dir}"
         self.browser_history_dir = browser_history_dir
@@ -102,8 +242,23 @@ class ParserManager(BasicLoadableObject['ParserManager']):
 
         self.learned_kanji_txt_path = learned_kanji_txt_path
         self.kotobank_parse_config = kotobank_parse_config if kotobank_parse_config is not None else KotobankParseConfig()
+        self.chrome_history_db_path = chrome_history_db_path
+        self.partitioned_history_dir = partitioned_history_dir
+        self.raw_html_cache_dir = raw_html_cache_dir
+        self.raw_html_cache_ttl = raw_html_cache_ttl
+        assert html_parser_backend in html_parser_backends, f'Invalid html_parser_backend: {html_parser_backend}'
+        self.html_parser_backend = html_parser_backend
+        assert dump_store_backend in dump_store_backends, f'Invalid dump_store_backend: {dump_store_backend}'
+        self.dump_store_backend = dump_store_backend
+        self.kotobank_cache_size = kotobank_cache_size
 
         self._metadata = ParserManagerMetaData()
+        self._http_client = cast(HttpClient, None)
+        self._save_lock = threading.Lock()
+        self._dump_stores = cast(Dict[str, DumpStore], {})
+        self._dump_store_lock = threading.Lock()
+        self._kotobank_result_cache = cast(KotobankResultCache, None)
+        self._history_store = cast(PartitionedBrowserHistoryStore, None)
 
     def to_dict(self) -> dict:
         return {
@@ -125,6 +280,13 @@ class ParserManager(BasicLoadableObject['ParserManager']):
             'manager_save_path': self.manager_save_path,
             'learned_kanji_txt_path': self.learned_kanji_txt_path,
             'kotobank_parse_config': self.kotobank_parse_config.to_dict(),
+            'chrome_history_db_path': self.chrome_history_db_path,
+            'partitioned_history_dir': self.partitioned_history_dir,
+            'raw_html_cache_dir': self.raw_html_cache_dir,
+            'raw_html_cache_ttl': self.raw_html_cache_ttl,
+            'html_parser_backend': self.html_parser_backend,
+            'dump_store_backend': self.dump_store_backend,
+            'kotobank_cache_size': self.kotobank_cache_size,
             'metadata': self._metadata.to_dict()
         }
     
@@ -148,71 +310,403 @@ class ParserManager(BasicLoadableObject['ParserManager']):
             filtered_koohii_dump_path=item_dict['filtered_koohii_dump_path'],
             learned_kanji_txt_path=item_dict['learned_kanji_txt_path'] if 'learned_kanji_txt_path' in item_dict else None,
             kotobank_parse_config=KotobankParseConfig.from_dict(item_dict['kotobank_parse_config']) if 'kotobank_parse_config' in item_dict else None,
+            chrome_history_db_path=item_dict['chrome_history_db_path'] if 'chrome_history_db_path' in item_dict else None,
+            partitioned_history_dir=item_dict['partitioned_history_dir'] if 'partitioned_history_dir' in item_dict else None,
+            raw_html_cache_dir=item_dict['raw_html_cache_dir'] if 'raw_html_cache_dir' in item_dict else None,
+            raw_html_cache_ttl=item_dict['raw_html_cache_ttl'] if 'raw_html_cache_ttl' in item_dict else 30*24*3600,
+            html_parser_backend=item_dict['html_parser_backend'] if 'html_parser_backend' in item_dict else 'html.parser',
+            dump_store_backend=item_dict['dump_store_backend'] if 'dump_store_backend' in item_dict else 'dir',
+            kotobank_cache_size=item_dict['kotobank_cache_size'] if 'kotobank_cache_size' in item_dict else 4096,
             manager_save_path=item_dict['manager_save_path'],
         )
         manager._metadata = ParserManagerMetaData.from_dict(item_dict['metadata'])
         return manager
 
+    def save_to_path(self, save_path: str, overwrite: bool=False):
+        # Independent stages can run concurrently in the pipeline, and they all save the manager.
+        with self._save_lock:
+            super().save_to_path(save_path, overwrite=overwrite)
+
+    @property
+    def http_client(self) -> HttpClient:
+        """
+        The client used to fetch Jisho and Kotobank pages.
+        When raw_html_cache_dir is set, pages are kept there, so forcing a parse stage
+        re-parses the cached html instead of downloading everything again.
+        """
+        if self._http_client is None:
+            if self.raw_html_cache_dir is not None:
+                self._http_client = HttpClient(cache=HttpResponseCache(self.raw_html_cache_dir, ttl=self.raw_html_cache_ttl))
+            else:
+                self._http_client = get_default_http_client()
+        return self._http_client
+
+    def _log_http_stats(self):
+        logger.cyan(f'HTTP: {self.http_client.stats.to_dict()}')
+        if self.http_client.cache is not None:
+            logger.cyan(f'Raw HTML Cache: {self.http_client.cache.stats.to_dict()}')
+
+    def _get_dump_store(self, dump_dir: str) -> DumpStore:
+        with self._dump_store_lock:
+            if dump_dir not in self._dump_stores:
+                self._dump_stores[dump_dir] = get_dump_store(dump_dir, backend=self.dump_store_backend)
+            return self._dump_stores[dump_dir]
+
+    @property
+    def jisho_dump_store(self) -> DumpStore:
+        """
+        The parsed Jisho searches, keyed by search word.
+        With dump_store_backend='sqlite' they are kept in <jisho_parse_dump_dir>.sqlite3 instead of the directory.
+        """
+        return self._get_dump_store(self.jisho_parse_dump_dir)
+
+    @property
+    def kotobank_dump_store(self) -> DumpStore:
+        return self._get_dump_store(self.kotobank_parse_dump_dir)
+
+    @property
+    def kotobank_result_cache(self) -> KotobankResultCache:
+        """
+        Deserialized Kotobank results, shared by parse_kotobank and combine_jisho_and_kotobank_results.
+        Holds at most kotobank_cache_size results.
+        """
+        dump_store = self.kotobank_dump_store
+        with self._dump_store_lock:
+            if self._kotobank_result_cache is None:
+                self._kotobank_result_cache = KotobankResultCache(dump_store, max_size=self.kotobank_cache_size)
+            return self._kotobank_result_cache
+
+    @property
+    def koohii_dump_store(self) -> DumpStore:
+        return self._get_dump_store(self.koohii_parse_dump_dir)
+
+    def close_dump_stores(self):
+        """
+        Checkpoints and closes the SQLite dump stores. They are reopened when they are used again.
+        """
+        with self._dump_store_lock:
+            dump_stores = list(self._dump_stores.values())
+        for dump_store in dump_stores:
+            dump_store.close()
+
+    def migrate_dump_stores(self, overwrite: bool=False, verbose: bool=False, show_pbar: bool=True):
+        """
+        Copies the existing Jisho/Kotobank/Koohii dump directories into the stores of dump_store_backend.
+        The directories themselves are left as they are.
+        """
+        if self.dump_store_backend == 'dir':
+            return
+        for dump_dir, dump_store in [
+            (self.jisho_parse_dump_dir, self.jisho_dump_store),
+            (self.kotobank_parse_dump_dir, self.kotobank_dump_store),
+            (self.koohii_parse_dump_dir, self.koohii_dump_store)
+        ]:
+            if not dir_exists(dump_dir):
+                continue
+            count = migrate_dump_store(DirectoryDumpStore(dump_dir), dump_store, overwrite=overwrite, show_pbar=show_pbar)
+            dump_store.close()
+            if verbose:
+                logger.cyan(f'Migrated {count} dumps from {dump_dir} to {dump_store.path}')
+
     @property
     def browser_history_paths(self) -> List[str]:
         return self._metadata.browser_history_paths
 
-    def combine_history(self, force: bool=False, verbose: bool=False, show_pbar: bool=True):
+    @property
+    def combined_history_time_usec_path(self) -> str:
+        # Sorted time_usec of every row in the combined history. Used by the incremental mode of combine_history.
+        return f'{os.path.splitext(self.combined_history_path)[0]}_time_usec.npy'
+
+    @property
+    def history_store(self) -> PartitionedBrowserHistoryStore:
+        assert self.partitioned_history_dir is not None, f"partitioned_history_dir hasn't been set."
+        if self._history_store is None or self._history_store.store_dir != self.partitioned_history_dir:
+            self._history_store = PartitionedBrowserHistoryStore(self.partitioned_history_dir)
+        return self._history_store
+
+    def _get_export_info(self, path: str) -> BrowserHistoryExportInfo:
+        for info in self._metadata.browser_history_exports:
+            if info.is_unchanged(path):
+                return info
+        return BrowserHistoryExportInfo.from_path(path)
+
+    def combine_history(self, force: bool=False, verbose: bool=False, show_pbar: bool=True, incremental: bool=False):
+        """
+        incremental: Only read exports whose content hash hasn't been ingested yet, and only add the rows
+                     that aren't already in the combined history. If all of the new rows are newer than
+                     the combined history, they are appended to the end of the file instead of rewriting it.
+                     Jisho grouping is only redone when new jisho.org searches arrive.
+                     Rows from removed exports are kept, and when two exports contain the same time_usec,
+                     the row that was ingested first is kept.
+        """
         browser_history_paths = recursively_get_all_matches_under_dirpath(
             dirpath=self.browser_history_dir,
             target_name='BrowserHistory.json',
             target_type='file'
         )
         browser_history_paths.sort()
-        if self._metadata.browser_history_paths != browser_history_paths or not file_exists(self.combined_history_path) or force:
-            handler = BrowserHistoryHandler.load_from_path_list(browser_history_paths)
-            combined_history = BrowserHistory.combine(handler.browser_history_list, show_pbar=show_pbar)
-            combined_history.browser_history_item_list.sort(attr_name='time_usec', reverse=False)
-            combined_history.save_to_path(self.combined_history_path, overwrite=True)
+        can_combine_incrementally = file_exists(self.combined_history_path) \
+            and file_exists(self.combined_history_time_usec_path) \
+            and len(self._metadata.browser_history_exports) > 0
+        if incremental and can_combine_incrementally and not force:
+            self._combine_history_incremental(browser_history_paths, verbose=verbose, show_pbar=show_pbar)
+        elif self._metadata.browser_history_paths != browser_history_paths or not file_exists(self.combined_history_path) or force \
+            or (incremental and not can_combine_incrementally):
+            self._metadata.browser_history_exports = self._merge_history_exports(browser_history_paths, show_pbar=show_pbar)
             if verbose:
                 logger.cyan('Saved Combined History')
+            self._metadata.chrome_history_watermark = None # The rebuilt history doesn't contain the Chrome database rows anymore.
             self._metadata.requires_jisho_grouping = True
             self._metadata.browser_history_paths = browser_history_paths
             self.save_to_path(self.manager_save_path, overwrite=True)
-    
+            if self.partitioned_history_dir is not None:
+                self._history_store = PartitionedBrowserHistoryStore.from_history_path(self.partitioned_history_dir, self.combined_history_path)
+                if verbose:
+                    logger.cyan('Saved Partitioned History')
+        if self.partitioned_history_dir is not None and not self.history_store.exists:
+            self._history_store = PartitionedBrowserHistoryStore.from_history_path(self.partitioned_history_dir, self.combined_history_path)
+            if verbose:
+                logger.cyan('Saved Partitioned History')
+
+    def _merge_history_exports(self, browser_history_paths: List[str], show_pbar: bool=True) -> BrowserHistoryExportInfoList:
+        """
+        Saves the same combined history as BrowserHistory.merge of the exports, but with only one export in memory at a time.
+        Each export is sorted by time_usec into a temporary file, and the sorted files are merged into the combined history as they are read.
+        """
+        export_infos = BrowserHistoryExportInfoList()
+        run_dir = f'{self.combined_history_path}.runs'
+        delete_dir_if_exists(run_dir)
+        make_dir_if_not_exists(run_dir)
+        run_paths = []
+        pbar = tqdm(total=len(browser_history_paths), unit='histories') if show_pbar else None
+        if pbar is not None:
+            pbar.set_description('Sorting Histories')
+        for i, path in enumerate(browser_history_paths):
+            history_items = sorted(BrowserHistory.iter_items_from_path(path), key=lambda item: item.time_usec)
+            max_time_usec = history_items[-1].time_usec if len(history_items) > 0 else None
+            export_infos.append(BrowserHistoryExportInfo.from_path(path, max_time_usec=max_time_usec))
+            run_path = f'{run_dir}/{i}.json'
+            BrowserHistory(BrowserHistoryItemList(history_items)).save_to_path(run_path)
+            run_paths.append(run_path)
+            del history_items
+            if pbar is not None:
+                pbar.update()
+        if pbar is not None:
+            pbar.close()
+
+        time_usec = array('q')
+        def iter_item_dicts():
+            for item in BrowserHistory.iter_merged_items([BrowserHistory.iter_items_from_path(run_path) for run_path in run_paths]):
+                time_usec.append(item.time_usec)
+                yield item.to_dict()
+        write_json_array_items(self.combined_history_path, key='Browser History', item_dicts=iter_item_dicts())
+        np.save(self.combined_history_time_usec_path, np.frombuffer(time_usec, dtype=np.int64))
+        delete_dir_if_exists(run_dir)
+        return export_infos
+
+    def _load_combined_history_time_usec(self) -> np.ndarray:
+        if file_exists(self.combined_history_time_usec_path):
+            return np.load(self.combined_history_time_usec_path)
+        time_usec = np.sort(np.array([
+            item_dict['time_usec'] for item_dict in iter_json_array_items(self.combined_history_path, key='Browser History')
+        ], dtype=np.int64))
+        np.save(self.combined_history_time_usec_path, time_usec)
+        return time_usec
+
+    @staticmethod
+    def _get_new_rows(item_dict_batch: List[dict], existing_time_usec: np.ndarray, new_time_usec_set: set) -> List[dict]:
+        """
+        Rows of item_dict_batch whose time_usec is neither in existing_time_usec (sorted)
+        nor in new_time_usec_set. The time_usec of the returned rows are added to new_time_usec_set.
+        """
+        if len(item_dict_batch) == 0:
+            return []
+        time_usec = np.array([item_dict['time_usec'] for item_dict in item_dict_batch], dtype=np.int64)
+        if len(existing_time_usec) > 0:
+            is_new = time_usec > existing_time_usec[-1]
+            check_idx = np.where(~is_new)[0]
+            if len(check_idx) > 0:
+                # Rows older than the watermark can still be missing from the combined history.
+                pos = np.searchsorted(existing_time_usec, time_usec[check_idx])
+                is_new[check_idx] = existing_time_usec[pos] != time_usec[check_idx]
+        else:
+            is_new = np.ones(len(time_usec), dtype=bool)
+        new_rows = []
+        for item_dict, item_is_new in zip(item_dict_batch, is_new.tolist()):
+            if item_is_new and item_dict['time_usec'] not in new_time_usec_set:
+                new_time_usec_set.add(item_dict['time_usec'])
+                new_rows.append(item_dict)
+        return new_rows
+
+    def _add_rows_to_combined_history(self, new_item_dicts: List[dict], existing_time_usec: np.ndarray):
+        """
+        Adds rows that aren't in the combined history yet.
+        The rows are normalized through BrowserHistoryItem first, so that fields of the export
+        that a full combine would drop don't end up in the combined history.
+        If they are all newer than the combined history, they are appended to the end of the file.
+        Otherwise the combined history is merged and rewritten.
+        """
+        if len(new_item_dicts) == 0:
+            return
+        new_item_dicts = sorted(
+            [BrowserHistoryItem.from_dict(item_dict).to_dict() for item_dict in new_item_dicts],
+            key=lambda item_dict: item_dict['time_usec']
+        )
+        if len(existing_time_usec) == 0 or new_item_dicts[0]['time_usec'] > existing_time_usec[-1]:
+            append_json_array_items(self.combined_history_path, new_item_dicts)
+        else:
+            merged_items = BrowserHistory.iter_merged_items([
+                BrowserHistory.iter_items_from_path(self.combined_history_path),
+                BrowserHistoryItemList.from_dict_list(new_item_dicts)
+            ])
+            temp_path = f'{self.combined_history_path}.tmp'
+            write_json_array_items(temp_path, key='Browser History', item_dicts=(item.to_dict() for item in merged_items))
+            os.replace(temp_path, self.combined_history_path)
+        new_time_usec = np.array([item_dict['time_usec'] for item_dict in new_item_dicts], dtype=np.int64)
+        np.save(self.combined_history_time_usec_path, np.sort(np.concatenate([existing_time_usec, new_time_usec])))
+        if self.partitioned_history_dir is not None and self.history_store.exists:
+            # Only the months that received new rows are rewritten.
+            self.history_store.add_item_dicts(new_item_dicts)
+        if any([item_dict['url'].startswith('https://jisho.org/search/') for item_dict in new_item_dicts]):
+            self._metadata.requires_jisho_grouping = True
+
+    def _combine_history_incremental(self, browser_history_paths: List[str], verbose: bool=False, show_pbar: bool=True, batch_size: int=100000):
+        ingested_hashes = set(self._metadata.browser_history_exports.content_hashes)
+        export_infos = BrowserHistoryExportInfoList()
+        new_export_infos = BrowserHistoryExportInfoList()
+        for path in browser_history_paths:
+            info = self._get_export_info(path)
+            if info.content_hash in ingested_hashes:
+                info.path = path
+                export_infos.append(info)
+            elif info.content_hash not in new_export_infos.content_hashes:
+                new_export_infos.append(info)
+
+        existing_time_usec = self._load_combined_history_time_usec()
+        new_item_dicts = []
+        new_time_usec_set = set()
+        pbar = tqdm(total=len(new_export_infos), unit='histories') if show_pbar else None
+        if pbar is not None:
+            pbar.set_description('Reading New Histories')
+        for info in new_export_infos:
+            batch = []
+            max_time_usec = None
+            for item_dict in iter_json_array_items(info.path, key='Browser History'):
+                if max_time_usec is None or item_dict['time_usec'] > max_time_usec:
+                    max_time_usec = item_dict['time_usec']
+                batch.append(item_dict)
+                if len(batch) >= batch_size:
+                    new_item_dicts.extend(self._get_new_rows(batch, existing_time_usec, new_time_usec_set))
+                    batch = []
+            new_item_dicts.extend(self._get_new_rows(batch, existing_time_usec, new_time_usec_set))
+            info.max_time_usec = max_time_usec
+            export_infos.append(info)
+            if pbar is not None:
+                pbar.update()
+        if pbar is not None:
+            pbar.close()
+
+        self._add_rows_to_combined_history(new_item_dicts, existing_time_usec)
+        if verbose:
+            logger.cyan(f'Added {len(new_item_dicts)} new rows from {len(new_export_infos)} new histories to the Combined History')
+        self._metadata.browser_history_exports = export_infos
+        self._metadata.browser_history_paths = browser_history_paths
+        self.save_to_path(self.manager_save_path, overwrite=True)
+
+    def combine_chrome_history(self, force: bool=False, verbose: bool=False):
+        """
+        Adds jisho.org searches from a copy of Chrome's History SQLite database to the combined history.
+        Only visits newer than the recorded watermark are read, so this is cheap to run often.
+        """
+        if self.chrome_history_db_path is None:
+            return
+        assert file_exists(self.combined_history_path), f"Couldn't find combined history at: {self.combined_history_path}"
+        database = ChromeHistoryDatabase(self.chrome_history_db_path)
+        min_time_usec = self._metadata.chrome_history_watermark if not force else None
+        item_dicts = [
+            item.to_dict()
+            for item in database.iter_items(url_base='https://jisho.org/search/', min_time_usec=min_time_usec)
+        ]
+        existing_time_usec = self._load_combined_history_time_usec()
+        new_item_dicts = self._get_new_rows(item_dicts, existing_time_usec, set())
+        self._add_rows_to_combined_history(new_item_dicts, existing_time_usec)
+        if len(item_dicts) > 0:
+            self._metadata.chrome_history_watermark = item_dicts[-1]['time_usec']
+        if verbose:
+            logger.cyan(f'Added {len(new_item_dicts)} new rows from the Chrome History database to the Combined History')
+        self.save_to_path(self.manager_save_path, overwrite=True)
+
+    def get_jisho_searches(self, start_time_usec: int=None, end_time_usec: int=None) -> CommonBrowserHistoryItemGroupList:
+        """
+        Jisho searches with start_time_usec <= time_usec < end_time_usec, grouped by url.
+        Only the months that overlap with the range are loaded from the partitioned history.
+        """
+        return self.history_store.query_groups(
+            start_time_usec=start_time_usec, end_time_usec=end_time_usec,
+            url_base='https://jisho.org/search/'
+        )
+
+    def get_recent_jisho_searches(self, n_days: float) -> CommonBrowserHistoryItemGroupList:
+        start_time_usec = get_current_time_usec() - int(n_days * 24 * 3600 * 10**6)
+        return self.get_jisho_searches(start_time_usec=start_time_usec)
+
     def group_jisho_history(self, force: bool=False, verbose: bool=False):
         assert file_exists(self.combined_history_path), f"Couldn't find combined history at: {self.combined_history_path}"
         if self._metadata.requires_jisho_grouping or force or not file_exists(self.jisho_grouped_history_path):
-            browser_history = BrowserHistory.load_from_path(self.combined_history_path)
-            group_list = browser_history.browser_history_item_list.search_by_url_base_and_group_by_url('https://jisho.org/search/')
-            group_list.sort(attr_name='item_count', reverse=True)
+            jisho_history = ColumnarBrowserHistoryItemList.from_history_path(
+                self.combined_history_path, url_base='https://jisho.org/search/'
+            )
+            group_list = jisho_history.group_by_url(sort_by_item_count=True)
             group_list.save_to_path(self.jisho_grouped_history_path, overwrite=True)
             self._metadata.requires_jisho_grouping = False
+            if file_exists(self.jisho_pruned_entries_path):
+                # The pruned entries get their time_usec from the groups.
+                self._metadata.requires_load_time_usec = True
             if verbose:
                 logger.cyan('Saved Jisho Grouped History')
             self.save_to_path(self.manager_save_path, overwrite=True)
     
-    def parse_jisho(self, force: bool=False, verbose: bool=False, show_pbar: bool=True):
+    def _parse_jisho_group(
+        self, group: CommonBrowserHistoryItemGroup, search_word: str,
+        rate_limiter: HostRateLimiter=None, fetch_url_base: str=None
+    ) -> str:
+        fetch_url = group.url.replace('https://jisho.org/search/', fetch_url_base, 1) if fetch_url_base is not None else group.url
+        if rate_limiter is not None:
+            rate_limiter.acquire(fetch_url)
+        parser = JishoSearchHtmlParser(url=group.url, fetch_url=fetch_url, http=self.http_client, backend=self.html_parser_backend)
+        search_query = parser.parse(history_group_id=group.id)
+        self.jisho_dump_store.save_dict(search_word, search_query.to_dict()) # Existing dumps are only parsed again when forced.
+        return search_word
+
+    def parse_jisho(
+        self, force: bool=False, verbose: bool=False, show_pbar: bool=True,
+        num_workers: int=1, requests_per_second: float=None, burst: int=1, fetch_url_base: str=None
+    ):
+        """
+        num_workers: Number of pages that are fetched and parsed at the same time.
+        requests_per_second: Per-host limit on how often a request can be started. No limit if None.
+        burst: Number of requests that can be started at once before the limit kicks in.
+        fetch_url_base: Fetch pages from here instead of https://jisho.org/search/, e.g. a local server.
+
+        Each dump is saved as soon as its page has been parsed, so an interrupted run resumes
+        from the searches that haven't been dumped yet.
+        """
         assert file_exists(self.jisho_grouped_history_path), f"Couldn't find Jisho Grouped History at: {self.jisho_grouped_history_path}"
-        make_dir_if_not_exists(self.jisho_parse_dump_dir)
-        existing_dump_paths = get_all_files_of_extension(self.jisho_parse_dump_dir, extension='json')
-        dumped_search_word_list = [get_rootname_from_path(existing_dump_path) for existing_dump_path in existing_dump_paths]
+        dumped_search_word_list = self.jisho_dump_store.keys()
         if force:
             dumped_search_word_list = []
+        dumped_search_word_set = set(dumped_search_word_list)
 
         group_list = CommonBrowserHistoryItemGroupList.load_from_path(self.jisho_grouped_history_path)
-        search_word_list = []
-        url_list = []
-
-        if verbose:
-            logger.cyan(f'Parsing Jisho Data')
-        pbar = tqdm(total=len(group_list), unit='word(s)') if show_pbar else None
+        search_word_to_url = {}
+        pending = cast(List[tuple], []) # (group, search_word)
         for group in group_list:
             encoded_search_word = group.url.replace('https://jisho.org/search/', '')
             decoded_search_word = urllib.parse.unquote(encoded_search_word)
-            if pbar is not None:
-                pbar.set_description(decoded_search_word)
-            if decoded_search_word not in search_word_list:
-                search_word_list.append(decoded_search_word)
-                url_list.append(group.url)
+            if decoded_search_word not in search_word_to_url:
+                search_word_to_url[decoded_search_word] = group.url
             else:
-                idx = search_word_list.index(decoded_search_word)
-                existing_url = url_list[idx]
+                existing_url = search_word_to_url[decoded_search_word]
                 raise Exception(
                     f"""
                     Found two unique urls for the same search word.
@@ -226,83 +720,214 @@ class ParserManager(BasicLoadableObject['ParserManager']):
                 if invalid_str in decoded_search_word:
                     skip = True
                     break
-            if skip or decoded_search_word in dumped_search_word_list:
-                if pbar is not None:
-                    pbar.update()
+            if skip or decoded_search_word in dumped_search_word_set:
                 continue
-            parser = JishoSearchHtmlParser(url=group.url)
-            search_query = parser.parse(history_group_id=group.id)
-            dump_path = f'{self.jisho_parse_dump_dir}/{decoded_search_word}.json'
-            search_query.save_to_path(dump_path, overwrite=False)
-            dumped_search_word_list.append(decoded_search_word)
+            pending.append((group, decoded_search_word))
+
+        if verbose:
+            logger.cyan(f'Parsing Jisho Data')
+        rate_limiter = HostRateLimiter(rate=requests_per_second, capacity=burst) if requests_per_second is not None else None
+        pbar = tqdm(total=len(group_list), initial=len(group_list) - len(pending), unit='word(s)') if show_pbar else None
+
+        def on_dumped(search_word: str):
+            dumped_search_word_set.add(search_word)
             if not self._metadata.requires_jisho_matching:
                 self._metadata.requires_jisho_matching = True
                 self.save_to_path(self.manager_save_path, overwrite=True)
             if pbar is not None:
+                pbar.set_description(search_word)
                 pbar.update()
+
+        if num_workers <= 1:
+            for group, search_word in pending:
+                on_dumped(self._parse_jisho_group(group, search_word, rate_limiter=rate_limiter, fetch_url_base=fetch_url_base))
+        else:
+            executor = ThreadPoolExecutor(max_workers=num_workers)
+            futures = [
+                executor.submit(self._parse_jisho_group, group, search_word, rate_limiter, fetch_url_base)
+                for group, search_word in pending
+            ]
+            try:
+                for future in as_completed(futures):
+                    on_dumped(future.result())
+            finally:
+                # Pages that haven't started yet are dropped if one of them fails.
+                # (shutdown's cancel_futures only exists from Python 3.9)
+                for future in futures:
+                    future.cancel()
+                executor.shutdown(wait=True)
         if pbar is not None:
             pbar.close()
+        self.jisho_dump_store.close()
         if verbose:
             logger.cyan('Finished Parsing Jisho Data')
+            self._log_http_stats()
     
-    def accumulate_jisho_matches(self, force: bool=False, verbose: bool=False, show_pbar: bool=True):
-        assert dir_exists(self.jisho_parse_dump_dir), f"Couldn't find Jisho Parse Dump Directory: {self.jisho_parse_dump_dir}"
-        if self._metadata.requires_jisho_matching or force or not file_exists(self.jisho_matches_path):
-            dump_paths = get_all_files_of_extension(self.jisho_parse_dump_dir, extension='json')
-            sw_matches_handler = SearchWordMatchesHandler()
+    @property
+    def jisho_matches_manifest_path(self) -> str:
+        # The Jisho dumps that jisho_matches_path was built from. Used by accumulate_jisho_matches.
+        return f'{os.path.splitext(self.jisho_matches_path)[0]}_manifest.json'
 
-            pbar = tqdm(total=len(dump_paths), unit='dump(s)') if show_pbar else None
-            if pbar is not None:
-                pbar.set_description('Searching For Matches')
-            for dump_path in dump_paths:
-                exact_matches = DictionaryEntryList()
-                search_word = get_rootname_from_path(dump_path)
-                query = JishoSearchQuery.load_from_path(dump_path)
-                writing_match_idx_list = []
-                reading_match_idx_list = []
-                all_matches = query.exact_matches + query.nonexact_matches
-                for i in range(len(all_matches)):
-                    if all_matches[i].word_representation.writing == search_word:
-                        writing_match_idx_list.append(i)
-                    if all_matches[i].word_representation.reading == search_word:
-                        reading_match_idx_list.append(i)
-                if len(writing_match_idx_list) > 0:
-                    for idx in writing_match_idx_list:
-                        exact_matches.append(all_matches[idx])
-                elif len(reading_match_idx_list) > 0:
-                    for idx in reading_match_idx_list:
-                        exact_matches.append(all_matches[idx])
-                else:
-                    pass
-                sw_matches = SearchWordMatches(search_word=search_word, matches=exact_matches, history_group_id=query.history_group_id)
-                sw_matches_handler.append(sw_matches)
+    def _load_jisho_matches(
+        self, dump_store: DumpStore, keys: List[str], num_workers: int=None,
+        show_pbar: bool=True, batch_size: int=256, min_pool_size: int=2000
+    ) -> List[SearchWordMatches]:
+        """
+        Loads the dumps of keys and picks their exact matches.
+        When there are at least min_pool_size keys (i.e. a cold run), the dumps are loaded by num_workers processes.
+        """
+        num_workers = num_workers if num_workers is not None else os.cpu_count()
+        tasks = [(dump_store, keys[i:i+batch_size]) for i in range(0, len(keys), batch_size)]
+        sw_matches_list = cast(List[SearchWordMatches], [])
+        pbar = tqdm(total=len(keys), unit='dump(s)') if show_pbar else None
+        if pbar is not None:
+            pbar.set_description('Searching For Matches')
+        if num_workers > 1 and len(keys) >= min_pool_size:
+            with ProcessPoolExecutor(max_workers=num_workers) as executor:
+                for (_, batch), batch_matches in zip(tasks, executor.map(_load_search_word_matches, tasks)):
+                    sw_matches_list.extend(batch_matches)
+                    if pbar is not None:
+                        pbar.update(len(batch))
+        else:
+            for task in tasks:
+                sw_matches_list.extend(_load_search_word_matches(task))
                 if pbar is not None:
-                    pbar.update()
-            if pbar is not None:
-                pbar.close()
-            sw_matches_handler.save_to_path(self.jisho_matches_path, overwrite=True)
-            self._metadata.requires_postmatching_redo = True
-            if verbose:
-                logger.cyan(f'Finished Accumulating Jisho Matches')
-            self._metadata.requires_jisho_matching = False
-            if not self._metadata.requires_jisho_match_pruning:
-                self._metadata.requires_jisho_match_pruning = True
-            self.save_to_path(self.manager_save_path, overwrite=True)
+                    pbar.update(len(task[1]))
+        if pbar is not None:
+            pbar.close()
+        return sw_matches_list
+
+    def accumulate_jisho_matches(self, force: bool=False, verbose: bool=False, show_pbar: bool=True, num_workers: int=None):
+        """
+        Only the dumps that were added or changed since the last run are loaded (see jisho_matches_manifest_path),
+        and their matches are merged into the existing jisho_matches_path. Matches of removed dumps are dropped.
+        The matches are kept in search word order, so the result is the same as loading every dump.
+        force: Load every dump again.
+        num_workers: Number of processes used to load the dumps on a cold run. All cores by default.
+        """
+        assert self.jisho_dump_store.exists, f"Couldn't find Jisho Parse Dumps: {self.jisho_dump_store.path}"
+        if self._metadata.requires_jisho_matching or force or not file_exists(self.jisho_matches_path):
+            self._accumulate_jisho_matches(force=force, verbose=verbose, show_pbar=show_pbar, num_workers=num_workers)
+
+    def _accumulate_jisho_matches(self, force: bool=False, verbose: bool=False, show_pbar: bool=True, num_workers: int=None):
+        dump_store = self.jisho_dump_store
+        assert dump_store.exists, f"Couldn't find Jisho Parse Dumps: {dump_store.path}"
+        previous_manifest = DumpManifest()
+        if not force and file_exists(self.jisho_matches_path) and file_exists(self.jisho_matches_manifest_path):
+            previous_manifest = DumpManifest.load_from_path(self.jisho_matches_manifest_path)
+            if previous_manifest.store_path != dump_store.path:
+                previous_manifest = DumpManifest()
+        manifest = dump_store.get_manifest(previous=previous_manifest)
+        changed_keys = manifest.get_changed_keys(previous_manifest)
+        removed_keys = set(manifest.get_removed_keys(previous_manifest))
+
+        # The existing matches are merged as dicts, so that only the new ones have to be converted.
+        sw_matches_dicts = cast(List[dict], [])
+        if len(previous_manifest.entries) > 0:
+            changed_key_set = set(changed_keys)
+            with open(self.jisho_matches_path, 'r') as f:
+                sw_matches_dicts = [
+                    sw_matches_dict for sw_matches_dict in json.load(f)
+                    if sw_matches_dict['search_word'] not in changed_key_set and sw_matches_dict['search_word'] not in removed_keys
+                ]
+        sw_matches_list = self._load_jisho_matches(dump_store, changed_keys, num_workers=num_workers, show_pbar=show_pbar)
+        sw_matches_dicts.extend([sw_matches.to_dict() for sw_matches in sw_matches_list])
+        sw_matches_dicts.sort(key=lambda sw_matches_dict: sw_matches_dict['search_word'])
+        with open(self.jisho_matches_path, 'w') as f:
+            json.dump(sw_matches_dicts, f, indent=2, ensure_ascii=False) # Same format as SearchWordMatchesHandler.save_to_path
+        manifest.save_to_path(self.jisho_matches_manifest_path, overwrite=True)
+        self._metadata.requires_postmatching_redo = True
+        if verbose:
+            logger.cyan(f'Loaded {len(changed_keys)} new or changed dumps and dropped {len(removed_keys)} removed dumps')
+            logger.cyan(f'Finished Accumulating Jisho Matches')
+        self._metadata.requires_jisho_matching = False
+        if not self._metadata.requires_jisho_match_pruning:
+            self._metadata.requires_jisho_match_pruning = True
+        self.save_to_path(self.manager_save_path, overwrite=True)
     
+    @property
+    def jisho_pruned_entries_id_map_path(self) -> str:
+        # Written by prune_jisho_entry_matches. Maps the ids of the previously pruned entries to the current ones.
+        return f'{os.path.splitext(self.jisho_pruned_entries_path)[0]}_id_map.json'
+
+    def _load_previous_pruned_entries(self) -> Tuple[Dict[int, str], Dict[int, Tuple[List[str], List[str]]]]:
+        """
+        Reads the pruned entries that are about to be replaced as raw dicts, so that none of them have to be converted.
+        Returns
+            id -> DictionaryEntry.content_hash of every entry
+            id -> (search_words, successful Kotobank queries) of every entry whose Kotobank linking was finished,
+                either by parse_kotobank or by an interrupted run of it.
+        """
+        content_hashes = cast(Dict[int, str], {})
+        kotobank_links = cast(Dict[int, Tuple[List[str], List[str]]], {})
+        if not file_exists(self.jisho_pruned_entries_path):
+            return content_hashes, kotobank_links
+        journal = JsonlJournal(self.kotobank_journal_path)
+        linked_queries = self._load_kotobank_journal(journal)
+        journal.close()
+        with open(self.jisho_pruned_entries_path, 'r') as f:
+            item_dicts = json.load(f)
+        for item_dict in item_dicts:
+            entry_id = item_dict['id'] if 'id' in item_dict else None
+            if entry_id is None or item_dict['entry'] is None:
+                continue
+            content_hashes[entry_id] = DictionaryEntry.get_content_hash_from_dict(item_dict['entry'])
+            if entry_id in linked_queries:
+                kotobank_links[entry_id] = (item_dict['search_words'], linked_queries[entry_id])
+            elif not self._metadata.requires_kotobank_linking and 'linked_kotobank_queries' in item_dict:
+                kotobank_links[entry_id] = (item_dict['search_words'], item_dict['linked_kotobank_queries'])
+        return content_hashes, kotobank_links
+
     def prune_jisho_entry_matches(self, force: bool=False, verbose: bool=False, show_pbar: bool=True):
+        """
+        The pruned entries get ids derived from their contents, and the mapping from the ids of the previous
+        pruned entries is saved to jisho_pruned_entries_id_map_path.
+        The Kotobank links of entries whose content and search words didn't change are carried over,
+        and they are written to the Kotobank journal as well, so that the next non-forced parse_kotobank
+        only links the entries that are new or changed.
+        """
         if self._metadata.requires_jisho_match_pruning or not file_exists(self.jisho_pruned_entries_path) or force:
             assert file_exists(self.jisho_matches_path), f"Couldn't find Jisho matches path: {self.jisho_matches_path}"
+            previous_content_hashes, previous_kotobank_links = self._load_previous_pruned_entries()
             sw_matches_handler = SearchWordMatchesHandler.load_from_path(self.jisho_matches_path)
             entry_match_list = DictionaryEntryMatchList()
             if verbose:
                 logger.cyan('Pruning Unique Jisho Entries')
-            entry_match_list.add_pruned_matches(handler=sw_matches_handler.unique, mode=0, show_pbar=show_pbar, leave_pbar=True)
+            content_hashes = entry_match_list.add_pruned_matches(handler=sw_matches_handler.unique, mode=0, show_pbar=show_pbar, leave_pbar=True)
             if verbose:
                 logger.cyan('Pruning Non-Unique Jisho Entries')
-            entry_match_list.add_pruned_matches(handler=sw_matches_handler.non_unique, mode=1, show_pbar=show_pbar, leave_pbar=True)
+            content_hashes.update(entry_match_list.add_pruned_matches(handler=sw_matches_handler.non_unique, mode=1, show_pbar=show_pbar, leave_pbar=True))
             if verbose:
                 logger.cyan('Finished Pruning Jisho Entries')
+
+            id_map = DictionaryEntryMatchIdMap.from_content_hashes(previous_content_hashes, content_hashes)
+            previous_ids = {new_id: old_id for old_id, new_id in id_map.id_map.items()}
+            reused_links = cast(Dict[int, List[str]], {})
+            for entry_match in entry_match_list:
+                old_id = previous_ids.get(entry_match.id)
+                if old_id is None or old_id not in previous_kotobank_links:
+                    continue
+                search_words, successful_search_queries = previous_kotobank_links[old_id]
+                if search_words == entry_match.search_words:
+                    entry_match.linked_kotobank_queries = list(successful_search_queries)
+                    reused_links[entry_match.id] = successful_search_queries
+
+            # The flag is saved before anything is replaced, so that links of a half-written prune are never trusted.
+            self._metadata.requires_kotobank_linking = True
+            self.save_to_path(self.manager_save_path, overwrite=True)
+            journal = JsonlJournal(self.kotobank_journal_path)
+            journal.delete()
+            delete_dir_if_exists(self.kotobank_temp_map_dir)
             entry_match_list.save_to_path(self.jisho_pruned_entries_path, overwrite=True)
+            id_map.save_to_path(self.jisho_pruned_entries_id_map_path, overwrite=True)
+            for entry_id, successful_search_queries in reused_links.items():
+                journal.append({'id': entry_id, 'successful_search_queries': successful_search_queries})
+            journal.close()
+            if verbose:
+                logger.cyan(
+                    f'{len(id_map.id_map)} entries kept, {len(id_map.added_ids)} added and {len(id_map.removed_ids)} removed. '
+                    f'Kotobank links were carried over for {len(reused_links)} entries.'
+                )
 
             self._metadata.requires_load_time_usec = True
             self._metadata.requires_jisho_kotobank_results_combine = True
@@ -326,9 +951,10 @@ class ParserManager(BasicLoadableObject['ParserManager']):
             if verbose:
                 logger.cyan("Finished Loading time_usec To Pruned Jisho Entries")
             
+            self._metadata.requires_jisho_kotobank_results_combine = True
             if self._metadata.requires_load_time_usec:
                 self._metadata.requires_load_time_usec = False
-                self.save_to_path(self.manager_save_path, overwrite=True)
+            self.save_to_path(self.manager_save_path, overwrite=True)
 
     def parse_kotobank0(self, force: bool=False, verbose: bool=False, show_pbar: bool=True):
         raise Exception('Obsolete. Refer to parse_kotobank')
@@ -374,126 +1000,334 @@ class ParserManager(BasicLoadableObject['ParserManager']):
         if verbose:
             logger.cyan(f'Finished Parsing Kotobank Data')
 
-    def _process_kotobank_query(self, search_query: str) -> bool:
-        dump_path = f'{self.kotobank_parse_dump_dir}/{search_query}.json'
-        if not file_exists(dump_path):
-            parser = KotobankWordHtmlParser.from_search_word(search_query)
-            result = parser.parse()
-            result.save_to_path(dump_path, overwrite=True)
-        else:
-            result = KotobankResult.load_from_path(dump_path)
-        success = not result.is_empty
-        return success
+    def _fetch_kotobank_query(self, search_query: str, rate_limiter: HostRateLimiter=None) -> Tuple[str, bool]:
+        """
+        Fetches, parses and dumps search_query. Returns (search_query, whether the result is non-empty).
+        """
+        if rate_limiter is not None:
+            rate_limiter.acquire(f'https://kotobank.jp/word/{search_query}')
+        parser = KotobankWordHtmlParser.from_search_word(search_query, http=self.http_client, backend=self.html_parser_backend)
+        result = parser.parse()
+        self.kotobank_dump_store.save_dict(search_query, result.to_dict())
+        self.kotobank_result_cache.put(search_query, result)
+        return search_query, not result.is_empty
 
-    def _process_kotobank_target(self, entry_match: DictionaryEntryMatch, target: str) -> List[str]:
-        successful_search_queries = []
+    def _get_kotobank_target_queries(self, entry_match: DictionaryEntryMatch, target: str) -> List[str]:
+        """
+        The Kotobank queries that target refers to for entry_match, without duplicates.
+        """
         if target == 'search_word':
-            for search_word in entry_match.search_words:
-                success = self._process_kotobank_query(search_word)
-                if success:
-                    successful_search_queries.append(search_word)
+            search_queries = list(entry_match.search_words)
         elif target == 'repr_writing':
-            search_query = entry_match.entry.word_representation.writing
-            if search_query is not None:
-                success = self._process_kotobank_query(search_query)
-                if success:
-                    successful_search_queries.append(search_query)
+            search_queries = [entry_match.entry.word_representation.writing]
         elif target == 'repr_reading':
-            search_query = entry_match.entry.word_representation.reading
-            if search_query is not None:
-                success = self._process_kotobank_query(search_query)
-                if success:
-                    successful_search_queries.append(search_query)
-        elif target == 'other_form_writing':
-            if entry_match.entry.meaning_section.other_forms is not None:
-                for other_form in entry_match.entry.meaning_section.other_forms:
-                    success = self._process_kotobank_query(other_form.writing)
-                    if success:
-                        successful_search_queries.append(other_form.writing)
-        elif target == 'other_form_reading':
-            if entry_match.entry.meaning_section.other_forms is not None:
-                for other_form in entry_match.entry.meaning_section.other_forms:
-                    success = self._process_kotobank_query(other_form.reading)
-                    if success:
-                        successful_search_queries.append(other_form.reading)
+            search_queries = [entry_match.entry.word_representation.reading]
+        elif target in ['other_form_writing', 'other_form_reading']:
+            other_forms = entry_match.entry.meaning_section.other_forms
+            other_forms = other_forms if other_forms is not None else []
+            if target == 'other_form_writing':
+                search_queries = [other_form.writing for other_form in other_forms]
+            else:
+                search_queries = [other_form.reading for other_form in other_forms]
         else:
             raise ValueError(f'Invalid target: {target}')
-        return list(set(successful_search_queries))
+        return list(dict.fromkeys([search_query for search_query in search_queries if search_query is not None]))
+
+    def _resolve_kotobank_queries(
+        self, search_queries: List[str], query_status: Dict[str, bool], dumped_queries: set,
+        num_workers: int=1, rate_limiter: HostRateLimiter=None,
+        description: str=None, show_pbar: bool=True, batch_size: int=500
+    ):
+        """
+        Adds search_query -> whether its Kotobank result is non-empty to query_status for each of search_queries.
+        Queries in dumped_queries are read from the dump store (through kotobank_result_cache), and the rest are
+        fetched by num_workers threads. Every fetched page is dumped as soon as it has been parsed.
+        """
+        search_queries = [search_query for search_query in dict.fromkeys(search_queries) if search_query not in query_status]
+        dumped = [search_query for search_query in search_queries if search_query in dumped_queries]
+        for i in range(0, len(dumped), batch_size):
+            results = self.kotobank_result_cache.get_many(dumped[i:i+batch_size])
+            for search_query, result in results.items():
+                query_status[search_query] = not result.is_empty
+        pending = [search_query for search_query in search_queries if search_query not in query_status]
+
+        pbar = tqdm(total=len(pending), unit='queries', leave=True) if show_pbar and len(pending) > 0 else None
+        if pbar is not None and description is not None:
+            pbar.set_description(description)
 
-    def parse_kotobank(self, force: bool=False, verbose: bool=False, show_pbar: bool=True):
+        def on_fetched(search_query: str, nonempty: bool):
+            query_status[search_query] = nonempty
+            dumped_queries.add(search_query)
+            if pbar is not None:
+                pbar.update()
+
+        if num_workers <= 1:
+            for search_query in pending:
+                on_fetched(*self._fetch_kotobank_query(search_query, rate_limiter=rate_limiter))
+        else:
+            executor = ThreadPoolExecutor(max_workers=num_workers)
+            futures = [executor.submit(self._fetch_kotobank_query, search_query, rate_limiter) for search_query in pending]
+            try:
+                for future in as_completed(futures):
+                    on_fetched(*future.result())
+            finally:
+                for future in futures:
+                    future.cancel()
+                executor.shutdown(wait=True)
+        if pbar is not None:
+            pbar.close()
+
+    @property
+    def kotobank_journal_path(self) -> str:
+        # Progress of parse_kotobank. Replaces the per-entry json files that used to be written to kotobank_temp_map_dir.
+        return f"{self.kotobank_temp_map_dir.rstrip('/')}.jsonl"
+
+    def _load_kotobank_journal(self, journal: JsonlJournal) -> Dict[int, List[str]]:
+        """
+        entry_match.id -> successful_search_queries of every entry that was finished before an interruption.
+        Progress left in kotobank_temp_map_dir by older versions is moved into the journal.
+        """
+        linked_queries = cast(Dict[int, List[str]], {})
+        for item_dict in journal.read():
+            linked_queries[item_dict['id']] = item_dict['successful_search_queries']
+        if dir_exists(self.kotobank_temp_map_dir):
+            for path in get_all_files_of_extension(self.kotobank_temp_map_dir, extension='json'):
+                entry_id = int(get_rootname_from_path(path))
+                if entry_id not in linked_queries:
+                    linked_queries[entry_id] = json.load(open(path, 'r'))['successful_search_queries']
+                    journal.append({'id': entry_id, 'successful_search_queries': linked_queries[entry_id]})
+            journal.sync()
+            delete_dir_if_exists(self.kotobank_temp_map_dir)
+        return linked_queries
+
+    def parse_kotobank(
+        self, force: bool=False, verbose: bool=False, show_pbar: bool=True,
+        num_workers: int=1, requests_per_second: float=None, burst: int=1, speculative_backups: bool=False
+    ):
         if force or self._metadata.requires_postmatching_redo:
             if force:
-                delete_all_files_in_dir(self.kotobank_parse_dump_dir)
-                delete_all_files_in_dir(self.kotobank_temp_map_dir)
-            
-            assert file_exists(self.jisho_pruned_entries_path), f"Couldn't find pruned Jisho matches path: {self.jisho_pruned_entries_path}"
-            entry_match_list = DictionaryEntryMatchList.load_from_path(self.jisho_pruned_entries_path)
+                self.kotobank_dump_store.clear()
+                self.kotobank_result_cache.clear()
+                JsonlJournal(self.kotobank_journal_path).delete()
+                delete_dir_if_exists(self.kotobank_temp_map_dir)
+            self._parse_kotobank(
+                verbose=verbose, show_pbar=show_pbar,
+                num_workers=num_workers, requests_per_second=requests_per_second, burst=burst,
+                speculative_backups=speculative_backups
+            )
 
-            make_dir_if_not_exists(self.kotobank_temp_map_dir)
-            finished_entry_ids = [
-                int(get_rootname_from_path(path))
-                for path in get_all_files_of_extension(self.kotobank_temp_map_dir, extension='json')
-            ]
+    def _parse_kotobank(
+        self, verbose: bool=False, show_pbar: bool=True,
+        num_workers: int=1, requests_per_second: float=None, burst: int=1, speculative_backups: bool=False
+    ):
+        """
+        Links every pruned Jisho entry to the Kotobank queries that gave a non-empty result, in two phases:
+            1. The queries of kotobank_parse_config.priority_targets are collected over every entry,
+               and each unique query is looked up once.
+            2. Only for the entries that none of their priority queries worked for, the backup targets
+               are tried in order until one of them works. The queries of each backup target are again
+               collected over all of those entries and looked up once.
+        Queries that haven't been dumped yet are fetched by num_workers threads, at most requests_per_second
+        (with bursts of burst) if it's given. Every page is dumped as soon as it has been parsed,
+        so an interrupted run only fetches what is still missing.
+        speculative_backups: Fetch the queries of every backup target at once in phase 2, instead of one
+            target at a time. This allows more fetches at once, but also fetches queries of later backup targets
+            that end up unused because an earlier one worked.
 
-            pbar = tqdm(total=len(entry_match_list), unit='entries', leave=True) if show_pbar else None
-            if pbar is not None:
-                pbar.set_description('Parsing Kotobank Results From Jisho Entries')
-            for entry_match in entry_match_list:
-                if entry_match.id in finished_entry_ids:
-                    if pbar is not None:
-                        pbar.update()
-                    continue
+        Linking is done in memory once the queries of a phase (or backup target) have been looked up, and every entry
+        that is linked is appended to the journal at kotobank_journal_path right away.
+        Entries that are already in the journal are skipped. These are the entries that an interrupted run had finished,
+        those whose links were carried over by prune_jisho_entry_matches, and those finished by an interrupted run of
+        the older entry-by-entry version. The pruned entries are only replaced once every entry has been linked,
+        and the journal is deleted after that.
+        """
+        assert file_exists(self.jisho_pruned_entries_path), f"Couldn't find pruned Jisho matches path: {self.jisho_pruned_entries_path}"
+        entry_match_list = DictionaryEntryMatchList.load_from_path(self.jisho_pruned_entries_path)
 
-                priority_target_found = False
-                backup_target_found = False
-                successful_search_queries = []
-                for target in self.kotobank_parse_config.priority_targets:
-                    successful_search_queries0 = self._process_kotobank_target(entry_match=entry_match, target=target)
-                    if len(successful_search_queries0) > 0:
-                        successful_search_queries.extend(successful_search_queries0)
-                        if not priority_target_found:
-                            priority_target_found = True
-
-                if not priority_target_found:
-                    for target in self.kotobank_parse_config.backup_targets:
-                        successful_search_queries0 = self._process_kotobank_target(entry_match=entry_match, target=target)
-                        if len(successful_search_queries0) > 0:
-                            successful_search_queries.extend(successful_search_queries0)
-                            if not backup_target_found:
-                                backup_target_found = True
-                                break
-                        
-                successful_search_queries = list(set(successful_search_queries))
-                nonempty_kotobank_result_found = priority_target_found or backup_target_found
-                json.dump(
-                    {'successful_search_queries': successful_search_queries},
-                    open(f'{self.kotobank_temp_map_dir}/{entry_match.id}.json', 'w'),
-                    ensure_ascii=False
+        journal = JsonlJournal(self.kotobank_journal_path)
+        linked_queries = self._load_kotobank_journal(journal)
+        pending_entries = [entry_match for entry_match in entry_match_list if entry_match.id not in linked_queries]
+        target_queries = cast(Dict[int, Dict[str, List[str]]], {
+            entry_match.id: {
+                target: self._get_kotobank_target_queries(entry_match=entry_match, target=target)
+                for target in self.kotobank_parse_config.priority_targets + self.kotobank_parse_config.backup_targets
+            }
+            for entry_match in pending_entries
+        })
+
+        rate_limiter = HostRateLimiter(rate=requests_per_second, capacity=burst) if requests_per_second is not None else None
+        query_status = cast(Dict[str, bool], {})
+        dumped_queries = set(self.kotobank_dump_store.keys())
+        def resolve(search_queries: List[str], description: str):
+            self._resolve_kotobank_queries(
+                search_queries, query_status=query_status, dumped_queries=dumped_queries,
+                num_workers=num_workers, rate_limiter=rate_limiter,
+                description=description, show_pbar=show_pbar
+            )
+        def link(entry_match: DictionaryEntryMatch, successful_search_queries: List[str]):
+            linked_queries[entry_match.id] = successful_search_queries
+            journal.append({'id': entry_match.id, 'successful_search_queries': successful_search_queries})
+        def get_successful_queries(entry_match: DictionaryEntryMatch, targets: List[str]) -> List[str]:
+            return list(dict.fromkeys([
+                search_query
+                for target in targets
+                for search_query in target_queries[entry_match.id][target]
+                if query_status[search_query]
+            ]))
+
+        # Phase 1: Priority targets
+        resolve(
+            [
+                search_query
+                for entry_match in pending_entries
+                for target in self.kotobank_parse_config.priority_targets
+                for search_query in target_queries[entry_match.id][target]
+            ],
+            description='Fetching Kotobank Results For Priority Targets'
+        )
+        remaining_entries = []
+        for entry_match in pending_entries:
+            successful_search_queries = get_successful_queries(entry_match, self.kotobank_parse_config.priority_targets)
+            if len(successful_search_queries) > 0:
+                link(entry_match, successful_search_queries)
+            else:
+                remaining_entries.append(entry_match)
+        num_backup_entries = len(remaining_entries)
+
+        # Phase 2: Backup targets, only for the entries that are still unlinked.
+        for i, target in enumerate(self.kotobank_parse_config.backup_targets):
+            if len(remaining_entries) == 0:
+                break
+            if not speculative_backups or i == 0:
+                resolve(
+                    [
+                        search_query
+                        for entry_match in remaining_entries
+                        for target0 in (self.kotobank_parse_config.backup_targets if speculative_backups else [target])
+                        for search_query in target_queries[entry_match.id][target0]
+                    ],
+                    description=f'Fetching Kotobank Results For Backup Target: {target}' if not speculative_backups else 'Fetching Kotobank Results For Backup Targets'
                 )
+            still_remaining_entries = []
+            for entry_match in remaining_entries:
+                successful_search_queries = get_successful_queries(entry_match, [target])
+                if len(successful_search_queries) > 0:
+                    link(entry_match, successful_search_queries)
+                else:
+                    still_remaining_entries.append(entry_match)
+            remaining_entries = still_remaining_entries
+        for entry_match in remaining_entries:
+            link(entry_match, [])
+        journal.sync()
+
+        for entry_match in entry_match_list:
+            entry_match.linked_kotobank_queries = linked_queries[entry_match.id]
+        # Written next to the pruned entries and then renamed, so a crash leaves either the old or the new file.
+        temp_save_path = f'{os.path.splitext(self.jisho_pruned_entries_path)[0]}.tmp.json'
+        entry_match_list.save_to_path(temp_save_path, overwrite=True)
+        os.replace(temp_save_path, self.jisho_pruned_entries_path)
+        journal.delete()
+        self._metadata.requires_postmatching_redo = False
+        self._metadata.requires_kotobank_linking = False
+        self._metadata.requires_kotobank_combine = True
+        self._metadata.requires_jisho_kotobank_results_combine = True
+        self.save_to_path(self.manager_save_path, overwrite=True)
+        self.kotobank_dump_store.close()
+        if verbose:
+            logger.cyan(
+                f'Linked {len(pending_entries)} entries with {len(query_status)} unique Kotobank queries. '
+                f'{num_backup_entries} entries needed backup targets and {len(remaining_entries)} entries are unlinked.'
+            )
+            self._log_http_stats()
+            logger.cyan(f'Kotobank Result Cache: {self.kotobank_result_cache.stats.to_dict()}')
+
+    def _run_reparse_tasks(
+        self, func, tasks: List[tuple], dump_store: DumpStore, num_workers: int=None,
+        description: str=None, show_pbar: bool=True, batch_size: int=256, min_pool_size: int=2000
+    ) -> List[tuple]:
+        """
+        When there are at least min_pool_size tasks and more than one worker, the pages are parsed by num_workers processes.
+        Otherwise starting the processes and sending the dumps back costs more than it saves, so they are parsed in this process.
+        """
+        num_workers = num_workers if num_workers is not None else os.cpu_count()
+        failures = []
+        batch = cast(Dict[str, dict], {})
+        pbar = tqdm(total=len(tasks), unit='pages', leave=True) if show_pbar else None
+        if pbar is not None and description is not None:
+            pbar.set_description(description)
+        executor = ProcessPoolExecutor(max_workers=num_workers) if num_workers > 1 and len(tasks) >= min_pool_size else None
+        try:
+            results = executor.map(func, tasks, chunksize=16) if executor is not None else map(func, tasks)
+            for key, item_dict, error in results:
+                if error is not None:
+                    failures.append((key, error))
+                else:
+                    batch[key] = item_dict
+                    if len(batch) >= batch_size:
+                        dump_store.save_dicts(batch)
+                        batch = {}
                 if pbar is not None:
                     pbar.update()
-            if pbar is not None:
-                pbar.close()
-            
-            pbar = tqdm(total=len(entry_match_list), unit='entries', leave=True) if show_pbar else None
-            if pbar is not None:
-                pbar.set_description('Linking Kotobank Results To Jisho Entries')
-            for entry_match in entry_match_list:
-                temp_dict = json.load(open(f'{self.kotobank_temp_map_dir}/{entry_match.id}.json', 'r'))
-                entry_match.linked_kotobank_queries = temp_dict['successful_search_queries']
-                if pbar is not None:
-                    pbar.update()
-            entry_match_list.save_to_path(self.jisho_pruned_entries_path, overwrite=True)
-            delete_dir_if_exists(self.kotobank_temp_map_dir)
-            if pbar is not None:
-                pbar.close()
-            self._metadata.requires_postmatching_redo = False
+        finally:
+            if executor is not None:
+                executor.shutdown()
+        dump_store.save_dicts(batch)
+        dump_store.close()
+        if pbar is not None:
+            pbar.close()
+        return failures
+
+    def reparse_raw_html(
+        self, jisho: bool=True, kotobank: bool=True, num_workers: int=None,
+        verbose: bool=False, show_pbar: bool=True
+    ) -> List[tuple]:
+        """
+        Regenerates the Jisho and Kotobank dumps from the pages in raw_html_cache_dir without any requests,
+        e.g. after a parser fix. Parsing is spread over num_workers processes (all cores by default)
+        when there are enough pages for that to pay off (see _run_reparse_tasks).
+        Jisho dumps are only regenerated for searches in the grouped history, so that history_group_id is kept.
+        Searches that aren't in the cache are left as they are.
+        Returns (dump key, error) for every page that failed to parse.
+        """
+        assert self.raw_html_cache_dir is not None, f"raw_html_cache_dir hasn't been set."
+        cache = self.http_client.cache
+
+        jisho_tasks = []
+        if jisho:
+            assert file_exists(self.jisho_grouped_history_path), f"Couldn't find Jisho Grouped History at: {self.jisho_grouped_history_path}"
+            for group in CommonBrowserHistoryItemGroupList.load_from_path(self.jisho_grouped_history_path):
+                search_word = urllib.parse.unquote(group.url.replace('https://jisho.org/search/', ''))
+                if any([invalid_str in search_word for invalid_str in ['#kanji', '#sentences', '#names']]):
+                    continue
+                entry = cache.load_entry(group.url)
+                if entry is not None:
+                    jisho_tasks.append((cache.get_body_path(entry), group.url, group.id, search_word, self.html_parser_backend))
+        kotobank_tasks = []
+        if kotobank:
+            for entry in cache.iter_entries():
+                if entry.url.startswith('https://kotobank.jp/word/'):
+                    search_query = entry.url.replace('https://kotobank.jp/word/', '', 1)
+                    kotobank_tasks.append((cache.get_body_path(entry), entry.url, search_query, self.html_parser_backend))
+
+        failures = []
+        if len(jisho_tasks) > 0:
+            failures.extend(self._run_reparse_tasks(_reparse_jisho_html, jisho_tasks, self.jisho_dump_store, num_workers=num_workers, description='Re-parsing Jisho Pages', show_pbar=show_pbar))
+            self._metadata.requires_jisho_matching = True
+        if len(kotobank_tasks) > 0:
+            failures.extend(self._run_reparse_tasks(_reparse_kotobank_html, kotobank_tasks, self.kotobank_dump_store, num_workers=num_workers, description='Re-parsing Kotobank Pages', show_pbar=show_pbar))
+            self.kotobank_result_cache.clear()
             self._metadata.requires_kotobank_combine = True
-            self.save_to_path(self.manager_save_path, overwrite=True)
+            self._metadata.requires_jisho_kotobank_results_combine = True
+        self.save_to_path(self.manager_save_path, overwrite=True)
+        if verbose:
+            logger.cyan(f'Re-parsed {len(jisho_tasks)} Jisho pages and {len(kotobank_tasks)} Kotobank pages. Failures: {len(failures)}')
+            for key, error in failures:
+                logger.yellow(f'{key}: {error}')
+        return failures
 
     def combine_kotobank_results(self, force: bool=False, verbose: bool=False, show_pbar: bool=True):
         if self._metadata.requires_kotobank_combine or force or not file_exists(self.combined_kotobank_dump_path):
-            kotobank_result_list = KotobankResultList.load_from_dir(self.kotobank_parse_dump_dir, show_pbar=show_pbar)
+            kotobank_result_list = KotobankResultList.load_from_dump_store(self.kotobank_dump_store, show_pbar=show_pbar)
             kotobank_result_list.save_to_path(self.combined_kotobank_dump_path, overwrite=True)
             self._metadata.requires_kotobank_combine = False
             self.save_to_path(self.manager_save_path, overwrite=True)
@@ -503,18 +1337,19 @@ class ParserManager(BasicLoadableObject['ParserManager']):
     def combine_jisho_and_kotobank_results(self, force: bool=False, verbose: bool=False, show_pbar: bool=True):
         if self._metadata.requires_jisho_kotobank_results_combine or force or not file_exists(self.jisho_kotobank_combined_dump_path):
             assert file_exists(self.jisho_pruned_entries_path), f"Couldn't find Pruned Jisho Matches: {self.jisho_pruned_entries_path}"
-            assert dir_exists(self.kotobank_parse_dump_dir), f"Couldn't find kotobank parse directory: {self.kotobank_parse_dump_dir}"
+            assert self.kotobank_dump_store.exists, f"Couldn't find kotobank parse dumps: {self.kotobank_dump_store.path}"
             pruned_jisho_entries = DictionaryEntryMatchList.load_from_path(self.jisho_pruned_entries_path)
             if verbose:
                 logger.cyan('Combining Jisho and Kotobank Results')
             combined_results = CombinedResultList.from_matches(
                 entry_matches=pruned_jisho_entries,
-                kotobank_dump_dir=self.kotobank_parse_dump_dir,
+                kotobank_cache=self.kotobank_result_cache,
                 show_pbar=show_pbar, leave_pbar=True
             )
             combined_results.save_to_path(self.jisho_kotobank_combined_dump_path, overwrite=True)
             if verbose:
                 logger.cyan('Finished Combining Jisho and Kotobank Results')
+                logger.cyan(f'Kotobank Result Cache: {self.kotobank_result_cache.stats.to_dict()}')
             if self._metadata.requires_jisho_kotobank_results_combine:
                 self._metadata.requires_jisho_kotobank_results_combine = False
             self._metadata.requires_filter_and_sort = True
@@ -533,8 +1368,8 @@ class ParserManager(BasicLoadableObject['ParserManager']):
                 anki_deck_export_paths = get_all_files_of_extension(self.anki_export_dir_for_filter, 'txt')
                 if verbose and len(anki_deck_export_paths) > 0:
                     logger.cyan('Filtering Jisho and Kotobank Results')
-                for path in anki_deck_export_paths:
-                    combined_results = combined_results.filter_out_anki_export(path, show_pbar=show_pbar, leave_pbar=True)
+                if len(anki_deck_export_paths) > 0:
+                    combined_results = combined_results.filter_out_anki_exports(anki_deck_export_paths, show_pbar=show_pbar, leave_pbar=True)
                 if verbose and len(anki_deck_export_paths) > 0:
                     logger.cyan('Finished Filtering Jisho and Kotobank Results')
             combined_results.save_to_path(self.filter_sorted_results_dump_path, overwrite=True)
@@ -544,7 +1379,7 @@ class ParserManager(BasicLoadableObject['ParserManager']):
             self.save_to_path(self.manager_save_path, overwrite=True)
 
     def parse_and_combine_koohii(self, force: bool=False, verbose: bool=False, show_pbar: bool=True):
-        if self._metadata.requires_parse_and_combine_koohii or force or not dir_exists(self.koohii_parse_dump_dir) or not file_exists(self.koohii_combined_dump_path):
+        if self._metadata.requires_parse_and_combine_koohii or force or not self.koohii_dump_store.exists or not file_exists(self.koohii_combined_dump_path):
             assert file_exists(self.filter_sorted_results_dump_path)
             results = CombinedResultList.load_from_path(self.filter_sorted_results_dump_path)
             kanji_info_list = results.get_all_writing_kanji(include_hit_count=True, show_pbar=show_pbar, leave_pbar=True)
@@ -553,18 +1388,137 @@ class ParserManager(BasicLoadableObject['ParserManager']):
                 logger.cyan('Parsing and Combining Kanji Data From Koohii')
             parser.parse_and_save(
                 kanji_info_list=kanji_info_list,
-                save_dir=self.koohii_parse_dump_dir, combined_save_path=self.koohii_combined_dump_path,
+                dump_store=self.koohii_dump_store, combined_save_path=self.koohii_combined_dump_path,
                 learned_kanji_txt_path=self.learned_kanji_txt_path,
                 filtered_dump_path=self.filtered_koohii_dump_path
             )
+            self.koohii_dump_store.close()
 
             if self._metadata.requires_parse_and_combine_koohii:
                 self._metadata.requires_parse_and_combine_koohii = False
                 self.save_to_path(self.manager_save_path, overwrite=True)
 
+    @property
+    def pipeline_state_path(self) -> str:
+        return f'{os.path.splitext(self.manager_save_path)[0]}_pipeline.json'
+
+    def get_pipeline(
+        self, incremental_combine_history: bool=False,
+        jisho_num_workers: int=1, jisho_requests_per_second: float=None,
+        kotobank_num_workers: int=1, kotobank_requests_per_second: float=None,
+        verbose: bool=False, show_pbar: bool=True
+    ) -> Pipeline:
+        """
+        The stages of run, with the files and directories that each of them reads and writes.
+        """
+        def parse_kotobank(force: bool):
+            if force:
+                self.parse_kotobank(
+                    force=True, verbose=verbose, show_pbar=show_pbar,
+                    num_workers=kotobank_num_workers, requests_per_second=kotobank_requests_per_second
+                )
+            else:
+                # Unlike force, this keeps the Kotobank dumps that were already downloaded.
+                self._parse_kotobank(
+                    verbose=verbose, show_pbar=show_pbar,
+                    num_workers=kotobank_num_workers, requests_per_second=kotobank_requests_per_second
+                )
+
+        # The dump stores are tracked through their version files instead of hashing every dump.
+        jisho_dump_version_path = self.jisho_dump_store.get_version_path()
+        kotobank_dump_version_path = self.kotobank_dump_store.get_version_path()
+        koohii_dump_version_path = self.koohii_dump_store.get_version_path()
+        stages = [
+            PipelineStage(
+                name='combine_history',
+                func=lambda force: self.combine_history(
+                    force=force or not incremental_combine_history, verbose=verbose, show_pbar=show_pbar,
+                    incremental=incremental_combine_history
+                ),
+                inputs=[self.browser_history_dir],
+                outputs=[self.combined_history_path, self.partitioned_history_dir]
+            ),
+            PipelineStage(
+                name='combine_chrome_history',
+                func=lambda force: self.combine_chrome_history(force=force, verbose=verbose),
+                inputs=[self.chrome_history_db_path],
+                outputs=[self.combined_history_path, self.partitioned_history_dir]
+            ),
+            PipelineStage(
+                name='group_jisho_history',
+                func=lambda force: self.group_jisho_history(force=force, verbose=verbose),
+                inputs=[self.combined_history_path],
+                outputs=[self.jisho_grouped_history_path]
+            ),
+            PipelineStage(
+                name='parse_jisho',
+                func=lambda force: self.parse_jisho(
+                    force=force, verbose=verbose, show_pbar=show_pbar,
+                    num_workers=jisho_num_workers, requests_per_second=jisho_requests_per_second
+                ),
+                inputs=[self.jisho_grouped_history_path],
+                outputs=[jisho_dump_version_path]
+            ),
+            PipelineStage(
+                name='accumulate_jisho_matches',
+                func=lambda force: self._accumulate_jisho_matches(force=force, verbose=verbose, show_pbar=show_pbar),
+                inputs=[jisho_dump_version_path],
+                outputs=[self.jisho_matches_path]
+            ),
+            PipelineStage(
+                name='prune_jisho_entry_matches',
+                func=lambda force: self.prune_jisho_entry_matches(force=force, verbose=verbose, show_pbar=show_pbar),
+                inputs=[self.jisho_matches_path],
+                outputs=[self.jisho_pruned_entries_path]
+            ),
+            PipelineStage(
+                name='load_jisho_entry_matches_time_usec',
+                func=lambda force: self.load_jisho_entry_matches_time_usec(force=force, verbose=verbose, show_pbar=show_pbar),
+                inputs=[self.jisho_pruned_entries_path, self.jisho_grouped_history_path],
+                outputs=[self.jisho_pruned_entries_path]
+            ),
+            PipelineStage(
+                name='parse_kotobank',
+                func=parse_kotobank,
+                inputs=[self.jisho_pruned_entries_path],
+                outputs=[self.jisho_pruned_entries_path, kotobank_dump_version_path],
+                params=self.kotobank_parse_config.to_dict()
+            ),
+            PipelineStage(
+                name='combine_kotobank_results',
+                func=lambda force: self.combine_kotobank_results(force=force, verbose=verbose, show_pbar=show_pbar),
+                inputs=[kotobank_dump_version_path],
+                outputs=[self.combined_kotobank_dump_path]
+            ),
+            PipelineStage(
+                name='combine_jisho_and_kotobank_results',
+                func=lambda force: self.combine_jisho_and_kotobank_results(force=force, verbose=verbose, show_pbar=show_pbar),
+                inputs=[self.jisho_pruned_entries_path, kotobank_dump_version_path],
+                outputs=[self.jisho_kotobank_combined_dump_path]
+            ),
+            PipelineStage(
+                name='filter_and_sort_results',
+                func=lambda force: self.filter_and_sort_results(force=force, verbose=verbose, show_pbar=show_pbar),
+                inputs=[self.jisho_kotobank_combined_dump_path, self.anki_export_dir_for_filter],
+                outputs=[self.filter_sorted_results_dump_path],
+                force_inputs=[self.anki_export_dir_for_filter]
+            ),
+            PipelineStage(
+                name='parse_and_combine_koohii',
+                func=lambda force: self.parse_and_combine_koohii(force=force, verbose=verbose, show_pbar=show_pbar),
+                inputs=[self.filter_sorted_results_dump_path, self.learned_kanji_txt_path],
+                outputs=[koohii_dump_version_path, self.koohii_combined_dump_path, self.filtered_koohii_dump_path],
+                force_inputs=[self.learned_kanji_txt_path]
+            )
+        ]
+        if self.chrome_history_db_path is None:
+            stages = [stage for stage in stages if stage.name != 'combine_chrome_history']
+        return Pipeline(stages=stages, state_path=self.pipeline_state_path)
+
     def run(
         self,
-        force_combine_history: bool=False, ignore_combine_history: bool=False,
+        force_combine_history: bool=False, ignore_combine_history: bool=False, incremental_combine_history: bool=False,
+        force_combine_chrome_history: bool=False, ignore_combine_chrome_history: bool=False,
         force_group_jisho_history: bool=False, ignore_group_jisho_history: bool=False,
         force_parse_jisho: bool=False, ignore_parse_jisho: bool=False,
         force_accumulate_jisho_matches: bool=False, ignore_accumulate_jisho_matches: bool=False,
@@ -575,27 +1529,39 @@ class ParserManager(BasicLoadableObject['ParserManager']):
         force_combine_jisho_and_kotobank_results: bool=False, ignore_combine_jisho_and_kotobank_results: bool=False,
         force_filter_and_sort_results: bool=False, ignore_filter_and_sort_results: bool=False,
         force_parse_and_combine_koohii: bool=False, ignore_parse_and_combine_koohii: bool=False,
-        verbose: bool=False, show_pbar: bool=True
-    ):
-        if not ignore_combine_history or force_combine_history:
-            self.combine_history(force=force_combine_history, verbose=verbose, show_pbar=show_pbar)
-        if not ignore_group_jisho_history or force_group_jisho_history:
-            self.group_jisho_history(force=force_group_jisho_history, verbose=verbose)
-        if not ignore_parse_jisho or force_parse_jisho:
-            self.parse_jisho(force=force_parse_jisho, verbose=verbose, show_pbar=show_pbar)
-        if not ignore_accumulate_jisho_matches or force_accumulate_jisho_matches:
-            self.accumulate_jisho_matches(force=force_accumulate_jisho_matches, verbose=verbose, show_pbar=show_pbar)
-        if not ignore_prune_jisho_entry_matches or force_prune_jisho_entry_matches:
-            self.prune_jisho_entry_matches(force=force_prune_jisho_entry_matches, verbose=verbose, show_pbar=show_pbar)
-        if not ignore_load_jisho_entry_matches_time_usec or force_load_jisho_entry_matches_usec:
-            self.load_jisho_entry_matches_time_usec(force=force_load_jisho_entry_matches_usec, verbose=verbose, show_pbar=show_pbar)
-        if not ignore_parse_kotobank or force_parse_kotobank:
-            self.parse_kotobank(force=force_parse_kotobank, verbose=verbose, show_pbar=show_pbar)
-        if not ignore_combine_kotobank or force_combine_kotobank:
-            self.combine_kotobank_results(force=force_combine_kotobank, verbose=verbose, show_pbar=show_pbar)
-        if not ignore_combine_jisho_and_kotobank_results or force_combine_jisho_and_kotobank_results:
-            self.combine_jisho_and_kotobank_results(force=force_combine_jisho_and_kotobank_results, verbose=verbose, show_pbar=show_pbar)
-        if not ignore_filter_and_sort_results or force_filter_and_sort_results:
-            self.filter_and_sort_results(force=force_filter_and_sort_results, verbose=verbose, show_pbar=show_pbar)
-        if not ignore_parse_and_combine_koohii or force_parse_and_combine_koohii:
-            self.parse_and_combine_koohii(force=force_parse_and_combine_koohii, verbose=verbose, show_pbar=show_pbar)
+        jisho_num_workers: int=1, jisho_requests_per_second: float=None,
+        kotobank_num_workers: int=1, kotobank_requests_per_second: float=None,
+        verbose: bool=False, show_pbar: bool=True, max_workers: int=4
+    ) -> PipelineStageReportList:
+        """
+        Runs every stage through the pipeline. A stage is skipped when the content hashes of the files it reads
+        and writes are the same as the last time it ran, and stages that don't depend on each other run concurrently.
+        Returns a report of which stages were cache hits.
+        """
+        stage_flags = [
+            ('combine_history', force_combine_history, ignore_combine_history),
+            ('combine_chrome_history', force_combine_chrome_history, ignore_combine_chrome_history),
+            ('group_jisho_history', force_group_jisho_history, ignore_group_jisho_history),
+            ('parse_jisho', force_parse_jisho, ignore_parse_jisho),
+            ('accumulate_jisho_matches', force_accumulate_jisho_matches, ignore_accumulate_jisho_matches),
+            ('prune_jisho_entry_matches', force_prune_jisho_entry_matches, ignore_prune_jisho_entry_matches),
+            ('load_jisho_entry_matches_time_usec', force_load_jisho_entry_matches_usec, ignore_load_jisho_entry_matches_time_usec),
+            ('parse_kotobank', force_parse_kotobank, ignore_parse_kotobank),
+            ('combine_kotobank_results', force_combine_kotobank, ignore_combine_kotobank),
+            ('combine_jisho_and_kotobank_results', force_combine_jisho_and_kotobank_results, ignore_combine_jisho_and_kotobank_results),
+            ('filter_and_sort_results', force_filter_and_sort_results, ignore_filter_and_sort_results),
+            ('parse_and_combine_koohii', force_parse_and_combine_koohii, ignore_parse_and_combine_koohii)
+        ]
+        pipeline = self.get_pipeline(
+            incremental_combine_history=incremental_combine_history,
+            jisho_num_workers=jisho_num_workers, jisho_requests_per_second=jisho_requests_per_second,
+            kotobank_num_workers=kotobank_num_workers, kotobank_requests_per_second=kotobank_requests_per_second,
+            verbose=verbose, show_pbar=show_pbar
+        )
+        stage_names = [stage.name for stage in pipeline.stages]
+        stage_flags = [(name, force, ignore) for name, force, ignore in stage_flags if name in stage_names]
+        return pipeline.run(
+            force=[name for name, force, ignore in stage_flags if force],
+            ignore=[name for name, force, ignore in stage_flags if ignore and not force],
+            max_workers=max_workers, verbose=verbose
+        )
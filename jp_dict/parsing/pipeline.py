@@ -0,0 +1,278 @@
+from __future__ import annotations
+import os
+import time
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import List, Dict, Callable, cast
+from common_utils.base.basic import BasicLoadableObject, BasicLoadableHandler, BasicHandler
+from common_utils.file_utils import file_exists, dir_exists
+from logger import logger
+from ..util.hash_utils import get_file_hash, get_json_hash
+
+class PipelineStage:
+    """
+    A stage of the pipeline.
+    func is called with force=True/False when the stage has to run.
+    inputs and outputs are the paths of the files or directories that the stage reads and writes,
+    and params are any settings that should also trigger a rerun when they change.
+    force_inputs are the inputs that the stage has no way of noticing a change in by itself
+    (i.e. no requires_* flag is set when they change), so a change in one of them runs it with force=True.
+    """
+    def __init__(
+        self, name: str, func: Callable[[bool], None],
+        inputs: List[str]=None, outputs: List[str]=None, params: dict=None, force_inputs: List[str]=None
+    ):
+        self.name = name
+        self.func = func
+        self.inputs = [path for path in inputs if path is not None] if inputs is not None else []
+        self.outputs = [path for path in outputs if path is not None] if outputs is not None else []
+        self.params = params
+        self.force_inputs = [path for path in force_inputs if path is not None] if force_inputs is not None else []
+        assert all([path in self.inputs for path in self.force_inputs]), f'force_inputs must also be inputs.'
+
+    def __str__(self) -> str:
+        return f'{type(self).__name__}({self.name})'
+
+    def __repr__(self) -> str:
+        return self.__str__()
+
+class PipelineStageRecord(BasicLoadableObject['PipelineStageRecord']):
+    def __init__(self, name: str, input_hashes: Dict[str, str], output_hashes: Dict[str, str]):
+        super().__init__()
+        self.name = name
+        self.input_hashes = input_hashes
+        self.output_hashes = output_hashes
+
+class PipelineState(BasicLoadableObject['PipelineState']):
+    def __init__(self, records: Dict[str, PipelineStageRecord]=None, file_hashes: Dict[str, list]=None):
+        super().__init__()
+        self.records = records if records is not None else {}
+        # path -> [size, mtime_ns, sha1], so that unchanged files don't have to be read again.
+        self.file_hashes = file_hashes if file_hashes is not None else {}
+
+    def to_dict(self) -> dict:
+        return {
+            'records': {name: record.to_dict() for name, record in self.records.items()},
+            'file_hashes': self.file_hashes
+        }
+
+    @classmethod
+    def from_dict(cls, item_dict: dict) -> PipelineState:
+        return PipelineState(
+            records={name: PipelineStageRecord.from_dict(record_dict) for name, record_dict in item_dict['records'].items()},
+            file_hashes=item_dict['file_hashes']
+        )
+
+class PipelineStageReport(BasicLoadableObject['PipelineStageReport']):
+    def __init__(self, name: str, status: str, elapsed: float=0.0, changed: List[str]=None):
+        """
+        status: One of the following
+            'hit': The inputs and outputs were unchanged, so the stage was skipped.
+            'ran': The stage was run.
+            'forced': The stage was run because it was forced.
+            'ignored': The stage was ignored.
+            'failed': The stage raised an exception.
+            'blocked': The stage wasn't run because a stage that it depends on failed.
+        changed: The inputs/outputs whose hash was different from the last run.
+        """
+        super().__init__()
+        self.name = name
+        self.status = status
+        self.elapsed = elapsed
+        self.changed = changed if changed is not None else []
+
+    @property
+    def is_cache_hit(self) -> bool:
+        return self.status == 'hit'
+
+class PipelineStageReportList(
+    BasicLoadableHandler['PipelineStageReportList', 'PipelineStageReport'],
+    BasicHandler['PipelineStageReportList', 'PipelineStageReport']
+):
+    def __init__(self, report_list: List[PipelineStageReport]=None):
+        super().__init__(obj_type=PipelineStageReport, obj_list=report_list)
+        self.report_list = self.obj_list
+
+    @classmethod
+    def from_dict_list(cls, dict_list: List[dict]) -> PipelineStageReportList:
+        return PipelineStageReportList([PipelineStageReport.from_dict(item_dict) for item_dict in dict_list])
+
+    @property
+    def cache_hit_count(self) -> int:
+        return len([report for report in self if report.is_cache_hit])
+
+    def log(self):
+        for report in self:
+            line = f'{report.name}: {report.status}'
+            if report.status in ['ran', 'forced', 'failed']:
+                line += f' ({round(report.elapsed, 3)}s)'
+            if len(report.changed) > 0:
+                line += f" changed: {', '.join(report.changed)}"
+            logger.cyan(line)
+        logger.cyan(f'Cache hits: {self.cache_hit_count}/{len(self)}')
+
+class Pipeline:
+    """
+    Runs stages in dependency order, skipping the ones whose inputs and outputs have the same
+    content hashes as the last time they ran.
+
+    Dependencies are derived from the declared artifacts in the order that the stages are given:
+    a stage depends on every earlier stage that writes one of its inputs, and on every earlier
+    stage that reads or writes one of its outputs.
+    Stages that don't depend on each other are run concurrently.
+    """
+    def __init__(self, stages: List[PipelineStage], state_path: str):
+        assert len(set([stage.name for stage in stages])) == len(stages), f'Stage names must be unique.'
+        self.stages = stages
+        self.state_path = state_path
+        self.state = PipelineState.load_from_path(state_path) if file_exists(state_path) else PipelineState()
+        self._lock = threading.Lock()
+
+    def get_dependencies(self) -> Dict[str, List[str]]:
+        dependencies = cast(Dict[str, List[str]], {})
+        for i, stage in enumerate(self.stages):
+            dependencies[stage.name] = []
+            for prev_stage in self.stages[:i]:
+                writes_input = any([path in prev_stage.outputs for path in stage.inputs])
+                touches_output = any([path in prev_stage.inputs + prev_stage.outputs for path in stage.outputs])
+                if writes_input or touches_output:
+                    dependencies[stage.name].append(prev_stage.name)
+        return dependencies
+
+    def _get_file_hash(self, path: str) -> str:
+        stat = os.stat(path)
+        with self._lock:
+            cached = self.state.file_hashes.get(path)
+        if cached is not None and cached[0] == stat.st_size and cached[1] == stat.st_mtime_ns:
+            return cached[2]
+        file_hash = get_file_hash(path)
+        with self._lock:
+            self.state.file_hashes[path] = [stat.st_size, stat.st_mtime_ns, file_hash]
+        return file_hash
+
+    def get_artifact_hash(self, path: str) -> str:
+        """
+        sha1 of a file, or of the relative paths and contents of every file under a directory.
+        None if the path doesn't exist.
+        """
+        if file_exists(path):
+            return self._get_file_hash(path)
+        elif dir_exists(path):
+            sha1 = hashlib.sha1()
+            for dirpath, dirnames, filenames in os.walk(path):
+                dirnames.sort()
+                for filename in sorted(filenames):
+                    file_path = f'{dirpath}/{filename}'
+                    sha1.update(f'{os.path.relpath(file_path, path)}:{self._get_file_hash(file_path)}\n'.encode('utf-8'))
+            return sha1.hexdigest()
+        else:
+            return None
+
+    def _get_input_hashes(self, stage: PipelineStage) -> Dict[str, str]:
+        input_hashes = {path: self.get_artifact_hash(path) for path in stage.inputs}
+        if stage.params is not None:
+            input_hashes['params'] = get_json_hash(stage.params)
+        return input_hashes
+
+    def _get_output_hashes(self, stage: PipelineStage) -> Dict[str, str]:
+        return {path: self.get_artifact_hash(path) for path in stage.outputs}
+
+    def _save_state(self):
+        with self._lock:
+            self.state.save_to_path(self.state_path, overwrite=True)
+
+    def _run_stage(self, stage: PipelineStage, force: bool) -> PipelineStageReport:
+        input_hashes = self._get_input_hashes(stage)
+        output_hashes = self._get_output_hashes(stage)
+        with self._lock:
+            record = self.state.records.get(stage.name)
+        if record is None:
+            changed = list(input_hashes.keys()) + list(output_hashes.keys())
+        else:
+            changed = [key for key, val in input_hashes.items() if record.input_hashes.get(key) != val] \
+                + [key for key, val in output_hashes.items() if record.output_hashes.get(key) != val]
+        missing_output = any([val is None for val in output_hashes.values()])
+        if not force and record is not None and len(changed) == 0 and not missing_output:
+            return PipelineStageReport(name=stage.name, status='hit')
+
+        t0 = time.time()
+        stage.func(force or any([path in changed for path in stage.force_inputs]))
+        elapsed = time.time() - t0
+
+        # Inputs are hashed again since a stage may also rewrite its inputs.
+        record = PipelineStageRecord(
+            name=stage.name,
+            input_hashes=self._get_input_hashes(stage),
+            output_hashes=self._get_output_hashes(stage)
+        )
+        with self._lock:
+            self.state.records[stage.name] = record
+        self._save_state()
+        return PipelineStageReport(name=stage.name, status='forced' if force else 'ran', elapsed=elapsed, changed=changed)
+
+    def _refresh_records(self, finished_stage_names: List[str]):
+        """
+        Later stages can rewrite an artifact that an earlier stage wrote, like combine_chrome_history appending to
+        the combined history. Without this, the earlier stage would see its output as changed on the next run.
+        """
+        for stage in self.stages:
+            record = self.state.records.get(stage.name)
+            if stage.name not in finished_stage_names or record is None:
+                continue
+            for path in stage.outputs:
+                record.output_hashes[path] = self.get_artifact_hash(path)
+                if path in record.input_hashes:
+                    record.input_hashes[path] = record.output_hashes[path]
+        self._save_state()
+
+    def run(self, force: List[str]=None, ignore: List[str]=None, max_workers: int=4, verbose: bool=False) -> PipelineStageReportList:
+        """
+        force: Names of the stages to run regardless of their hashes. Forced stages get force=True.
+        ignore: Names of the stages to skip. Stages that depend on them run with whatever is on disk.
+        """
+        force = force if force is not None else []
+        ignore = ignore if ignore is not None else []
+        stage_names = [stage.name for stage in self.stages]
+        for name in force + ignore:
+            assert name in stage_names, f'Invalid stage name: {name}. Valid names: {stage_names}'
+        dependencies = self.get_dependencies()
+        stage_dict = {stage.name: stage for stage in self.stages}
+        reports = cast(Dict[str, PipelineStageReport], {})
+        pending = list(stage_names)
+        futures = {}
+        error = None
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            while len(pending) > 0 or len(futures) > 0:
+                for name in list(pending):
+                    dep_reports = [reports.get(dep_name) for dep_name in dependencies[name]]
+                    if any([report is not None and report.status in ['failed', 'blocked'] for report in dep_reports]):
+                        reports[name] = PipelineStageReport(name=name, status='blocked')
+                        pending.remove(name)
+                    elif all([report is not None for report in dep_reports]):
+                        pending.remove(name)
+                        if name in ignore and name not in force:
+                            reports[name] = PipelineStageReport(name=name, status='ignored')
+                        else:
+                            futures[executor.submit(self._run_stage, stage_dict[name], name in force)] = name
+                if len(futures) == 0:
+                    continue
+                done, _ = wait(list(futures.keys()), return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = futures.pop(future)
+                    try:
+                        reports[name] = future.result()
+                    except Exception as e:
+                        reports[name] = PipelineStageReport(name=name, status='failed')
+                        error = e if error is None else error
+                    if verbose:
+                        logger.cyan(f'{name}: {reports[name].status}')
+
+        self._refresh_records([name for name, report in reports.items() if report.status in ['hit', 'ran', 'forced']])
+        report_list = PipelineStageReportList([reports[name] for name in stage_names])
+        if verbose:
+            report_list.log()
+        if error is not None:
+            raise error
+        return report_list
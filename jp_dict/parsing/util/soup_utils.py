@@ -0,0 +1,42 @@
+from bs4 import BeautifulSoup, SoupStrainer
+
+html_parser_backends = ['html.parser', 'lxml']
+
+class TitleAndIdStrainer(SoupStrainer):
+    """
+    Only builds <title> and the element with the given id, together with everything under them.
+    The rest of the page is skipped while parsing instead of being built into the tree.
+    """
+    def __init__(self, element_id: str):
+        super().__init__()
+        self.element_id = element_id
+
+    def _keep(self, name, attrs) -> bool:
+        return name == 'title' or (attrs is not None and attrs.get('id') == self.element_id)
+
+    # beautifulsoup4>=4.13
+    def allow_tag_creation(self, nsprefix, name, attrs) -> bool:
+        return self._keep(name, attrs)
+
+    def allow_string_creation(self, string) -> bool:
+        return False
+
+    # beautifulsoup4<4.13
+    def search_tag(self, markup_name=None, markup_attrs=None):
+        return markup_name if self._keep(markup_name, markup_attrs) else None
+
+    def search(self, markup):
+        if isinstance(markup, str):
+            return None
+        return markup if self._keep(markup.name, markup.attrs) else None
+
+def get_soup(html: bytes, backend: str='html.parser', element_id: str=None) -> BeautifulSoup:
+    """
+    backend:
+        'html.parser': Builds the whole page with Python's html.parser.
+        'lxml': Builds only <title> and the element with element_id, using lxml.
+    """
+    assert backend in html_parser_backends, f'Invalid backend: {backend}. Valid backends: {html_parser_backends}'
+    if backend == 'html.parser' or element_id is None:
+        return BeautifulSoup(html, backend)
+    return BeautifulSoup(html, 'lxml', parse_only=TitleAndIdStrainer(element_id))
@@ -0,0 +1,89 @@
+from __future__ import annotations
+from typing import List, Dict, Any, cast
+from logger import logger
+
+class IdIndexedHandlerMixin:
+    """
+    Id lookups for BasicHandler subclasses whose objects have an id attribute (or property).
+    An id -> positions index is built on the first lookup and dropped whenever the handler is changed
+    through append/extend, item assignment, deletion, sort or shuffle.
+
+    Changes made to obj_list directly and ids changed in place are not tracked. Call _invalidate_id_index
+    after making them. As a safeguard, a lookup checks that every indexed position still holds an object with
+    the id, and rebuilds the index once if one doesn't or if the id is missing. So a lookup never returns an
+    object that is no longer in the list, but an object whose id was changed to one that is already indexed
+    is only found after the index has been rebuilt.
+
+    The index is kept in a slot rather than in __dict__, so that it doesn't take part in the
+    handler's equality or serialization. List the mixin before the BasicHandler classes.
+    """
+    __slots__ = ('_id_index',)
+
+    def _invalidate_id_index(self):
+        self._id_index = None
+
+    def _build_id_index(self) -> Dict[Any, List[int]]:
+        id_index = cast(Dict[Any, List[int]], {})
+        for pos, obj in enumerate(self.obj_list):
+            id_index.setdefault(obj.id, []).append(pos)
+        self._id_index = id_index
+        return id_index
+
+    def _get_indexed_objs(self, id_index: Dict[Any, List[int]], id) -> list:
+        # None if id isn't indexed or if any of its positions is stale.
+        positions = id_index.get(id)
+        if positions is None:
+            return None
+        objs = []
+        for pos in positions:
+            if pos >= len(self.obj_list) or self.obj_list[pos].id != id:
+                return None
+            objs.append(self.obj_list[pos])
+        return objs
+
+    def _lookup_id(self, id) -> list:
+        id_index = getattr(self, '_id_index', None)
+        if id_index is None:
+            id_index = self._build_id_index()
+        objs = self._get_indexed_objs(id_index, id)
+        if objs is None:
+            objs = self._get_indexed_objs(self._build_id_index(), id)
+        return objs if objs is not None else []
+
+    def get_obj_from_id(self, id: int):
+        objs = self._lookup_id(id)
+        if len(objs) == 0:
+            logger.error(f"Couldn't find {self.obj_type.__name__} with id={id}")
+            logger.error(f'Possible ids: {sorted([obj.id for obj in self.obj_list if obj.id is not None])}')
+            raise Exception
+        return objs[0]
+
+    def get(self, **kwargs):
+        # get(id=...) is answered from the index. Any other condition falls back to a scan.
+        if list(kwargs.keys()) == ['id'] and kwargs['id'] is not None and not isinstance(kwargs['id'], (list, tuple)):
+            return type(self)(list(self._lookup_id(kwargs['id'])))
+        return super().get(**kwargs)
+
+    def append(self, item):
+        self._invalidate_id_index()
+        super().append(item)
+
+    def __setitem__(self, idx, value):
+        self._invalidate_id_index()
+        super().__setitem__(idx, value)
+
+    def __delitem__(self, idx):
+        self._invalidate_id_index()
+        super().__delitem__(idx)
+
+    def sort(self, attr_name: str, reverse: bool=False):
+        self._invalidate_id_index()
+        super().sort(attr_name=attr_name, reverse=reverse)
+
+    def shuffle(self):
+        self._invalidate_id_index()
+        super().shuffle()
+
+    @property
+    def ids(self) -> List[int]:
+        return [obj.id for obj in self.obj_list]
@@ -0,0 +1,23 @@
+import hashlib
+import json
+
+def get_file_hash(path: str, chunk_size: int=2**20) -> str:
+    """
+    sha1 of the file contents, read in chunks.
+    """
+    sha1 = hashlib.sha1()
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if len(chunk) == 0:
+                break
+            sha1.update(chunk)
+    return sha1.hexdigest()
+
+def get_json_hash(obj) -> str:
+    """
+    sha1 of the canonical json representation of obj.
+    Keys are sorted, so dicts with the same content always give the same hash.
+    """
+    text = json.dumps(obj, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
@@ -0,0 +1,287 @@
+from __future__ import annotations
+import os
+import gzip
+import json
+import time
+import hashlib
+import threading
+from typing import List, Iterator
+import urllib3
+from urllib3.util.retry import Retry
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from common_utils.base.basic import BasicLoadableObject
+from common_utils.file_utils import file_exists
+
+default_retry_statuses = [429, 500, 502, 503, 504]
+
+class HttpClientStats(BasicLoadableObject['HttpClientStats']):
+    def __init__(self, requests: int=0, connections_opened: int=0, connections_reused: int=0):
+        super().__init__()
+        self.requests = requests
+        self.connections_opened = connections_opened
+        self.connections_reused = connections_reused
+
+class HttpCacheEntry(BasicLoadableObject['HttpCacheEntry']):
+    def __init__(
+        self, url: str, status: int, content_hash: str, fetched_time: float,
+        etag: str=None, last_modified: str=None, content_type: str=None
+    ):
+        super().__init__()
+        self.url = url
+        self.status = status
+        self.content_hash = content_hash
+        self.fetched_time = fetched_time # When the body was last fetched or revalidated. (time.time())
+        self.etag = etag
+        self.last_modified = last_modified
+        self.content_type = content_type
+
+class HttpCacheStats(BasicLoadableObject['HttpCacheStats']):
+    def __init__(self, hits: int=0, misses: int=0, revalidated: int=0, updated: int=0):
+        """
+        hits: Served from the cache without a request.
+        misses: Not in the cache, so the page was fetched.
+        revalidated: Expired, but the server answered 304 Not Modified.
+        updated: Expired, and the server sent a new body.
+        """
+        super().__init__()
+        self.hits = hits
+        self.misses = misses
+        self.revalidated = revalidated
+        self.updated = updated
+
+class CachedResponse:
+    """
+    The parts of a urllib3 response that are kept in the cache.
+    """
+    def __init__(self, status: int, data: bytes, headers: dict=None, from_cache: bool=False):
+        self.status = status
+        self.data = data
+        self.headers = headers if headers is not None else {}
+        self.from_cache = from_cache
+
+class HttpResponseCache:
+    """
+    On-disk cache of raw (decoded) response bodies keyed by url.
+
+    Bodies are gzip compressed and stored by the sha1 of their content, so identical pages
+    (e.g. every "no results" page) are only stored once:
+        cache_dir/entries/<sha1 of url>.json
+        cache_dir/bodies/<sha1 of body>.gz
+    Entries older than ttl seconds are revalidated with a conditional GET using the stored
+    ETag/Last-Modified. ttl=None means entries never expire.
+    Only responses with a status in cacheable_statuses (200, 203, 404 and 410) are cached.
+    """
+    cacheable_statuses = [200, 203, 404, 410]
+
+    def __init__(self, cache_dir: str, ttl: float=30*24*3600):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.stats = HttpCacheStats()
+        self._stats_lock = threading.Lock()
+        os.makedirs(f'{cache_dir}/entries', exist_ok=True)
+        os.makedirs(f'{cache_dir}/bodies', exist_ok=True)
+
+    def _count(self, **kwargs):
+        with self._stats_lock:
+            for key, val in kwargs.items():
+                setattr(self.stats, key, getattr(self.stats, key) + val)
+
+    def _get_entry_path(self, url: str) -> str:
+        return f"{self.cache_dir}/entries/{hashlib.sha1(url.encode('utf-8')).hexdigest()}.json"
+
+    def _get_body_path(self, content_hash: str) -> str:
+        return f'{self.cache_dir}/bodies/{content_hash}.gz'
+
+    def get_body_path(self, entry: HttpCacheEntry) -> str:
+        return self._get_body_path(entry.content_hash)
+
+    def iter_entries(self) -> Iterator[HttpCacheEntry]:
+        for filename in sorted(os.listdir(f'{self.cache_dir}/entries')):
+            if filename.endswith('.json'):
+                entry = HttpCacheEntry.load_from_path(f'{self.cache_dir}/entries/{filename}')
+                if file_exists(self.get_body_path(entry)):
+                    yield entry
+
+    @staticmethod
+    def _write_atomic(path: str, data: bytes):
+        # Concurrent readers either see the old file or the complete new one.
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def load_entry(self, url: str) -> HttpCacheEntry:
+        entry_path = self._get_entry_path(url)
+        if not file_exists(entry_path):
+            return None
+        entry = HttpCacheEntry.load_from_path(entry_path)
+        return entry if file_exists(self._get_body_path(entry.content_hash)) else None
+
+    def load_body(self, entry: HttpCacheEntry) -> bytes:
+        with gzip.open(self._get_body_path(entry.content_hash), 'rb') as f:
+            return f.read()
+
+    def save_entry(self, entry: HttpCacheEntry):
+        self._write_atomic(self._get_entry_path(entry.url), json.dumps(entry.to_dict(), ensure_ascii=False).encode('utf-8'))
+
+    def store(self, url: str, status: int, data: bytes, headers: dict) -> HttpCacheEntry:
+        content_hash = hashlib.sha1(data).hexdigest()
+        body_path = self._get_body_path(content_hash)
+        if not file_exists(body_path):
+            self._write_atomic(body_path, gzip.compress(data))
+        entry = HttpCacheEntry(
+            url=url, status=status, content_hash=content_hash, fetched_time=time.time(),
+            etag=headers.get('ETag'), last_modified=headers.get('Last-Modified'),
+            content_type=headers.get('Content-Type')
+        )
+        self.save_entry(entry)
+        return entry
+
+    def is_fresh(self, entry: HttpCacheEntry) -> bool:
+        return self.ttl is None or time.time() - entry.fetched_time < self.ttl
+
+    def get(self, http: HttpClient, url: str, headers: dict=None, cache_key: str=None, **kwargs) -> CachedResponse:
+        """
+        cache_key: The url that the response is cached under, if it's fetched from somewhere else (e.g. a mirror).
+                   Defaults to url.
+        """
+        cache_key = cache_key if cache_key is not None else url
+        entry = self.load_entry(cache_key)
+        if entry is not None and self.is_fresh(entry):
+            self._count(hits=1)
+            return CachedResponse(status=entry.status, data=self.load_body(entry), headers={'Content-Type': entry.content_type}, from_cache=True)
+
+        request_headers = dict(http.headers)
+        if headers is not None:
+            request_headers.update(headers)
+        if entry is not None:
+            if entry.etag is not None:
+                request_headers['If-None-Match'] = entry.etag
+            if entry.last_modified is not None:
+                request_headers['If-Modified-Since'] = entry.last_modified
+        response = http.request(method='GET', url=url, headers=request_headers, **kwargs)
+        if entry is not None and response.status == 304:
+            entry.fetched_time = time.time()
+            self.save_entry(entry)
+            self._count(revalidated=1)
+            return CachedResponse(status=entry.status, data=self.load_body(entry), headers={'Content-Type': entry.content_type}, from_cache=True)
+
+        self._count(updated=1) if entry is not None else self._count(misses=1)
+        data = response.data
+        response_headers = dict(response.headers)
+        if response.status in self.cacheable_statuses:
+            self.store(url=cache_key, status=response.status, data=data, headers=response_headers)
+        return CachedResponse(status=response.status, data=data, headers=response_headers)
+
+class HttpClient:
+    """
+    A urllib3.PoolManager shared between requests, so that keep-alive connections and TLS sessions
+    are reused instead of being opened for every page.
+
+    Responses with a status in retry_statuses (429 and 5xx by default) and connection errors
+    are retried with exponential backoff, respecting Retry-After.
+    gzip/deflate are always accepted, and brotli is accepted when the brotli package is installed.
+    Responses are decoded by urllib3.
+
+    maxsize is the number of connections kept alive per host. It should be at least the number
+    of threads that fetch from the same host, or the extra connections are closed after each request.
+    If cache is given, get is answered from the cache when possible. See HttpResponseCache.
+    """
+    def __init__(
+        self, num_pools: int=10, maxsize: int=32,
+        retries: int=5, backoff_factor: float=0.5,
+        retry_statuses: List[int]=None,
+        timeout: float=30.0, headers: dict=None, cache: HttpResponseCache=None
+    ):
+        retry_statuses = retry_statuses if retry_statuses is not None else default_retry_statuses
+        self.stats = HttpClientStats()
+        self._stats_lock = threading.Lock()
+        self.cache = cache
+
+        default_headers = urllib3.util.make_headers(accept_encoding=True)
+        if headers is not None:
+            default_headers.update(headers)
+        self.headers = default_headers
+        self._pool_manager = urllib3.PoolManager(
+            num_pools=num_pools, maxsize=maxsize,
+            retries=Retry(
+                total=retries, backoff_factor=backoff_factor,
+                status_forcelist=retry_statuses, allowed_methods=['GET', 'HEAD'],
+                respect_retry_after_header=True, raise_on_status=False
+            ),
+            timeout=timeout, headers=default_headers
+        )
+
+        client = self
+        class CountingHTTPConnection(HTTPConnection):
+            def connect(self):
+                client._count(connections_opened=1)
+                super().connect()
+
+        class CountingHTTPSConnection(HTTPSConnection):
+            def connect(self):
+                client._count(connections_opened=1)
+                super().connect()
+
+        class CountingHTTPConnectionPool(HTTPConnectionPool):
+            ConnectionCls = CountingHTTPConnection
+            def _get_conn(self, timeout: float=None):
+                conn = super()._get_conn(timeout=timeout)
+                if getattr(conn, 'sock', None) is not None:
+                    client._count(connections_reused=1)
+                return conn
+
+        class CountingHTTPSConnectionPool(HTTPSConnectionPool):
+            ConnectionCls = CountingHTTPSConnection
+            def _get_conn(self, timeout: float=None):
+                conn = super()._get_conn(timeout=timeout)
+                if getattr(conn, 'sock', None) is not None:
+                    client._count(connections_reused=1)
+                return conn
+
+        self._pool_manager.pool_classes_by_scheme = {
+            'http': CountingHTTPConnectionPool,
+            'https': CountingHTTPSConnectionPool
+        }
+
+    def _count(self, requests: int=0, connections_opened: int=0, connections_reused: int=0):
+        with self._stats_lock:
+            self.stats.requests += requests
+            self.stats.connections_opened += connections_opened
+            self.stats.connections_reused += connections_reused
+
+    def request(self, method: str, url: str, **kwargs) -> urllib3.HTTPResponse:
+        self._count(requests=1)
+        return self._pool_manager.request(method=method, url=url, **kwargs)
+
+    def get(self, url: str, use_cache: bool=True, cache_key: str=None, **kwargs) -> urllib3.HTTPResponse:
+        """
+        Returns a CachedResponse instead when the client has a cache and use_cache is True.
+        Both have status, headers and data.
+        cache_key: Refer to HttpResponseCache.get
+        """
+        if self.cache is not None and use_cache:
+            return self.cache.get(self, url, cache_key=cache_key, **kwargs)
+        return self.request(method='GET', url=url, **kwargs)
+
+    def clear(self):
+        self._pool_manager.clear()
+
+_default_http_client = None
+_default_http_client_lock = threading.Lock()
+
+def get_default_http_client() -> HttpClient:
+    """
+    The HttpClient shared by the whole process. Created on first use.
+    """
+    global _default_http_client
+    with _default_http_client_lock:
+        if _default_http_client is None:
+            _default_http_client = HttpClient()
+        return _default_http_client
+
+def set_default_http_client(http_client: HttpClient):
+    global _default_http_client
+    with _default_http_client_lock:
+        _default_http_client = http_client
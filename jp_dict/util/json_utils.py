@@ -0,0 +1,168 @@
+from __future__ import annotations
+import os
+import re
+import json
+from typing import Iterable, Iterator, List
+
+def iter_json_array_items(path: str, key: str, chunk_size: int=2**20) -> Iterator[dict]:
+    """
+    Yields the elements of the array stored under key in the top level object of a json file,
+    one at a time, without loading the whole file into memory.
+    Example: iter_json_array_items('BrowserHistory.json', key='Browser History')
+    """
+    decoder = json.JSONDecoder()
+    key_pattern = re.compile(r'"' + re.escape(key) + r'"\s*:\s*\[')
+    with open(path, 'r', encoding='utf-8') as f:
+        buffer = ''
+        eof = False
+        while True:
+            match = key_pattern.search(buffer)
+            if match is not None:
+                idx = match.end()
+                break
+            if eof:
+                raise KeyError(f"Couldn't find array '{key}' in {path}")
+            # Keep the tail in case the key is split across chunks.
+            buffer = buffer[-(len(key) + 64):]
+            chunk = f.read(chunk_size)
+            eof = len(chunk) == 0
+            buffer += chunk
+
+        while True:
+            while idx < len(buffer) and buffer[idx] in ' \t\r\n,':
+                idx += 1
+            if idx < len(buffer) and buffer[idx] == ']':
+                return
+            try:
+                if idx >= len(buffer):
+                    raise json.JSONDecodeError('Need more data', buffer, idx)
+                item, end_idx = decoder.raw_decode(buffer, idx)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                buffer = buffer[idx:]
+                idx = 0
+                chunk = f.read(chunk_size)
+                eof = len(chunk) == 0
+                buffer += chunk
+                continue
+            yield item
+            idx = end_idx
+
+def _dump_array_item(item_dict: dict) -> str:
+    # An element of the array under a top level key, indented like json.dump(indent=2) does it.
+    item_str = json.dumps(item_dict, indent=2, ensure_ascii=False)
+    return '\n'.join([f'    {line}' for line in item_str.split('\n')])
+
+def write_json_array_items(path: str, key: str, item_dicts: Iterable[dict]):
+    """
+    Writes item_dicts as the array stored under key in the top level object of a json file,
+    one item at a time, so that item_dicts can be a generator that never holds all of them.
+    The file is the same as the one written by json.dump({key: list(item_dicts)}, f, indent=2, ensure_ascii=False).
+    Example: write_json_array_items('BrowserHistory.json', key='Browser History', item_dicts=iter_item_dicts())
+    """
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('{\n  ' + json.dumps(key, ensure_ascii=False) + ': [')
+        is_empty = True
+        for item_dict in item_dicts:
+            f.write(('\n' if is_empty else ',\n') + _dump_array_item(item_dict))
+            is_empty = False
+        f.write(']\n}' if is_empty else '\n  ]\n}')
+
+def append_json_array_items(path: str, item_dicts: List[dict]):
+    """
+    Appends item_dicts to the end of the array that closes a json file, without rewriting the file.
+    The file must end with the array followed by the closing brace of the top level object,
+    like the files written by BrowserHistory.save_to_path.
+    """
+    if len(item_dicts) == 0:
+        return
+    with open(path, 'rb+') as f:
+        f.seek(0, os.SEEK_END)
+        file_size = f.tell()
+        tail_size = min(file_size, 4096)
+        f.seek(file_size - tail_size)
+        tail = f.read(tail_size)
+        stripped_tail = tail.rstrip()
+        if not stripped_tail.endswith(b'}'):
+            raise ValueError(f"{path} doesn't end with a json object.")
+        stripped_tail = stripped_tail[:-1].rstrip()
+        if not stripped_tail.endswith(b']'):
+            raise ValueError(f"{path} doesn't end with a json array.")
+        array_content = stripped_tail[:-1].rstrip()
+        array_content_end_idx = file_size - tail_size + len(array_content)
+        is_empty = array_content.endswith(b'[')
+
+        item_strs = [_dump_array_item(item_dict) for item_dict in item_dicts]
+        text = ('\n' if is_empty else ',\n') + ',\n'.join(item_strs) + '\n  ]\n}'
+        f.seek(array_content_end_idx)
+        f.truncate()
+        f.write(text.encode('utf-8'))
+
+class JsonlJournal:
+    """
+    Append-only journal with one json object per line.
+    Every append is flushed to the OS right away, so nothing is lost if the process dies,
+    and os.fsync is called once every fsync_interval appends (and on close), which bounds
+    what can be lost on a power failure without paying for an fsync per line.
+    A line that was only partially written when the process died is dropped by read.
+    """
+    def __init__(self, path: str, fsync_interval: int=64):
+        self.path = path
+        self.fsync_interval = fsync_interval
+        self._file = None
+        self._unsynced_count = 0
+
+    def __enter__(self) -> JsonlJournal:
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def read(self) -> List[dict]:
+        """
+        Every complete line in the journal. A partial last line is truncated away
+        so that the next append starts on a new line.
+        """
+        if not os.path.isfile(self.path):
+            return []
+        item_dicts = []
+        valid_size = 0
+        with open(self.path, 'rb') as f:
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break
+                try:
+                    item_dicts.append(json.loads(line))
+                except json.JSONDecodeError:
+                    break
+                valid_size += len(line)
+        if valid_size < os.path.getsize(self.path):
+            with open(self.path, 'rb+') as f:
+                f.truncate(valid_size)
+        return item_dicts
+
+    def append(self, item_dict: dict):
+        if self._file is None:
+            self._file = open(self.path, 'ab')
+        self._file.write((json.dumps(item_dict, ensure_ascii=False) + '\n').encode('utf-8'))
+        self._file.flush()
+        self._unsynced_count += 1
+        if self._unsynced_count >= self.fsync_interval:
+            self.sync()
+
+    def sync(self):
+        if self._file is not None and self._unsynced_count > 0:
+            os.fsync(self._file.fileno())
+            self._unsynced_count = 0
+
+    def close(self):
+        if self._file is not None:
+            self.sync()
+            self._file.close()
+            self._file = None
+
+    def delete(self):
+        self.close()
+        if os.path.isfile(self.path):
+            os.remove(self.path)
@@ -0,0 +1,48 @@
+import time
+import threading
+from urllib.parse import urlparse
+
+class TokenBucket:
+    """
+    Allows rate requests per second on average, with bursts of up to capacity requests.
+    acquire blocks until a token is available, and is safe to call from multiple threads.
+    """
+    def __init__(self, rate: float, capacity: float=1):
+        assert rate > 0
+        assert capacity >= 1
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._last_time = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: float=1):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last_time) * self.rate)
+                self._last_time = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait_time = (tokens - self._tokens) / self.rate
+            time.sleep(wait_time)
+
+class HostRateLimiter:
+    """
+    One TokenBucket per host, so that requests to one site don't use up the budget of another.
+    """
+    def __init__(self, rate: float, capacity: float=1):
+        self.rate = rate
+        self.capacity = capacity
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def get_bucket(self, host: str) -> TokenBucket:
+        with self._lock:
+            if host not in self._buckets:
+                self._buckets[host] = TokenBucket(rate=self.rate, capacity=self.capacity)
+            return self._buckets[host]
+
+    def acquire(self, url: str, tokens: float=1):
+        self.get_bucket(urlparse(url).netloc).acquire(tokens=tokens)
@@ -1,10 +1,21 @@
-from datetime import datetime, timedelta
+import time
+from functools import lru_cache
+from typing import List
+from datetime import datetime, timedelta, tzinfo
+import numpy as np
 from pytz import timezone, utc
 from tzlocal import get_localzone
 
 def get_utc_time_from_time_usec(time_usec: int) -> datetime:
     return datetime.utcfromtimestamp(time_usec/(10**6))
 
+def get_time_usec_from_utc_time(utc_datetime: datetime) -> int:
+    utc_datetime = utc_datetime.replace(tzinfo=utc) if utc_datetime.tzinfo is None else utc_datetime
+    return int(round(utc_datetime.timestamp() * 10**6))
+
+def get_current_time_usec() -> int:
+    return int(time.time() * 10**6)
+
 def get_utc_time_elapsed_from_time_usec(time_usec: int) -> timedelta:
     return datetime.now() - get_utc_time_from_time_usec(time_usec)
 
@@ -21,9 +32,59 @@ def utc2tz(utc_datetime: datetime, tz_str: str) -> datetime:
     """
     return utc_datetime.replace(tzinfo=utc).astimezone(timezone(tz_str))
 
+@lru_cache(maxsize=None)
+def get_cached_localzone() -> tzinfo:
+    """
+    The local timezone, looked up once per process.
+    """
+    return get_localzone()
+
 def utc2localzone(utc_datetime: datetime) -> datetime:
-    localtz = get_localzone()
+    localtz = get_cached_localzone()
     return utc_datetime.replace(tzinfo=utc).astimezone(localtz)
 
 def get_localtime_from_time_usec(time_usec: int) -> datetime:
-    return utc2localzone(get_utc_time_from_time_usec(time_usec))
\ No newline at end of file
+    return utc2localzone(get_utc_time_from_time_usec(time_usec))
+
+# Below this many timestamps, converting one by one is faster than going through pandas.
+bulk_conversion_min_size = 64
+
+def get_local_datetime64_from_time_usec(time_usec_list: List[int]) -> np.ndarray:
+    """
+    The local wall-clock time of every time_usec as naive datetime64[us], converted in bulk.
+    """
+    import pandas as pd
+    utc_times = pd.DatetimeIndex(np.asarray(time_usec_list, dtype=np.int64).astype('datetime64[us]'))
+    return utc_times.tz_localize(utc).tz_convert(get_cached_localzone()).tz_localize(None).values.astype('datetime64[us]')
+
+def get_localtimes_from_time_usec(time_usec_list: List[int]) -> List[datetime]:
+    """
+    Same as get_localtime_from_time_usec for every element, but converted in bulk.
+    """
+    if len(time_usec_list) < bulk_conversion_min_size:
+        return [get_localtime_from_time_usec(time_usec) for time_usec in time_usec_list]
+    import pandas as pd
+    utc_times = pd.DatetimeIndex(np.asarray(time_usec_list, dtype=np.int64).astype('datetime64[us]'))
+    return list(utc_times.tz_localize(utc).tz_convert(get_cached_localzone()).to_pydatetime())
+
+# strftime directives that can be cut out of an ISO 8601 string ('YYYY-MM-DDTHH:MM:SS'), as slices.
+_iso_directive_slices = {'%Y': (0, 4), '%m': (5, 7), '%d': (8, 10), '%H': (11, 13), '%M': (14, 16), '%S': (17, 19)}
+
+def format_localtimes_from_time_usec(time_usec_list: List[int], fmt: str='%Y/%m/%d %H:%M:%S') -> List[str]:
+    """
+    get_localtime_from_time_usec(time_usec).strftime(fmt) for every element, formatted in bulk.
+    Formats made of %Y, %m, %d, %H, %M and %S are cut out of numpy's ISO strings.
+    Any other directive falls back to strftime.
+    """
+    if len(time_usec_list) < bulk_conversion_min_size:
+        return [get_localtime_from_time_usec(time_usec).strftime(fmt) for time_usec in time_usec_list]
+    template = fmt.replace('{', '{{').replace('}', '}}')
+    slices = []
+    for directive, directive_slice in _iso_directive_slices.items():
+        if directive in template:
+            template = template.replace(directive, f'{{{len(slices)}}}')
+            slices.append(directive_slice)
+    if '%' in template:
+        return [localtime.strftime(fmt) for localtime in get_localtimes_from_time_usec(time_usec_list)]
+    iso_strs = np.datetime_as_string(get_local_datetime64_from_time_usec(time_usec_list), unit='s').tolist()
+    return [template.format(*[iso_str[start:end] for start, end in slices]) for iso_str in iso_strs]
@@ -0,0 +1,49 @@
+import os
+import copy
+import time
+import shutil
+from logger import logger
+from jp_dict.parsing.anki.export_txt_parser import AnkiExportTextData
+from jp_dict.parsing.jisho.jisho_structs import JishoSearchHtmlParser
+from jp_dict.parsing.jisho.jisho_matches import DictionaryEntryMatch
+from jp_dict.parsing.combined.combined_structs import CombinedResult, CombinedResultList
+
+# Filters combined results against two Anki exports with the old per-file linear scan and with
+# filter_out_anki_exports, which indexes every export once.
+fixture_path = f'{os.path.dirname(os.path.abspath(__file__))}/../jisho/fixtures/multiple_results.html'
+entry = JishoSearchHtmlParser.from_html(open(fixture_path, 'rb').read(), url='https://jisho.org/search/fixture').parse(history_group_id=0).exact_matches[0]
+num_results = 5000
+num_notes = 5000
+work_dir = 'export_filter_benchmark'
+os.makedirs(work_dir, exist_ok=True)
+
+export_paths = []
+for k in range(2):
+    export_path = f'{work_dir}/export{k}.txt'
+    with open(export_path, 'w') as f:
+        for i in range(k, num_notes * 4, 4):
+            f.write(f'単語{i}\tたんご{i}\tdefinition {i}\n')
+    export_paths.append(export_path)
+
+results = CombinedResultList()
+for i in range(num_results):
+    entry_match = DictionaryEntryMatch(id=i, entry=copy.deepcopy(entry), search_words=[f'単語{i}'], history_group_id_list=[i])
+    entry_match.entry.word_representation.writing = f'単語{i}'
+    results.append(CombinedResult(jisho_result=entry_match))
+
+t0 = time.time()
+linear_results = results
+for export_path in export_paths:
+    export_data = AnkiExportTextData.parse_from_txt(export_path)
+    linear_results = CombinedResultList([
+        result for result in linear_results
+        if not export_data.contains(writing=result.jisho_result.entry.word_representation.writing)
+    ])
+logger.cyan(f'linear scan: {len(linear_results)} results left in {round(time.time() - t0, 3)}s')
+
+t0 = time.time()
+indexed_results = results.filter_out_anki_exports(export_paths, show_pbar=False)
+logger.cyan(f'indexed: {len(indexed_results)} results left in {round(time.time() - t0, 3)}s')
+assert indexed_results.to_dict_list() == linear_results.to_dict_list()
+assert len(indexed_results) == num_results // 2
+shutil.rmtree(work_dir)
@@ -0,0 +1,62 @@
+import os
+import copy
+import time
+import random
+from logger import logger
+from jp_dict.util.time_utils import get_localtime_from_time_usec, get_localtimes_from_time_usec, format_localtimes_from_time_usec
+from jp_dict.parsing.jisho.jisho_structs import JishoSearchHtmlParser
+from jp_dict.parsing.jisho.jisho_matches import DictionaryEntryMatch
+from jp_dict.parsing.combined.combined_structs import CombinedResult, CombinedResultList
+
+# Checks the bulk time conversions against get_localtime_from_time_usec, and times
+# to_vocabulary_fields_list, which formats every search time of every result.
+# Run with e.g. TZ=America/New_York to cover a zone with DST.
+fixture_path = f'{os.path.dirname(os.path.abspath(__file__))}/../jisho/fixtures/multiple_results.html'
+entry = JishoSearchHtmlParser.from_html(open(fixture_path, 'rb').read(), url='https://jisho.org/search/fixture').parse(history_group_id=0).exact_matches[0]
+num_results = 2000
+rng = random.Random(0)
+
+time_usec_list = [1600000000000000 + rng.randrange(10**14) for _ in range(10000)]
+t0 = time.time()
+localtimes = [get_localtime_from_time_usec(time_usec) for time_usec in time_usec_list]
+formatted = [localtime.strftime('%Y/%m/%d %H:%M:%S') for localtime in localtimes]
+logger.cyan(f'{len(time_usec_list)} timestamps one by one in {round(time.time() - t0, 3)}s')
+t0 = time.time()
+bulk_localtimes = get_localtimes_from_time_usec(time_usec_list)
+bulk_formatted = format_localtimes_from_time_usec(time_usec_list)
+logger.cyan(f'{len(time_usec_list)} timestamps in bulk in {round(time.time() - t0, 3)}s')
+assert bulk_localtimes == localtimes
+assert [localtime.utcoffset() for localtime in bulk_localtimes] == [localtime.utcoffset() for localtime in localtimes]
+assert bulk_formatted == formatted
+
+results = CombinedResultList()
+for i in range(num_results):
+    entry_match = DictionaryEntryMatch(id=i, entry=copy.deepcopy(entry), search_words=[f'単語{i}', f'たんご{i}'], history_group_id_list=[i, i])
+    entry_match.search_words_time_usec = {
+        search_word: [1600000000000000 + rng.randrange(10**14) for _ in range(rng.randint(1, 20))]
+        for search_word in entry_match.search_words
+    }
+    results.append(CombinedResult(jisho_result=entry_match))
+
+t0 = time.time()
+fields_list = results.to_vocabulary_fields_list()
+logger.cyan(f'{num_results} results: to_vocabulary_fields_list in {round(time.time() - t0, 3)}s')
+t0 = time.time()
+for result in results:
+    result.first_and_last_localtime, result.localtime_info
+logger.cyan(f'{num_results} results: memoized localtimes in {round(time.time() - t0, 3)}s')
+for result, fields in zip(results, fields_list):
+    expected = [
+        get_localtime_from_time_usec(time_usec).strftime('%Y/%m/%d %H:%M:%S')
+        for time_usec_list in result.time_usec_info.values() for time_usec in time_usec_list
+    ]
+    assert fields.cumulative_search_localtimes == ', '.join(expected)
+
+# Changes to time_usec_info, including appends and replaced lists, are picked up.
+result = results[0]
+result.time_usec_info[result.jisho_result.search_words[0]].append(1500000000000000)
+assert result.first_search_localtime == get_localtime_from_time_usec(1500000000000000)
+result.time_usec_info = {'新しい単語': [1400000000000000]}
+assert result.cumulative_search_localtimes == [get_localtime_from_time_usec(1400000000000000)]
+result.time_usec_info['新しい単語'] = [1300000000000000]
+assert result.cumulative_search_localtimes == [get_localtime_from_time_usec(1300000000000000)]
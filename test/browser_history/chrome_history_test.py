@@ -0,0 +1,106 @@
+import os
+import json
+import shutil
+import sqlite3
+from datetime import datetime, timedelta, timezone
+from logger import logger
+from jp_dict.util.time_utils import get_utc_time_from_time_usec, get_time_usec_from_utc_time
+from jp_dict.parsing.chrome_history import ChromeHistoryDatabase, chrome_time_to_time_usec, time_usec_to_chrome_time
+from jp_dict.parsing.parse_manager import ParserManager
+
+# Builds a small Chrome History database and checks the epoch conversion, the url and watermark filters,
+# and that combine_chrome_history only adds visits that aren't in the combined history yet.
+work_dir = 'chrome_history_test'
+db_path = f'{work_dir}/History'
+
+def get_chrome_time(*args) -> int:
+    # Microseconds since 1601-01-01 UTC, computed independently of the module's offset.
+    return (datetime(*args, tzinfo=timezone.utc) - datetime(1601, 1, 1, tzinfo=timezone.utc)) // timedelta(microseconds=1)
+
+def add_visits(visits: list):
+    connection = sqlite3.connect(db_path)
+    connection.execute('CREATE TABLE IF NOT EXISTS urls (id INTEGER PRIMARY KEY, url LONGVARCHAR, title LONGVARCHAR)')
+    connection.execute('CREATE INDEX IF NOT EXISTS urls_url_index ON urls (url)')
+    connection.execute('CREATE TABLE IF NOT EXISTS visits (id INTEGER PRIMARY KEY, url INTEGER NOT NULL, visit_time INTEGER NOT NULL, transition INTEGER)')
+    for url, title, visit_time, transition in visits:
+        row = connection.execute('SELECT id FROM urls WHERE url = ?', (url,)).fetchone()
+        url_id = row[0] if row is not None else connection.execute('INSERT INTO urls (url, title) VALUES (?, ?)', (url, title)).lastrowid
+        connection.execute('INSERT INTO visits (url, visit_time, transition) VALUES (?, ?, ?)', (url_id, visit_time, transition))
+    connection.commit()
+    connection.close()
+
+shutil.rmtree(work_dir, ignore_errors=True)
+os.makedirs(f'{work_dir}/browser_history/takeout', exist_ok=True)
+
+# Epoch conversion
+new_year_time_usec = get_time_usec_from_utc_time(datetime(2020, 1, 1, tzinfo=timezone.utc))
+assert new_year_time_usec == 1577836800 * 10**6
+assert chrome_time_to_time_usec(get_chrome_time(2020, 1, 1)) == new_year_time_usec
+assert time_usec_to_chrome_time(new_year_time_usec) == get_chrome_time(2020, 1, 1)
+assert chrome_time_to_time_usec(get_chrome_time(1970, 1, 1)) == 0
+
+add_visits([
+    ('https://jisho.org/search/%E7%8C%AB', '猫 - Jisho.org', get_chrome_time(2020, 1, 1, 12, 0, 0), 0x30000001),
+    ('https://jisho.org/search/%E7%8A%AC', '犬 - Jisho.org', get_chrome_time(2020, 1, 2, 12, 0, 0), 0),
+    ('https://jisho.org/search/%E7%8C%AB', '猫 - Jisho.org', get_chrome_time(2020, 1, 3, 12, 0, 0), 8),
+    ('https://jisho.org/search0', 'not a search', get_chrome_time(2020, 1, 3, 13, 0, 0), 0),
+    ('https://jisho.org/', 'Jisho.org', get_chrome_time(2020, 1, 4, 12, 0, 0), 1),
+    ('https://example.com/', None, get_chrome_time(2020, 1, 5, 12, 0, 0), None)
+])
+database = ChromeHistoryDatabase(db_path)
+items = list(database.iter_items())
+assert [get_utc_time_from_time_usec(item.time_usec) for item in items] == [
+    datetime(2020, 1, 1, 12), datetime(2020, 1, 2, 12), datetime(2020, 1, 3, 12),
+    datetime(2020, 1, 3, 13), datetime(2020, 1, 4, 12), datetime(2020, 1, 5, 12)
+]
+assert [item.page_transition for item in items] == ['TYPED', 'LINK', 'RELOAD', 'LINK', 'TYPED', None]
+assert items[-1].title == ''
+searches = list(database.iter_items(url_base='https://jisho.org/search/'))
+assert [item.url for item in searches] == [item.url for item in items[:3]]
+# The watermark is exclusive.
+assert [item.time_usec for item in database.iter_items(url_base='https://jisho.org/search/', min_time_usec=items[0].time_usec)] \
+    == [item.time_usec for item in items[1:3]]
+
+# The Takeout export already contains the first search.
+takeout_dict = items[0].to_dict()
+takeout_dict['client_id'] = 'takeout'
+json.dump({'Browser History': [takeout_dict]}, open(f'{work_dir}/browser_history/takeout/BrowserHistory.json', 'w'))
+manager = ParserManager(
+    browser_history_dir=f'{work_dir}/browser_history',
+    combined_history_path=f'{work_dir}/combined_history.json',
+    jisho_grouped_history_path=f'{work_dir}/jisho_grouped_history.json',
+    jisho_parse_dump_dir=f'{work_dir}/jisho_parse_dump',
+    jisho_matches_path=f'{work_dir}/jisho_matches.json',
+    jisho_pruned_entries_path=f'{work_dir}/jisho_pruned_entries.json',
+    kotobank_parse_dump_dir=f'{work_dir}/kotobank_parse_dump',
+    kotobank_temp_map_dir=f'{work_dir}/kotobank_temp_map',
+    combined_kotobank_dump_path=f'{work_dir}/combined_kotobank.json',
+    jisho_kotobank_combined_dump_path=f'{work_dir}/jisho_kotobank_combined.json',
+    anki_export_dir_for_filter=f'{work_dir}/anki_export',
+    filter_sorted_results_dump_path=f'{work_dir}/filter_sorted_results.json',
+    koohii_parse_dump_dir=f'{work_dir}/koohii_parse_dump',
+    koohii_combined_dump_path=f'{work_dir}/koohii_combined.json',
+    filtered_koohii_dump_path=f'{work_dir}/filtered_koohii.json',
+    manager_save_path=f'{work_dir}/manager.json',
+    chrome_history_db_path=db_path
+)
+manager.combine_history(show_pbar=False)
+manager.combine_chrome_history()
+rows = json.load(open(manager.combined_history_path, 'r'))['Browser History']
+assert [(row['client_id'], row['time_usec']) for row in rows] == \
+    [('takeout', items[0].time_usec)] + [('chrome_history_db', item.time_usec) for item in items[1:3]]
+assert manager._metadata.chrome_history_watermark == items[2].time_usec
+
+# Nothing new
+manager.combine_chrome_history()
+assert json.load(open(manager.combined_history_path, 'r'))['Browser History'] == rows
+
+# Only visits after the watermark are read.
+add_visits([('https://jisho.org/search/%E9%B3%A5', '鳥 - Jisho.org', get_chrome_time(2020, 1, 6, 12, 0, 0), 1)])
+manager = ParserManager.load_from_path(manager.manager_save_path)
+manager.combine_chrome_history()
+rows = json.load(open(manager.combined_history_path, 'r'))['Browser History']
+assert len(rows) == 4 and get_utc_time_from_time_usec(rows[-1]['time_usec']) == datetime(2020, 1, 6, 12)
+assert manager._metadata.chrome_history_watermark == rows[-1]['time_usec']
+shutil.rmtree(work_dir)
+logger.green('chrome history: ok')
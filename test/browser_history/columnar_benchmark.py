@@ -0,0 +1,110 @@
+import os
+import gc
+import time
+import random
+import tracemalloc
+from logger import logger
+from jp_dict.parsing.browser_history import BrowserHistoryItem, BrowserHistoryItemList, BrowserHistory, \
+    ColumnarBrowserHistoryItemList, CommonBrowserHistoryItemGroupBuilder
+
+# Compares ColumnarBrowserHistoryItemList with BrowserHistoryItemList: memory held by the loaded list,
+# the results of the search/group queries, and how long they take.
+url_base = 'https://jisho.org/search/'
+save_path = 'columnar_benchmark_history.json'
+
+def make_history(num_items: int, num_words: int=20000) -> BrowserHistory:
+    items = []
+    for t in range(num_items):
+        if random.random() < 0.3:
+            url = f'{url_base}{int(random.paretovariate(1.2)) % num_words}'
+        else:
+            url = f'https://example.com/{t % 1000}'
+        items.append(
+            BrowserHistoryItem(
+                title=random.choice(['title', 'title - Jisho.org']), url=url,
+                client_id=random.choice(['client0', 'client1']), time_usec=1600000000000000 + t * 1000,
+                page_transition=random.choice(['LINK', 'LINK', 'TYPED', None])
+            )
+        )
+    random.shuffle(items)
+    return BrowserHistory(BrowserHistoryItemList(items))
+
+def measure(load) -> tuple:
+    # Bytes still allocated once the list is loaded, not counting what was freed while loading.
+    gc.collect()
+    tracemalloc.start()
+    t0 = time.time()
+    result = load()
+    elapsed = time.time() - t0
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, size, elapsed
+
+random.seed(0)
+
+# The list API gives the same results as BrowserHistoryItemList.
+history = make_history(20000)
+item_list = history.browser_history_item_list
+columnar_list = ColumnarBrowserHistoryItemList.from_item_list(item_list)
+assert columnar_list == item_list and len(columnar_list) == len(item_list)
+assert columnar_list[5].to_dict() == item_list[5].to_dict() and columnar_list[-1].to_dict() == item_list[-1].to_dict()
+assert columnar_list[10:20] == BrowserHistoryItemList(item_list.history_items[10:20])
+assert columnar_list.search('Jisho') == item_list.search('Jisho')
+assert columnar_list.search('example', target='url') == item_list.search('example', target='url')
+assert columnar_list.search_by_url_base(url_base) == item_list.search_by_url_base(url_base)
+assert columnar_list.search_by_url_base_and_group_by_url(url_base).to_dict_list() \
+    == item_list.search_by_url_base_and_group_by_url(url_base).to_dict_list()
+start_time_usec, end_time_usec = 1600000000000000 + 5000 * 1000, 1600000000000000 + 6000 * 1000
+assert columnar_list.search_by_time_range(start_time_usec, end_time_usec).to_dict_list() \
+    == [item.to_dict() for item in item_list if start_time_usec <= item.time_usec < end_time_usec]
+for attr_name, reverse in [('time_usec', False), ('time_usec', True), ('title', True), ('page_transition', False)]:
+    sorted_columnar_list = columnar_list.copy()
+    sorted_columnar_list.sort(attr_name=attr_name, reverse=reverse)
+    expected = BrowserHistoryItemList(list(item_list))
+    if attr_name == 'page_transition':
+        # None can't be compared with str in Python, so only the rows with a value are checked.
+        sorted_columnar_list = sorted_columnar_list.take(sorted_columnar_list.page_transition.codes >= 0)
+        expected = BrowserHistoryItemList([item for item in expected if item.page_transition is not None])
+    expected.sort(attr_name=attr_name, reverse=reverse)
+    assert sorted_columnar_list == expected, (attr_name, reverse)
+appended_list = columnar_list.copy()
+appended_list.extend(item_list.history_items[:10])
+appended_list.append(item_list[10])
+assert appended_list == BrowserHistoryItemList(item_list.history_items + item_list.history_items[:11])
+assert columnar_list == item_list
+logger.green('columnar list API matches BrowserHistoryItemList')
+
+for num_items in [100000, 500000]:
+    make_history(num_items).save_to_path(save_path, overwrite=True)
+    item_list, object_size, object_load_elapsed = measure(lambda: BrowserHistory.load_from_path_streaming(save_path).browser_history_item_list)
+    columnar_list, columnar_size, columnar_load_elapsed = measure(lambda: ColumnarBrowserHistoryItemList.from_history_path(save_path))
+
+    t0 = time.time()
+    expected = item_list.search_by_url_base_and_group_by_url(url_base)
+    expected.sort(attr_name='item_count', reverse=True)
+    object_group_elapsed = time.time() - t0
+    t0 = time.time()
+    result = columnar_list.search_by_url_base(url_base).group_by_url(sort_by_item_count=True)
+    columnar_group_elapsed = time.time() - t0
+    assert result.to_dict_list() == expected.to_dict_list()
+
+    # What group_jisho_history does now, against the single pass builder it used before.
+    t0 = time.time()
+    result = ColumnarBrowserHistoryItemList.from_history_path(save_path, url_base=url_base).group_by_url(sort_by_item_count=True)
+    stage_elapsed = time.time() - t0
+    t0 = time.time()
+    builder_result = CommonBrowserHistoryItemGroupBuilder.from_history_path(save_path, url_base=url_base).build(sort_by_item_count=True)
+    builder_elapsed = time.time() - t0
+    assert result.to_dict_list() == builder_result.to_dict_list() == expected.to_dict_list()
+    del item_list, columnar_list
+
+    logger.cyan(
+        f'items: {num_items}, '
+        f'memory: {round(object_size / 2**20, 1)}MB objects vs {round(columnar_size / 2**20, 1)}MB columnar '
+        f'({round(object_size / columnar_size, 1)}x), '
+        f'load: {round(object_load_elapsed, 3)}s vs {round(columnar_load_elapsed, 3)}s, '
+        f'filter+group+sort: {round(object_group_elapsed, 3)}s vs {round(columnar_group_elapsed, 3)}s, '
+        f'group_jisho_history: {round(stage_elapsed, 3)}s (builder: {round(builder_elapsed, 3)}s)'
+    )
+os.remove(save_path)
@@ -0,0 +1,67 @@
+import time
+import random
+from logger import logger
+from jp_dict.parsing.browser_history import BrowserHistoryItem, BrowserHistoryItemList, BrowserHistory
+
+def make_histories(total_items: int, num_exports: int=12, overlap: float=0.5) -> list:
+    # Each export covers a window of the timeline that overlaps with the previous export,
+    # and is ordered newest first like a Google Takeout export.
+    window = int(total_items / (num_exports * (1 - overlap) + overlap))
+    step = int(window * (1 - overlap))
+    histories = []
+    for i in range(num_exports):
+        start = i * step
+        items = [
+            BrowserHistoryItem(
+                title=f'title{t}', url=f'https://jisho.org/search/{t % 5000}',
+                client_id='client', time_usec=1600000000000000 + t * 1000
+            )
+            for t in range(start + window - 1, start - 1, -1)
+        ]
+        histories.append(BrowserHistory(BrowserHistoryItemList(items)))
+    return histories
+
+random.seed(0)
+
+# Check that merge gives the same output as combine followed by a sort.
+for _ in range(5):
+    histories = make_histories(total_items=random.randint(1000, 5000), num_exports=random.randint(1, 6))
+    expected = BrowserHistory.combine(histories, show_pbar=False)
+    expected.browser_history_item_list.sort(attr_name='time_usec', reverse=False)
+    result = BrowserHistory.merge(histories, show_pbar=False)
+    assert result.to_dict() == expected.to_dict()
+
+# When exports share a time_usec with a different url/title, merge keeps the same item as combine:
+# the one from the earliest history, and within it the earliest one.
+def make_tied_history(name: str, t_list: list) -> BrowserHistory:
+    return BrowserHistory(BrowserHistoryItemList([
+        BrowserHistoryItem(
+            title=f'{name} {t} {i}', url=f'https://jisho.org/search/{name}{t}',
+            client_id=name, time_usec=1600000000000000 + t * 1000
+        )
+        for i, t in enumerate(t_list)
+    ]))
+histories = [
+    make_tied_history('a', [5, 3, 3, 1]),
+    make_tied_history('b', [6, 5, 3, 2, 1, 0]),
+    make_tied_history('c', [3, 2, 2])
+]
+expected = BrowserHistory.combine(histories, show_pbar=False)
+expected.browser_history_item_list.sort(attr_name='time_usec', reverse=False)
+result = BrowserHistory.merge(histories, show_pbar=False)
+assert result.to_dict() == expected.to_dict()
+assert [item.title for item in result.browser_history_item_list] == ['b 0 5', 'a 1 3', 'b 2 3', 'a 3 1', 'a 5 0', 'b 6 0']
+sorted_item_lists = [sorted(history.browser_history_item_list, key=lambda item: item.time_usec) for history in histories]
+assert [item.to_dict() for item in BrowserHistory.iter_merged_items(sorted_item_lists)] == expected.to_dict()['Browser History']
+logger.green('merge output matches combine + sort')
+
+for total_items in [50000, 500000, 1000000, 2500000, 5000000]:
+    histories = make_histories(total_items=total_items)
+    num_items = sum([len(history.browser_history_item_list) for history in histories])
+    t0 = time.time()
+    result = BrowserHistory.merge(histories, show_pbar=False)
+    elapsed = time.time() - t0
+    logger.cyan(
+        f'items: {num_items}, unique: {len(result.browser_history_item_list)}, '
+        f'merge: {round(elapsed, 3)}s, per item: {round(elapsed / num_items * 1e6, 3)}us'
+    )
@@ -0,0 +1,49 @@
+import os
+import time
+import random
+from logger import logger
+from jp_dict.parsing.browser_history import BrowserHistoryItem, BrowserHistoryItemList, BrowserHistory, \
+    CommonBrowserHistoryItemGroupBuilder
+
+url_base = 'https://jisho.org/search/'
+save_path = 'group_benchmark_history.json'
+
+def make_history(num_items: int, num_words: int=20000) -> BrowserHistory:
+    # Frequently searched words appear far more often than the rest, like a real search history.
+    items = []
+    for t in range(num_items):
+        if random.random() < 0.3:
+            url = f'{url_base}{int(random.paretovariate(1.2)) % num_words}'
+        else:
+            url = f'https://example.com/{t % 1000}'
+        items.append(
+            BrowserHistoryItem(
+                title=random.choice(['title', 'title - Jisho.org']), url=url,
+                client_id='client', time_usec=1600000000000000 + t * 1000,
+                page_transition=random.choice(['LINK', 'LINK', 'TYPED'])
+            )
+        )
+    return BrowserHistory(BrowserHistoryItemList(items))
+
+random.seed(0)
+for num_items in [100000, 500000, 1000000]:
+    make_history(num_items).save_to_path(save_path, overwrite=True)
+
+    # Current group_jisho_history stage
+    t0 = time.time()
+    browser_history = BrowserHistory.load_from_path(save_path)
+    expected = browser_history.browser_history_item_list.search_by_url_base_and_group_by_url(url_base)
+    expected.sort(attr_name='item_count', reverse=True)
+    old_elapsed = time.time() - t0
+
+    # Single pass builder
+    t0 = time.time()
+    result = CommonBrowserHistoryItemGroupBuilder.from_history_path(save_path, url_base=url_base).build(sort_by_item_count=True)
+    new_elapsed = time.time() - t0
+
+    assert result.to_dict_list() == expected.to_dict_list()
+    logger.cyan(
+        f'items: {num_items}, groups: {len(result)}, '
+        f'load+group+sort: {round(old_elapsed, 3)}s, builder: {round(new_elapsed, 3)}s'
+    )
+os.remove(save_path)
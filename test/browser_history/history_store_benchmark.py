@@ -0,0 +1,60 @@
+import os
+import time
+import shutil
+import random
+from logger import logger
+from jp_dict.parsing.browser_history import BrowserHistoryItem, BrowserHistoryItemList, BrowserHistory
+from jp_dict.parsing.history_store import PartitionedBrowserHistoryStore
+
+url_base = 'https://jisho.org/search/'
+save_path = 'history_store_benchmark_history.json'
+store_dir = 'history_store_benchmark'
+day_usec = 24 * 3600 * 10**6
+
+def make_history(num_items: int, num_days: int=3*365) -> BrowserHistory:
+    items = []
+    for t in sorted(random.sample(range(num_days * day_usec // 1000), num_items)):
+        url = f'{url_base}{random.randint(0, 5000)}' if random.random() < 0.3 else f'https://example.com/{t % 1000}'
+        items.append(
+            BrowserHistoryItem(
+                title='title', url=url, client_id='client',
+                time_usec=1600000000000000 + t * 1000, page_transition='LINK'
+            )
+        )
+    return BrowserHistory(BrowserHistoryItemList(items))
+
+random.seed(0)
+browser_history = make_history(1000000)
+browser_history.save_to_path(save_path, overwrite=True)
+store = PartitionedBrowserHistoryStore.from_history_path(store_dir, save_path)
+now_time_usec = browser_history.browser_history_item_list[-1].time_usec + 1
+
+for n_days in [7, 30, 365]:
+    start_time_usec = now_time_usec - n_days * day_usec
+
+    # Load everything and scan every time_usec
+    t0 = time.time()
+    expected = BrowserHistory.load_from_path(save_path).browser_history_item_list.search_by_url_base(url_base)
+    expected = [item for item in expected if item.time_usec >= start_time_usec]
+    scan_elapsed = time.time() - t0
+
+    # Only load the overlapping months and bisect
+    t0 = time.time()
+    result = store.query_last_n_days(n_days, url_base=url_base, now_time_usec=now_time_usec)
+    store_elapsed = time.time() - t0
+
+    assert [item.to_dict() for item in result] == [item.to_dict() for item in expected]
+    logger.cyan(
+        f'last {n_days} days: {len(result)} searches, '
+        f'full scan: {round(scan_elapsed, 3)}s, partitioned: {round(store_elapsed, 3)}s'
+    )
+
+# Bounds that fall exactly on rows, between rows and outside of the history.
+time_usec_list = [item.time_usec for item in browser_history.browser_history_item_list]
+bounds = random.sample(time_usec_list, 20) + [t + 1 for t in random.sample(time_usec_list, 20)] + [0, now_time_usec + day_usec]
+for _ in range(50):
+    start_time_usec, end_time_usec = sorted(random.sample(bounds, 2))
+    result = [item_dict['time_usec'] for item_dict in store.iter_item_dicts(start_time_usec=start_time_usec, end_time_usec=end_time_usec)]
+    assert result == [t for t in time_usec_list if start_time_usec <= t < end_time_usec]
+os.remove(save_path)
+shutil.rmtree(store_dir)
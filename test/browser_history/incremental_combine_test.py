@@ -0,0 +1,103 @@
+import os
+import json
+import shutil
+import numpy as np
+from logger import logger
+from jp_dict.parsing.browser_history import BrowserHistoryHandler, BrowserHistory
+from jp_dict.parsing.parse_manager import ParserManager
+
+# Adds Takeout exports one at a time with the incremental combine and checks after each one
+# that the combined history is the same as the one a full combine of the same exports writes.
+work_dir = 'incremental_combine_test'
+base_time_usec = 1600000000000000
+
+def get_manager(name: str) -> ParserManager:
+    os.makedirs(f'{work_dir}/{name}', exist_ok=True)
+    return ParserManager(
+        browser_history_dir=f'{work_dir}/browser_history',
+        combined_history_path=f'{work_dir}/{name}/combined_history.json',
+        jisho_grouped_history_path=f'{work_dir}/{name}/jisho_grouped_history.json',
+        jisho_parse_dump_dir=f'{work_dir}/{name}/jisho_parse_dump',
+        jisho_matches_path=f'{work_dir}/{name}/jisho_matches.json',
+        jisho_pruned_entries_path=f'{work_dir}/{name}/jisho_pruned_entries.json',
+        kotobank_parse_dump_dir=f'{work_dir}/{name}/kotobank_parse_dump',
+        kotobank_temp_map_dir=f'{work_dir}/{name}/kotobank_temp_map',
+        combined_kotobank_dump_path=f'{work_dir}/{name}/combined_kotobank.json',
+        jisho_kotobank_combined_dump_path=f'{work_dir}/{name}/jisho_kotobank_combined.json',
+        anki_export_dir_for_filter=f'{work_dir}/{name}/anki_export',
+        filter_sorted_results_dump_path=f'{work_dir}/{name}/filter_sorted_results.json',
+        koohii_parse_dump_dir=f'{work_dir}/{name}/koohii_parse_dump',
+        koohii_combined_dump_path=f'{work_dir}/{name}/koohii_combined.json',
+        filtered_koohii_dump_path=f'{work_dir}/{name}/filtered_koohii.json',
+        manager_save_path=f'{work_dir}/{name}/manager.json',
+        partitioned_history_dir=f'{work_dir}/{name}/partitioned_history'
+    )
+
+def save_export(name: str, t_list: list):
+    # Newest first, with the extra fields that Takeout exports have.
+    item_dicts = [
+        {
+            'favicon_url': 'https://jisho.org/favicon.ico',
+            'page_transition': 'LINK',
+            'title': f'{name} {t}',
+            'ptoken': {},
+            'url': f'https://jisho.org/search/{t % 50}' if t % 3 == 0 else f'https://example.com/{t}',
+            'client_id': name,
+            'time_usec': base_time_usec + t * 24 * 3600 * 10**6
+        }
+        for t in sorted(t_list, reverse=True)
+    ]
+    os.makedirs(f'{work_dir}/browser_history/{name}', exist_ok=True)
+    json.dump({'Browser History': item_dicts}, open(f'{work_dir}/browser_history/{name}/BrowserHistory.json', 'w'), indent=2)
+
+def load_rows(manager: ParserManager) -> list:
+    return json.load(open(manager.combined_history_path, 'r'))['Browser History']
+
+def check(step: str):
+    incremental_manager = ParserManager.load_from_path(f'{work_dir}/incremental/manager.json') \
+        if os.path.isfile(f'{work_dir}/incremental/manager.json') else get_manager('incremental')
+    incremental_manager.combine_history(incremental=True, show_pbar=False)
+    full_manager = get_manager('full')
+    full_manager.combine_history(force=True, show_pbar=False)
+    # The full combine merges the exports through sorted files on disk, which writes the same file
+    # as merging them in memory.
+    handler = BrowserHistoryHandler.load_from_path_list(full_manager._metadata.browser_history_paths)
+    BrowserHistory.merge(handler.browser_history_list, show_pbar=False).save_to_path(f'{work_dir}/merged.json', overwrite=True)
+    assert open(full_manager.combined_history_path, 'rb').read() == open(f'{work_dir}/merged.json', 'rb').read(), step
+    assert not os.path.exists(f'{full_manager.combined_history_path}.runs'), step
+    rows = load_rows(incremental_manager)
+    assert rows == load_rows(full_manager), step
+    assert all(['ptoken' not in item_dict for item_dict in rows]), step
+    time_usec_list = [item_dict['time_usec'] for item_dict in rows]
+    assert time_usec_list == sorted(set(time_usec_list)), step
+    assert np.load(incremental_manager.combined_history_time_usec_path).tolist() == time_usec_list, step
+    assert list(incremental_manager.history_store.iter_item_dicts()) == rows, step
+    logger.green(f'{step}: {len(rows)} rows')
+    return incremental_manager
+
+shutil.rmtree(work_dir, ignore_errors=True)
+
+# Every 7th day is missing from the first export, and a few days are listed twice.
+save_export('a', [t for t in range(1000) if t % 7 != 0] + list(range(500, 510)))
+check('first export')
+
+# Overlaps with rows of the first export and continues after it, so the new rows are appended.
+save_export('b', [t for t in range(900, 1500) if t >= 1000 or t % 7 != 0])
+size = os.path.getsize(f'{work_dir}/incremental/combined_history.json')
+manager = check('newer export')
+assert os.path.getsize(manager.combined_history_path) > size
+size = os.path.getsize(manager.combined_history_path)
+
+# A second copy of an ingested export is skipped, so nothing is rewritten.
+shutil.copytree(f'{work_dir}/browser_history/b', f'{work_dir}/browser_history/b_copy')
+manager = check('copied export')
+assert os.path.getsize(manager.combined_history_path) == size
+
+# Rows older than the last combined row: the missing days of the first export and days before it.
+save_export('c', list(range(-300, 0)) + [t for t in range(1000) if t % 7 == 0])
+check('older export')
+
+# Nothing new
+manager = check('no new export')
+assert len(manager._metadata.browser_history_exports) == 4
+shutil.rmtree(work_dir)
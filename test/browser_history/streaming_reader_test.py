@@ -0,0 +1,65 @@
+import os
+import json
+import random
+from logger import logger
+from jp_dict.util.json_utils import iter_json_array_items
+
+# Checks iter_json_array_items against json.load, with chunk sizes small enough to split keys,
+# items and multi-byte characters, and checks that torn files raise instead of ending early.
+path = 'streaming_reader_test.json'
+random.seed(0)
+
+def write(text: str):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(text)
+
+def read(key: str='Browser History', chunk_size: int=2**20) -> list:
+    return list(iter_json_array_items(path, key=key, chunk_size=chunk_size))
+
+item_dicts = [
+    {
+        'title': f'「検索{i}」 - Jisho.org ] }} ,',
+        'url': f'https://jisho.org/search/%E6%A4%9C%E7%B4%A2{i}',
+        'client_id': 'client',
+        'time_usec': 1600000000000000 + i,
+        'ptoken': {'nested': [i, {'x': None}]}
+    }
+    for i in range(200)
+]
+text = json.dumps({'Other': [{'title': 'not this one'}], 'Browser History': item_dicts, 'After': []}, indent=2, ensure_ascii=False)
+write(text)
+for chunk_size in [1, 2, 3, 7, 64, 1000, 2**20]:
+    assert read(chunk_size=chunk_size) == item_dicts, chunk_size
+assert read(key='Other', chunk_size=5) == [{'title': 'not this one'}]
+
+# Compact and empty arrays
+write(json.dumps({'Browser History': item_dicts[:3]}, ensure_ascii=False, separators=(',', ':')))
+assert read(chunk_size=4) == item_dicts[:3]
+write('{"Browser History": [ \n ]}')
+assert read(chunk_size=1) == []
+
+# Missing key
+write(json.dumps({'Other': item_dicts[:3]}))
+try:
+    read(chunk_size=16)
+    assert False, 'missing key should raise'
+except KeyError:
+    pass
+
+# Files cut off at every position inside the array raise instead of returning the items read so far.
+short_text = json.dumps({'Browser History': item_dicts[:3]}, indent=2, ensure_ascii=False)
+array_end_idx = short_text.rindex(']')
+for cut_idx in sorted(random.sample(range(short_text.index('[') + 1, array_end_idx), 100)) + [array_end_idx]:
+    write(short_text[:cut_idx])
+    for chunk_size in [5, 2**20]:
+        result = []
+        try:
+            for item_dict in iter_json_array_items(path, key='Browser History', chunk_size=chunk_size):
+                result.append(item_dict)
+            assert False, f'torn file at {cut_idx} should raise'
+        except json.JSONDecodeError:
+            pass
+        # Only complete items are yielded before the error.
+        assert result == item_dicts[:len(result)]
+os.remove(path)
+logger.green('streaming reader: ok')
@@ -0,0 +1,119 @@
+import os
+import shutil
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from logger import logger
+from jp_dict.util.http_utils import HttpClient, HttpResponseCache
+
+# Serves pages with ETag/Last-Modified from a local server and checks when HttpResponseCache
+# answers from disk, when it revalidates with a conditional GET, and what it stores.
+cache_dir = 'response_cache_test'
+# path -> [status, body, headers]
+pages = {
+    '/etag': [200, b'etag page v1', {'ETag': '"v1"'}],
+    '/last_modified': [200, b'last modified page', {'Last-Modified': 'Wed, 21 Oct 2015 07:28:00 GMT'}],
+    '/same_body': [200, b'etag page v1', {}],
+    '/not_found': [404, b'not found', {}],
+    '/error': [500, b'server error', {}]
+}
+requests = []
+
+class PageHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    def do_GET(self):
+        status, body, headers = pages[self.path]
+        requests.append((self.path, self.headers.get('If-None-Match'), self.headers.get('If-Modified-Since')))
+        if status == 200 and (
+            ('ETag' in headers and self.headers.get('If-None-Match') == headers['ETag'])
+            or ('Last-Modified' in headers and self.headers.get('If-Modified-Since') == headers['Last-Modified'])
+        ):
+            self.send_response(304)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        self.send_response(status)
+        for key, val in headers.items():
+            self.send_header(key, val)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+server = ThreadingHTTPServer(('127.0.0.1', 0), PageHandler)
+threading.Thread(target=server.serve_forever, daemon=True).start()
+url_base = f'http://127.0.0.1:{server.server_address[1]}'
+
+def expire(cache: HttpResponseCache, url: str):
+    entry = cache.load_entry(url)
+    entry.fetched_time -= cache.ttl + 1
+    cache.save_entry(entry)
+
+def get(http: HttpClient, path: str) -> tuple:
+    requests.clear()
+    response = http.get(f'{url_base}{path}')
+    return response.status, response.data, response.from_cache, list(requests)
+
+shutil.rmtree(cache_dir, ignore_errors=True)
+cache = HttpResponseCache(cache_dir, ttl=3600)
+http = HttpClient(retries=0, cache=cache)
+
+# Miss, then hit without a request.
+assert get(http, '/etag') == (200, b'etag page v1', False, [('/etag', None, None)])
+assert cache.load_entry(f'{url_base}/etag').etag == '"v1"'
+assert get(http, '/etag') == (200, b'etag page v1', True, [])
+assert (cache.stats.misses, cache.stats.hits) == (1, 1)
+
+# An expired entry is revalidated with its ETag. A 304 renews it, so the next get is a hit again.
+expire(cache, f'{url_base}/etag')
+assert get(http, '/etag') == (200, b'etag page v1', True, [('/etag', '"v1"', None)])
+assert cache.stats.revalidated == 1
+assert get(http, '/etag') == (200, b'etag page v1', True, [])
+
+# Once the page changes, the revalidation gets the new body, which replaces the cached one.
+pages['/etag'] = [200, b'etag page v2', {'ETag': '"v2"'}]
+assert get(http, '/etag') == (200, b'etag page v1', True, [])
+expire(cache, f'{url_base}/etag')
+assert get(http, '/etag') == (200, b'etag page v2', False, [('/etag', '"v1"', None)])
+assert cache.stats.updated == 1
+assert cache.load_entry(f'{url_base}/etag').etag == '"v2"'
+assert get(http, '/etag') == (200, b'etag page v2', True, [])
+
+# Last-Modified is sent back as If-Modified-Since.
+get(http, '/last_modified')
+expire(cache, f'{url_base}/last_modified')
+assert get(http, '/last_modified') == (200, b'last modified page', True, [('/last_modified', None, 'Wed, 21 Oct 2015 07:28:00 GMT')])
+
+# Identical bodies are stored once.
+get(http, '/same_body')
+assert len(os.listdir(f'{cache_dir}/bodies')) == 3
+
+# 404 is cached, 500 isn't.
+assert get(http, '/not_found') == (404, b'not found', False, [('/not_found', None, None)])
+assert get(http, '/not_found') == (404, b'not found', True, [])
+assert get(http, '/error') == (500, b'server error', False, [('/error', None, None)])
+assert get(http, '/error') == (500, b'server error', False, [('/error', None, None)])
+assert cache.load_entry(f'{url_base}/error') is None
+
+# An entry whose body is gone is fetched again without conditional headers.
+os.remove(cache.get_body_path(cache.load_entry(f'{url_base}/not_found')))
+assert get(http, '/not_found') == (404, b'not found', False, [('/not_found', None, None)])
+
+# Without a ttl, entries never expire.
+no_ttl_http = HttpClient(retries=0, cache=HttpResponseCache(cache_dir, ttl=None))
+entry = cache.load_entry(f'{url_base}/etag')
+entry.fetched_time = 0
+cache.save_entry(entry)
+assert get(no_ttl_http, '/etag') == (200, b'etag page v2', True, [])
+# With one, the same entry is revalidated.
+assert get(http, '/etag') == (200, b'etag page v2', True, [('/etag', '"v2"', None)])
+
+# use_cache=False always requests, without conditional headers.
+requests.clear()
+assert http.get(f'{url_base}/etag', use_cache=False).data == b'etag page v2'
+assert requests == [('/etag', None, None)]
+server.shutdown()
+shutil.rmtree(cache_dir)
+logger.green('response cache: ok')
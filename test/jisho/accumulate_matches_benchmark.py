@@ -0,0 +1,83 @@
+import os
+import time
+import copy
+import shutil
+from logger import logger
+from jp_dict.parsing.jisho.jisho_structs import JishoSearchHtmlParser
+from jp_dict.parsing.jisho.jisho_matches import SearchWordMatchesHandler
+from jp_dict.parsing.parse_manager import ParserManager
+
+# Times a cold accumulate_jisho_matches against an incremental one after a few dumps were
+# added, changed and removed, and checks that the incremental result equals a full rebuild.
+fixture_path = f'{os.path.dirname(os.path.abspath(__file__))}/fixtures/multiple_results.html'
+fixture_html = open(fixture_path, 'rb').read()
+num_dumps = 10000
+work_dir = 'accumulate_matches_benchmark'
+
+def get_manager(dump_store_backend: str) -> ParserManager:
+    return ParserManager(
+        browser_history_dir=f'{work_dir}/browser_history',
+        combined_history_path=f'{work_dir}/combined_history.json',
+        jisho_grouped_history_path=f'{work_dir}/jisho_grouped_history.json',
+        jisho_parse_dump_dir=f'{work_dir}/jisho_parse_dump',
+        jisho_matches_path=f'{work_dir}/jisho_matches_{dump_store_backend}.json',
+        jisho_pruned_entries_path=f'{work_dir}/jisho_pruned_entries.json',
+        kotobank_parse_dump_dir=f'{work_dir}/kotobank_parse_dump',
+        kotobank_temp_map_dir=f'{work_dir}/kotobank_temp_map',
+        combined_kotobank_dump_path=f'{work_dir}/combined_kotobank.json',
+        jisho_kotobank_combined_dump_path=f'{work_dir}/jisho_kotobank_combined.json',
+        anki_export_dir_for_filter=f'{work_dir}/anki_export',
+        filter_sorted_results_dump_path=f'{work_dir}/filter_sorted_results.json',
+        koohii_parse_dump_dir=f'{work_dir}/koohii_parse_dump',
+        koohii_combined_dump_path=f'{work_dir}/koohii_combined.json',
+        filtered_koohii_dump_path=f'{work_dir}/filtered_koohii.json',
+        manager_save_path=f'{work_dir}/manager_{dump_store_backend}.json',
+        dump_store_backend=dump_store_backend
+    )
+
+def make_query_dict(search_word: str, history_group_id: int, match_idx: int) -> dict:
+    # The fixture with one of its entries renamed to the search word, so that every dump has an exact match.
+    query_dict = copy.deepcopy(base_query_dict)
+    query_dict['history_group_id'] = history_group_id
+    all_matches = query_dict['exact_matches'] + query_dict['nonexact_matches']
+    all_matches[match_idx % len(all_matches)]['word_representation']['writing'] = search_word
+    return query_dict
+
+os.makedirs(f'{work_dir}/browser_history', exist_ok=True)
+base_query_dict = JishoSearchHtmlParser.from_html(fixture_html, url='https://jisho.org/search/fixture').parse(history_group_id=0).to_dict()
+
+for dump_store_backend in ['dir', 'sqlite']:
+    manager = get_manager(dump_store_backend)
+    dump_store = manager.jisho_dump_store
+    dump_store.save_dicts({f'単語{i}': make_query_dict(f'単語{i}', i, i) for i in range(num_dumps)})
+
+    t0 = time.time()
+    manager.accumulate_jisho_matches(force=True, show_pbar=False, num_workers=1)
+    logger.cyan(f'{dump_store_backend}: cold run over {num_dumps} dumps in {round(time.time() - t0, 3)}s (1 process)')
+    cold_result = SearchWordMatchesHandler.load_from_path(manager.jisho_matches_path).to_dict_list()
+    if os.cpu_count() > 1:
+        t0 = time.time()
+        manager.accumulate_jisho_matches(force=True, show_pbar=False)
+        logger.cyan(f'{dump_store_backend}: cold run over {num_dumps} dumps in {round(time.time() - t0, 3)}s ({os.cpu_count()} processes)')
+        assert cold_result == SearchWordMatchesHandler.load_from_path(manager.jisho_matches_path).to_dict_list()
+
+    manager._metadata.requires_jisho_matching = True
+    t0 = time.time()
+    manager.accumulate_jisho_matches(show_pbar=False)
+    logger.cyan(f'{dump_store_backend}: run without changes in {round(time.time() - t0, 3)}s')
+
+    time.sleep(0.01) # So that rewritten dump files get a new mtime.
+    dump_store.save_dicts({f'新しい単語{i}': make_query_dict(f'新しい単語{i}', num_dumps + i, i) for i in range(20)})
+    dump_store.save_dicts({f'単語{i}': make_query_dict(f'単語{i}', i, i + 1) for i in range(0, 50, 5)})
+    for i in range(1, 50, 7):
+        dump_store.delete(f'単語{i}')
+    manager._metadata.requires_jisho_matching = True
+    t0 = time.time()
+    manager.accumulate_jisho_matches(show_pbar=False)
+    logger.cyan(f'{dump_store_backend}: incremental run in {round(time.time() - t0, 3)}s')
+    incremental_result = SearchWordMatchesHandler.load_from_path(manager.jisho_matches_path).to_dict_list()
+
+    manager.accumulate_jisho_matches(force=True, show_pbar=False)
+    assert incremental_result == SearchWordMatchesHandler.load_from_path(manager.jisho_matches_path).to_dict_list()
+    manager.close_dump_stores()
+shutil.rmtree(work_dir)
@@ -0,0 +1,119 @@
+import os
+import json
+import time
+import sqlite3
+import shutil
+from logger import logger
+from jp_dict.parsing.jisho.jisho_structs import JishoSearchHtmlParser
+from jp_dict.parsing.jisho.jisho_matches import SearchWordMatchesHandler
+from jp_dict.parsing.parse_manager import ParserManager
+from jp_dict.parsing.dump_store import DumpStore, DirectoryDumpStore, SQLiteDumpStore, migrate_dump_store
+
+# Writes the same Jisho dumps to a dump directory and to a SQLite dump store,
+# and compares how long it takes to list, load and accumulate them.
+fixture_path = f'{os.path.dirname(os.path.abspath(__file__))}/fixtures/search_result.html'
+fixture_html = open(fixture_path, 'rb').read()
+num_dumps = 5000
+work_dir = 'dump_store_benchmark'
+
+def get_manager(dump_store_backend: str) -> ParserManager:
+    return ParserManager(
+        browser_history_dir=f'{work_dir}/browser_history',
+        combined_history_path=f'{work_dir}/combined_history.json',
+        jisho_grouped_history_path=f'{work_dir}/jisho_grouped_history.json',
+        jisho_parse_dump_dir=f'{work_dir}/jisho_parse_dump',
+        jisho_matches_path=f'{work_dir}/jisho_matches_{dump_store_backend}.json',
+        jisho_pruned_entries_path=f'{work_dir}/jisho_pruned_entries.json',
+        kotobank_parse_dump_dir=f'{work_dir}/kotobank_parse_dump',
+        kotobank_temp_map_dir=f'{work_dir}/kotobank_temp_map',
+        combined_kotobank_dump_path=f'{work_dir}/combined_kotobank.json',
+        jisho_kotobank_combined_dump_path=f'{work_dir}/jisho_kotobank_combined.json',
+        anki_export_dir_for_filter=f'{work_dir}/anki_export',
+        filter_sorted_results_dump_path=f'{work_dir}/filter_sorted_results.json',
+        koohii_parse_dump_dir=f'{work_dir}/koohii_parse_dump',
+        koohii_combined_dump_path=f'{work_dir}/koohii_combined.json',
+        filtered_koohii_dump_path=f'{work_dir}/filtered_koohii.json',
+        manager_save_path=f'{work_dir}/manager_{dump_store_backend}.json',
+        dump_store_backend=dump_store_backend
+    )
+
+os.makedirs(f'{work_dir}/browser_history', exist_ok=True)
+query_dict = JishoSearchHtmlParser.from_html(fixture_html, url='https://jisho.org/search/fixture').parse(history_group_id=0).to_dict()
+dir_manager = get_manager('dir')
+sqlite_manager = get_manager('sqlite')
+dir_store = dir_manager.jisho_dump_store
+sqlite_store = sqlite_manager.jisho_dump_store
+assert isinstance(dir_store, DirectoryDumpStore) and isinstance(sqlite_store, SQLiteDumpStore)
+
+item_dicts = {f'単語{i}': dict(query_dict, history_group_id=i) for i in range(num_dumps)}
+t0 = time.time()
+dir_store.save_dicts(item_dicts)
+logger.cyan(f'dir: wrote {num_dumps} dumps in {round(time.time() - t0, 3)}s')
+
+t0 = time.time()
+count = migrate_dump_store(dir_store, sqlite_store, show_pbar=False)
+sqlite_store.close()
+assert count == num_dumps
+logger.cyan(f'sqlite: migrated {num_dumps} dumps in {round(time.time() - t0, 3)}s')
+assert migrate_dump_store(dir_store, sqlite_store, show_pbar=False) == 0 # Already migrated keys are skipped.
+
+for name, store in [('dir', dir_store), ('sqlite', sqlite_store)]:
+    t0 = time.time()
+    keys = store.keys()
+    keys_elapsed = time.time() - t0
+    t0 = time.time()
+    loaded = dict(store.iter_items())
+    load_elapsed = time.time() - t0
+    assert keys == sorted(item_dicts.keys()) and loaded == item_dicts
+    logger.cyan(f'{name}: listed keys in {round(keys_elapsed, 4)}s, loaded every dump in {round(load_elapsed, 3)}s')
+
+results = {}
+for manager in [dir_manager, sqlite_manager]:
+    manager._metadata.requires_jisho_matching = True
+    t0 = time.time()
+    manager.accumulate_jisho_matches(force=True, show_pbar=False)
+    logger.cyan(f'{manager.dump_store_backend}: accumulate_jisho_matches in {round(time.time() - t0, 3)}s')
+    results[manager.dump_store_backend] = SearchWordMatchesHandler.load_from_path(manager.jisho_matches_path).to_dict_list()
+assert results['dir'] == results['sqlite']
+sqlite_manager.close_dump_stores()
+logger.cyan(f"dump directory size: {sum([os.path.getsize(f'{dir_store.path}/{name}') for name in os.listdir(dir_store.path)])} bytes in {num_dumps} files")
+logger.cyan(f'sqlite size: {os.path.getsize(sqlite_store.path)} bytes in 1 file')
+
+# Stores created before the hash column was added get it filled in when they are opened.
+old_db_path = f'{work_dir}/old_schema.sqlite3'
+connection = sqlite3.connect(old_db_path)
+connection.execute('CREATE TABLE dumps (key TEXT PRIMARY KEY, data TEXT NOT NULL)')
+connection.executemany('INSERT INTO dumps (key, data) VALUES (?, ?)', [(key, json.dumps(item_dict, ensure_ascii=False)) for key, item_dict in list(item_dicts.items())[:100]])
+connection.commit()
+connection.close()
+old_store = SQLiteDumpStore(old_db_path)
+expected_entries = sqlite_store.get_manifest().entries
+manifest = old_store.get_manifest()
+assert manifest.entries == {key: expected_entries[key] for key in manifest.entries.keys()} and len(manifest.entries) == 100
+old_store.save_dicts({'新しい単語': item_dicts['単語0']})
+assert old_store.get_manifest().entries['新しい単語'] == expected_entries['単語0']
+old_store.close()
+
+# Every write changes the version file that the pipeline hashes instead of the dumps.
+for store in [dir_store, sqlite_store, old_store]:
+    versions = [open(store.get_version_path(), 'r').read()]
+    store.save_dict('version_test', item_dicts['単語0'])
+    versions.append(open(store.get_version_path(), 'r').read())
+    store.delete('version_test')
+    versions.append(open(store.get_version_path(), 'r').read())
+    # Reads leave it as it is.
+    store.load_dict('単語0')
+    store.keys()
+    versions.append(open(store.get_version_path(), 'r').read())
+    store.clear()
+    versions.append(open(store.get_version_path(), 'r').read())
+    assert len(set(versions[:3])) == 3 and versions[3] == versions[2] and versions[4] != versions[3], versions
+    store.close()
+
+# Backends have to implement every storage method.
+try:
+    DumpStore(f'{work_dir}/base')
+    assert False, 'DumpStore is abstract'
+except TypeError:
+    pass
+shutil.rmtree(work_dir)
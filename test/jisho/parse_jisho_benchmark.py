@@ -0,0 +1,111 @@
+import os
+import time
+import shutil
+import threading
+import urllib.parse
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from logger import logger
+from jp_dict.parsing.browser_history import BrowserHistoryItem, CommonBrowserHistoryItemGroupBuilder
+from jp_dict.parsing.jisho.jisho_structs import JishoSearchQuery
+from jp_dict.parsing.parse_manager import ParserManager
+from jp_dict.util.http_utils import get_default_http_client
+
+# Stand-in for jisho.org that serves the same fixture page for every search after a fixed delay.
+fixture_path = f'{os.path.dirname(os.path.abspath(__file__))}/fixtures/search_result.html'
+fixture_html = open(fixture_path, 'rb').read()
+latency = 0.1
+num_searches = 200
+work_dir = 'parse_jisho_benchmark'
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1' # keep-alive
+    wbufsize = -1 # Send the headers and body together, to avoid delayed ACK stalls on kept-alive connections
+    def do_GET(self):
+        time.sleep(latency)
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(fixture_html)))
+        self.end_headers()
+        self.wfile.write(fixture_html)
+
+    def log_message(self, format, *args):
+        pass
+
+server = ThreadingHTTPServer(('127.0.0.1', 0), FixtureHandler)
+threading.Thread(target=server.serve_forever, daemon=True).start()
+fetch_url_base = f'http://127.0.0.1:{server.server_address[1]}/search/'
+
+def get_manager(raw_html_cache_dir: str=None) -> ParserManager:
+    return ParserManager(
+        browser_history_dir=f'{work_dir}/browser_history',
+        combined_history_path=f'{work_dir}/combined_history.json',
+        jisho_grouped_history_path=f'{work_dir}/jisho_grouped_history.json',
+        jisho_parse_dump_dir=f'{work_dir}/jisho_parse_dump',
+        jisho_matches_path=f'{work_dir}/jisho_matches.json',
+        jisho_pruned_entries_path=f'{work_dir}/jisho_pruned_entries.json',
+        kotobank_parse_dump_dir=f'{work_dir}/kotobank_parse_dump',
+        kotobank_temp_map_dir=f'{work_dir}/kotobank_temp_map',
+        combined_kotobank_dump_path=f'{work_dir}/combined_kotobank.json',
+        jisho_kotobank_combined_dump_path=f'{work_dir}/jisho_kotobank_combined.json',
+        anki_export_dir_for_filter=f'{work_dir}/anki_export',
+        filter_sorted_results_dump_path=f'{work_dir}/filter_sorted_results.json',
+        koohii_parse_dump_dir=f'{work_dir}/koohii_parse_dump',
+        koohii_combined_dump_path=f'{work_dir}/koohii_combined.json',
+        filtered_koohii_dump_path=f'{work_dir}/filtered_koohii.json',
+        manager_save_path=f'{work_dir}/manager.json',
+        raw_html_cache_dir=raw_html_cache_dir
+    )
+
+os.makedirs(f'{work_dir}/browser_history', exist_ok=True)
+manager = get_manager()
+builder = CommonBrowserHistoryItemGroupBuilder()
+for i in range(num_searches):
+    builder.add_item(
+        BrowserHistoryItem(
+            title='Jisho.org', url=f"https://jisho.org/search/{urllib.parse.quote(f'単語{i}')}",
+            client_id='client', time_usec=1600000000000000 + i, page_transition='TYPED'
+        )
+    )
+builder.build().save_to_path(manager.jisho_grouped_history_path, overwrite=True)
+
+results = {}
+for num_workers, requests_per_second in [(1, None), (8, None), (32, None), (32, 50)]:
+    shutil.rmtree(manager.jisho_parse_dump_dir, ignore_errors=True)
+    t0 = time.time()
+    manager.parse_jisho(
+        show_pbar=False, num_workers=num_workers,
+        requests_per_second=requests_per_second, fetch_url_base=fetch_url_base
+    )
+    elapsed = time.time() - t0
+    dump_names = sorted(os.listdir(manager.jisho_parse_dump_dir))
+    assert len(dump_names) == num_searches
+    results[(num_workers, requests_per_second)] = [
+        JishoSearchQuery.load_from_path(f'{manager.jisho_parse_dump_dir}/{name}').to_dict() for name in dump_names
+    ]
+    logger.cyan(
+        f'workers: {num_workers}, requests/s: {requests_per_second}, '
+        f'{num_searches} searches in {round(elapsed, 3)}s ({round(num_searches / elapsed, 1)} pages/s)'
+    )
+# The dumps don't depend on how they were fetched.
+for result in results.values():
+    assert result == results[(1, None)]
+
+# Resume: only searches that weren't dumped yet are fetched.
+for name in sorted(os.listdir(manager.jisho_parse_dump_dir))[:num_searches // 2]:
+    os.remove(f'{manager.jisho_parse_dump_dir}/{name}')
+t0 = time.time()
+manager.parse_jisho(show_pbar=False, num_workers=8, fetch_url_base=fetch_url_base)
+assert len(os.listdir(manager.jisho_parse_dump_dir)) == num_searches
+logger.cyan(f'resumed {num_searches // 2} missing searches in {round(time.time() - t0, 3)}s')
+logger.cyan(f'http client: {get_default_http_client().stats.to_dict()}')
+
+# Pages fetched from fetch_url_base are cached under their jisho.org url, so they can be re-parsed offline.
+cached_manager = get_manager(raw_html_cache_dir=f'{work_dir}/raw_html_cache')
+cached_manager.parse_jisho(force=True, show_pbar=False, num_workers=8, fetch_url_base=fetch_url_base)
+shutil.rmtree(cached_manager.jisho_parse_dump_dir)
+assert len(cached_manager.reparse_raw_html(kotobank=False, num_workers=1, show_pbar=False)) == 0
+dump_names = sorted(os.listdir(cached_manager.jisho_parse_dump_dir))
+assert [JishoSearchQuery.load_from_path(f'{cached_manager.jisho_parse_dump_dir}/{name}').to_dict() for name in dump_names] == results[(1, None)]
+
+server.shutdown()
+shutil.rmtree(work_dir)
@@ -0,0 +1,75 @@
+import os
+import time
+import shutil
+import urllib.parse
+from logger import logger
+from jp_dict.parsing.browser_history import BrowserHistoryItem, CommonBrowserHistoryItemGroupBuilder
+from jp_dict.parsing.jisho.jisho_structs import JishoSearchQuery
+from jp_dict.parsing.parse_manager import ParserManager
+from jp_dict.util.http_utils import HttpResponseCache
+
+# Fills a raw html cache with the fixture page and re-parses it offline with a growing number of processes.
+# One worker (and the default on a single core machine) parses in the main process without a pool.
+fixture_path = f'{os.path.dirname(os.path.abspath(__file__))}/fixtures/search_result.html'
+fixture_html = open(fixture_path, 'rb').read()
+num_searches = 2000
+work_dir = 'reparse_benchmark'
+
+if __name__ == '__main__':
+    os.makedirs(f'{work_dir}/browser_history', exist_ok=True)
+    manager = ParserManager(
+        browser_history_dir=f'{work_dir}/browser_history',
+        combined_history_path=f'{work_dir}/combined_history.json',
+        jisho_grouped_history_path=f'{work_dir}/jisho_grouped_history.json',
+        jisho_parse_dump_dir=f'{work_dir}/jisho_parse_dump',
+        jisho_matches_path=f'{work_dir}/jisho_matches.json',
+        jisho_pruned_entries_path=f'{work_dir}/jisho_pruned_entries.json',
+        kotobank_parse_dump_dir=f'{work_dir}/kotobank_parse_dump',
+        kotobank_temp_map_dir=f'{work_dir}/kotobank_temp_map',
+        combined_kotobank_dump_path=f'{work_dir}/combined_kotobank.json',
+        jisho_kotobank_combined_dump_path=f'{work_dir}/jisho_kotobank_combined.json',
+        anki_export_dir_for_filter=f'{work_dir}/anki_export',
+        filter_sorted_results_dump_path=f'{work_dir}/filter_sorted_results.json',
+        koohii_parse_dump_dir=f'{work_dir}/koohii_parse_dump',
+        koohii_combined_dump_path=f'{work_dir}/koohii_combined.json',
+        filtered_koohii_dump_path=f'{work_dir}/filtered_koohii.json',
+        manager_save_path=f'{work_dir}/manager.json',
+        raw_html_cache_dir=f'{work_dir}/raw_html_cache'
+    )
+    cache = HttpResponseCache(manager.raw_html_cache_dir)
+    builder = CommonBrowserHistoryItemGroupBuilder()
+    for i in range(num_searches):
+        url = f"https://jisho.org/search/{urllib.parse.quote(f'単語{i}')}"
+        builder.add_item(
+            BrowserHistoryItem(
+                title='Jisho.org', url=url, client_id='client',
+                time_usec=1600000000000000 + i, page_transition='TYPED'
+            )
+        )
+        cache.store(url=url, status=200, data=fixture_html, headers={'Content-Type': 'text/html; charset=utf-8'})
+    builder.build().save_to_path(manager.jisho_grouped_history_path, overwrite=True)
+
+    results = {}
+    worker_counts = sorted(set([1, 2, 4, os.cpu_count()])) + [None]
+    for num_workers in worker_counts:
+        shutil.rmtree(manager.jisho_parse_dump_dir, ignore_errors=True)
+        t0 = time.time()
+        failures = manager.reparse_raw_html(kotobank=False, num_workers=num_workers, show_pbar=False)
+        elapsed = time.time() - t0
+        assert len(failures) == 0
+        dump_names = sorted(os.listdir(manager.jisho_parse_dump_dir))
+        assert len(dump_names) == num_searches
+        results[num_workers] = [
+            JishoSearchQuery.load_from_path(f'{manager.jisho_parse_dump_dir}/{name}').to_dict() for name in dump_names
+        ]
+        logger.cyan(
+            f"processes: {num_workers if num_workers is not None else f'default ({os.cpu_count()} cores)'}, "
+            f'{num_searches} pages in {round(elapsed, 3)}s '
+            f'({round(num_searches / elapsed, 1)} pages/s, speedup: {round(single_process_elapsed / elapsed, 2) if num_workers != 1 else 1.0}x)'
+        )
+        if num_workers == 1:
+            single_process_elapsed = elapsed
+    for result in results.values():
+        assert result == results[1]
+    logger.cyan(f'cpu count: {os.cpu_count()}')
+    shutil.rmtree(work_dir)
@@ -0,0 +1,61 @@
+import os
+import copy
+import time
+import random
+from logger import logger
+from jp_dict.parsing.jisho.jisho_structs import JishoSearchHtmlParser
+from jp_dict.parsing.jisho.jisho_matches import DictionaryEntryMatch
+from jp_dict.parsing.combined.combined_structs import CombinedResult, CombinedResultList
+from jp_dict.parsing.combined.kanji_info import WritingKanjiInfo, WritingKanjiInfoList
+
+# Compares get_all_writing_kanji with the linear-scan aggregation it replaced, on results whose
+# writings are drawn from a few thousand kanji.
+fixture_path = f'{os.path.dirname(os.path.abspath(__file__))}/../jisho/fixtures/multiple_results.html'
+entry = JishoSearchHtmlParser.from_html(open(fixture_path, 'rb').read(), url='https://jisho.org/search/fixture').parse(history_group_id=0).exact_matches[0]
+num_results = 10000
+kanji_pool = [chr(code) for code in range(0x4E00, 0x4E00 + 2000)]
+rng = random.Random(0)
+
+def old_get_all_writing_kanji(results: CombinedResultList, include_hit_count: bool) -> WritingKanjiInfoList:
+    info_list = WritingKanjiInfoList()
+    for result in results:
+        for i, kanji in enumerate(result.writing_kanji_list):
+            hit_count = result.search_word_hit_count if include_hit_count else 1
+            earliest_time_usec = result.earliest_time_usec
+            relevant_info_list = info_list.get(kanji=kanji)
+            if len(relevant_info_list) == 0:
+                info_list.append(WritingKanjiInfo(
+                    kanji=kanji, hit_count=hit_count,
+                    used_in=[result.jisho_result.entry.word_representation.writing],
+                    earliest_time_usec=earliest_time_usec, earliest_pos_idx=i
+                ))
+            else:
+                relevant_info = relevant_info_list[0]
+                relevant_info.hit_count += hit_count
+                if result.jisho_result.entry.word_representation.writing not in relevant_info.used_in:
+                    relevant_info.used_in.append(result.jisho_result.entry.word_representation.writing)
+                if earliest_time_usec < relevant_info.earliest_time_usec:
+                    relevant_info.earliest_time_usec = earliest_time_usec
+                    relevant_info.earliest_pos_idx = i
+    info_list.sort(attr_name='hit_count', reverse=True)
+    return info_list
+
+results = CombinedResultList()
+for i in range(num_results):
+    writing = ''.join([rng.choice(kanji_pool[:rng.choice([50, 2000])]) for _ in range(rng.randint(1, 3))]) + rng.choice(['', 'する', 'い'])
+    entry_match = DictionaryEntryMatch(id=i, entry=copy.deepcopy(entry), search_words=[writing], history_group_id_list=[i])
+    entry_match.entry.word_representation.writing = writing
+    entry_match.search_words_time_usec = {writing: [1600000000000000 + rng.randrange(10**9) for _ in range(rng.randint(1, 3))]}
+    results.append(CombinedResult(jisho_result=entry_match))
+
+t0 = time.time()
+old_info_list = old_get_all_writing_kanji(results, include_hit_count=True)
+logger.cyan(f'linear scan: {len(old_info_list)} kanji in {round(time.time() - t0, 3)}s')
+t0 = time.time()
+info_list = results.get_all_writing_kanji(include_hit_count=True, show_pbar=False)
+logger.cyan(f'keyed by kanji: {len(info_list)} kanji in {round(time.time() - t0, 3)}s')
+assert info_list.to_dict_list() == old_info_list.to_dict_list()
+
+kanji_index = results.get_writing_kanji_index()
+for info in info_list:
+    assert sorted(set([results[idx].jisho_result.entry.word_representation.writing for idx in kanji_index[info.kanji]])) == sorted(info.used_in)
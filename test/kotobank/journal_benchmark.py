@@ -0,0 +1,40 @@
+import os
+import time
+import json
+import shutil
+from logger import logger
+from jp_dict.util.json_utils import JsonlJournal
+
+# Compares the old kotobank_temp_map_dir layout (one json file per entry) with the journal
+# that parse_kotobank uses now, for writing progress and reading it back on resume.
+num_entries = 50000
+work_dir = 'journal_benchmark'
+os.makedirs(f'{work_dir}/temp_map', exist_ok=True)
+records = [{'id': i, 'successful_search_queries': [f'単語{i}', f'たんご{i}']} for i in range(num_entries)]
+
+t0 = time.time()
+for record in records:
+    json.dump({'successful_search_queries': record['successful_search_queries']}, open(f"{work_dir}/temp_map/{record['id']}.json", 'w'), ensure_ascii=False)
+logger.cyan(f'temp map dir: wrote {num_entries} entries in {round(time.time() - t0, 3)}s')
+t0 = time.time()
+linked_queries = {
+    int(filename[:-len('.json')]): json.load(open(f'{work_dir}/temp_map/{filename}', 'r'))['successful_search_queries']
+    for filename in os.listdir(f'{work_dir}/temp_map')
+}
+logger.cyan(f'temp map dir: read {len(linked_queries)} entries in {round(time.time() - t0, 3)}s')
+
+t0 = time.time()
+with JsonlJournal(f'{work_dir}/journal.jsonl') as journal:
+    for record in records:
+        journal.append(record)
+logger.cyan(f'journal: wrote {num_entries} entries in {round(time.time() - t0, 3)}s')
+with open(f'{work_dir}/journal.jsonl', 'ab') as f:
+    f.write(b'{"id": -1, "successful_sea') # Partial line left behind by a crash.
+t0 = time.time()
+journal_linked_queries = {
+    item_dict['id']: item_dict['successful_search_queries']
+    for item_dict in JsonlJournal(f'{work_dir}/journal.jsonl').read()
+}
+logger.cyan(f'journal: read {len(journal_linked_queries)} entries in {round(time.time() - t0, 3)}s')
+assert journal_linked_queries == linked_queries
+shutil.rmtree(work_dir)
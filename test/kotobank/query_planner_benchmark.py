@@ -0,0 +1,163 @@
+import os
+import copy
+import time
+import shutil
+import random
+from typing import List
+from logger import logger
+from jp_dict.util.http_utils import HttpClient, HttpResponseCache
+from jp_dict.parsing.jisho.jisho_structs import JishoSearchHtmlParser, OtherForm, OtherFormList
+from jp_dict.parsing.jisho.jisho_matches import DictionaryEntryMatch, DictionaryEntryMatchList
+from jp_dict.util.json_utils import JsonlJournal
+from jp_dict.parsing.parse_manager import ParserManager
+
+# Runs parse_kotobank against pages that are served from a raw html cache, and checks that the
+# planned version links every entry like the old entry-by-entry version.
+fixture_dir = os.path.dirname(os.path.abspath(__file__))
+found_html = open(f'{fixture_dir}/fixtures/encyclopedia.html', 'rb').read()
+not_found_html = open(f'{fixture_dir}/fixtures/not_found.html', 'rb').read()
+jisho_html = open(f'{fixture_dir}/../jisho/fixtures/multiple_results.html', 'rb').read()
+entry = JishoSearchHtmlParser.from_html(jisho_html, url='https://jisho.org/search/fixture').parse(history_group_id=0).exact_matches[0]
+num_entries = 2000
+work_dir = 'query_planner_benchmark'
+rng = random.Random(0)
+
+def get_manager(name: str) -> ParserManager:
+    os.makedirs(f'{work_dir}/browser_history', exist_ok=True)
+    os.makedirs(f'{work_dir}/{name}', exist_ok=True)
+    manager = ParserManager(
+        browser_history_dir=f'{work_dir}/browser_history',
+        combined_history_path=f'{work_dir}/combined_history.json',
+        jisho_grouped_history_path=f'{work_dir}/jisho_grouped_history.json',
+        jisho_parse_dump_dir=f'{work_dir}/jisho_parse_dump',
+        jisho_matches_path=f'{work_dir}/jisho_matches.json',
+        jisho_pruned_entries_path=f'{work_dir}/{name}/jisho_pruned_entries.json',
+        kotobank_parse_dump_dir=f'{work_dir}/{name}/kotobank_parse_dump',
+        kotobank_temp_map_dir=f'{work_dir}/{name}/kotobank_temp_map',
+        combined_kotobank_dump_path=f'{work_dir}/combined_kotobank.json',
+        jisho_kotobank_combined_dump_path=f'{work_dir}/jisho_kotobank_combined.json',
+        anki_export_dir_for_filter=f'{work_dir}/anki_export',
+        filter_sorted_results_dump_path=f'{work_dir}/filter_sorted_results.json',
+        koohii_parse_dump_dir=f'{work_dir}/koohii_parse_dump',
+        koohii_combined_dump_path=f'{work_dir}/koohii_combined.json',
+        filtered_koohii_dump_path=f'{work_dir}/filtered_koohii.json',
+        manager_save_path=f'{work_dir}/{name}/manager.json',
+        raw_html_cache_dir=f'{work_dir}/raw_html_cache',
+        raw_html_cache_ttl=None
+    )
+    manager._http_client = HttpClient(cache=HttpResponseCache(manager.raw_html_cache_dir, ttl=None))
+    entry_match_list.save_to_path(manager.jisho_pruned_entries_path, overwrite=True)
+    return manager
+
+def old_process_query(manager: ParserManager, search_query: str) -> bool:
+    result = manager.kotobank_result_cache.get(search_query)
+    if result is None:
+        return manager._fetch_kotobank_query(search_query)[1]
+    return not result.is_empty
+
+def old_process_target(manager: ParserManager, entry_match: DictionaryEntryMatch, target: str) -> List[str]:
+    return [
+        search_query for search_query in manager._get_kotobank_target_queries(entry_match=entry_match, target=target)
+        if old_process_query(manager, search_query)
+    ]
+
+def old_parse_kotobank(manager: ParserManager):
+    # The entry-by-entry linking that parse_kotobank used to do.
+    entry_match_list = DictionaryEntryMatchList.load_from_path(manager.jisho_pruned_entries_path)
+    for entry_match in entry_match_list:
+        priority_target_found = False
+        successful_search_queries = []
+        for target in manager.kotobank_parse_config.priority_targets:
+            successful_search_queries0 = old_process_target(manager, entry_match=entry_match, target=target)
+            if len(successful_search_queries0) > 0:
+                successful_search_queries.extend(successful_search_queries0)
+                priority_target_found = True
+        if not priority_target_found:
+            for target in manager.kotobank_parse_config.backup_targets:
+                successful_search_queries0 = old_process_target(manager, entry_match=entry_match, target=target)
+                if len(successful_search_queries0) > 0:
+                    successful_search_queries.extend(successful_search_queries0)
+                    break
+        entry_match.linked_kotobank_queries = list(dict.fromkeys(successful_search_queries))
+    entry_match_list.save_to_path(manager.jisho_pruned_entries_path, overwrite=True)
+    return entry_match_list
+
+# Words, readings and other forms are drawn from small pools so that entries share queries.
+entry_match_list = DictionaryEntryMatchList()
+for i in range(num_entries):
+    entry_match = DictionaryEntryMatch(id=i, entry=copy.deepcopy(entry), search_words=[f'検索{rng.randrange(num_entries)}'], history_group_id_list=[i])
+    entry_match.entry.word_representation.writing = f'単語{rng.randrange(num_entries // 2)}'
+    entry_match.entry.word_representation.reading = f'たんご{rng.randrange(num_entries // 4)}'
+    entry_match.entry.meaning_section.other_forms = OtherFormList([
+        OtherForm(writing=f'別形{rng.randrange(num_entries // 4)}', reading=f'べつけい{rng.randrange(num_entries // 4)}')
+        for _ in range(rng.randint(0, 2))
+    ])
+    entry_match_list.append(entry_match)
+
+all_queries = set()
+for entry_match in entry_match_list:
+    all_queries.update(entry_match.search_words)
+    all_queries.update([entry_match.entry.word_representation.writing, entry_match.entry.word_representation.reading])
+    for other_form in entry_match.entry.meaning_section.other_forms:
+        all_queries.update([other_form.writing, other_form.reading])
+raw_html_cache = HttpResponseCache(f'{work_dir}/raw_html_cache', ttl=None)
+for search_query in sorted(all_queries):
+    found = rng.random() < 0.4
+    raw_html_cache.store(
+        url=f'https://kotobank.jp/word/{search_query}', status=200 if found else 404,
+        data=found_html if found else not_found_html, headers={'Content-Type': 'text/html'}
+    )
+
+manager = get_manager('old')
+t0 = time.time()
+old_entry_match_list = old_parse_kotobank(manager)
+logger.cyan(f'entry by entry: {round(time.time() - t0, 3)}s, {manager.http_client.cache.stats.hits} pages')
+
+for num_workers, speculative_backups in [(1, False), (4, False), (4, True)]:
+    manager = get_manager(f'planned_{num_workers}_{speculative_backups}')
+    t0 = time.time()
+    manager.parse_kotobank(force=True, show_pbar=False, num_workers=num_workers, speculative_backups=speculative_backups)
+    logger.cyan(
+        f'planned (num_workers={num_workers}, speculative_backups={speculative_backups}): '
+        f'{round(time.time() - t0, 3)}s, {manager.http_client.cache.stats.hits} pages'
+    )
+    new_entry_match_list = DictionaryEntryMatchList.load_from_path(manager.jisho_pruned_entries_path)
+    assert [sorted(item.linked_kotobank_queries) for item in new_entry_match_list] == [sorted(item.linked_kotobank_queries) for item in old_entry_match_list]
+    assert not os.path.isfile(manager.kotobank_journal_path)
+
+# Entries in the journal were finished by an interrupted run, so they are kept as they are.
+manager = get_manager('resumed')
+journal = JsonlJournal(manager.kotobank_journal_path)
+for entry_match in entry_match_list[:100]:
+    journal.append({'id': entry_match.id, 'successful_search_queries': ['途中まで']})
+journal.close()
+manager._parse_kotobank(show_pbar=False)
+resumed_entry_match_list = DictionaryEntryMatchList.load_from_path(manager.jisho_pruned_entries_path)
+assert [item.linked_kotobank_queries for item in resumed_entry_match_list[:100]] == [['途中まで']] * 100
+assert [sorted(item.linked_kotobank_queries) for item in resumed_entry_match_list[100:]] == [sorted(item.linked_kotobank_queries) for item in old_entry_match_list[100:]]
+
+# Interrupted after phase 1: the entries linked by then are in the journal, and resuming only does the rest.
+manager = get_manager('interrupted')
+priority_queries = set([
+    search_query for entry_match in entry_match_list for target in manager.kotobank_parse_config.priority_targets
+    for search_query in manager._get_kotobank_target_queries(entry_match=entry_match, target=target)
+])
+fetch_kotobank_query = manager._fetch_kotobank_query
+def interrupting_fetch(search_query: str, rate_limiter=None):
+    if search_query not in priority_queries:
+        raise KeyboardInterrupt
+    return fetch_kotobank_query(search_query, rate_limiter=rate_limiter)
+manager._fetch_kotobank_query = interrupting_fetch
+try:
+    manager._parse_kotobank(show_pbar=False)
+    assert False
+except KeyboardInterrupt:
+    pass
+journal_ids = [item_dict['id'] for item_dict in JsonlJournal(manager.kotobank_journal_path).read()]
+assert 0 < len(journal_ids) < len(entry_match_list)
+assert set(journal_ids) == set([item.id for item in old_entry_match_list if len(set(item.linked_kotobank_queries) & priority_queries) > 0])
+manager._fetch_kotobank_query = fetch_kotobank_query
+manager._parse_kotobank(show_pbar=False)
+resumed_entry_match_list = DictionaryEntryMatchList.load_from_path(manager.jisho_pruned_entries_path)
+assert [sorted(item.linked_kotobank_queries) for item in resumed_entry_match_list] == [sorted(item.linked_kotobank_queries) for item in old_entry_match_list]
+shutil.rmtree(work_dir)
@@ -0,0 +1,50 @@
+import os
+import time
+import random
+import shutil
+from logger import logger
+from jp_dict.parsing.dump_store import DirectoryDumpStore
+from jp_dict.parsing.kotobank.kotobank_structs import KotobankWordHtmlParser, KotobankResultCache
+from jp_dict.parsing.jisho.jisho_structs import JishoSearchHtmlParser
+from jp_dict.parsing.jisho.jisho_matches import DictionaryEntryMatch, DictionaryEntryMatchList
+from jp_dict.parsing.combined.combined_structs import CombinedResult, CombinedResultList
+
+# Combines Jisho entries with Kotobank dumps where a few popular queries are linked to most of
+# the entries, with and without the KotobankResultCache.
+fixture_dir = f'{os.path.dirname(os.path.abspath(__file__))}'
+kotobank_html = open(f'{fixture_dir}/fixtures/encyclopedia.html', 'rb').read()
+jisho_html = open(f'{fixture_dir}/../jisho/fixtures/multiple_results.html', 'rb').read()
+num_queries = 500
+num_entries = 5000
+work_dir = 'result_cache_benchmark'
+
+result_dict = KotobankWordHtmlParser.from_html(kotobank_html, url='https://kotobank.jp/word/fixture').parse().to_dict()
+dump_store = DirectoryDumpStore(f'{work_dir}/kotobank_parse_dump')
+dump_store.save_dicts({f'単語{i}': dict(result_dict, search_word=f'単語{i}') for i in range(num_queries)})
+
+entry = JishoSearchHtmlParser.from_html(jisho_html, url='https://jisho.org/search/fixture').parse(history_group_id=0).exact_matches[0]
+rng = random.Random(0)
+entry_matches = DictionaryEntryMatchList([
+    DictionaryEntryMatch(
+        id=i, entry=entry, search_words=[f'単語{i}'], history_group_id_list=[i],
+        # Skewed towards the first queries, like common words that are linked to many entries.
+        linked_kotobank_queries=[f'単語{int(rng.paretovariate(1.2)) % num_queries}']
+    ) for i in range(num_entries)
+])
+
+t0 = time.time()
+uncached_results = CombinedResultList()
+for entry_match in entry_matches:
+    result = CombinedResult.from_match(entry_match=entry_match, kotobank_dump_store=dump_store)
+    if result is not None:
+        uncached_results.append(result)
+logger.cyan(f'without cache: {len(uncached_results)} results in {round(time.time() - t0, 3)}s')
+
+for max_size in [num_queries, 50]:
+    cache = KotobankResultCache(dump_store, max_size=max_size)
+    t0 = time.time()
+    cached_results = CombinedResultList.from_matches(entry_matches, kotobank_cache=cache, show_pbar=False)
+    logger.cyan(f'with cache (max_size={max_size}): {len(cached_results)} results in {round(time.time() - t0, 3)}s, {cache.stats.to_dict()}, hit rate: {round(cache.stats.hit_rate, 3)}')
+    assert len(cache) <= max_size
+    assert cached_results.to_dict_list() == uncached_results.to_dict_list()
+shutil.rmtree(work_dir)
@@ -0,0 +1,148 @@
+import os
+import copy
+import time
+import json
+import shutil
+import random
+from logger import logger
+from jp_dict.util.http_utils import HttpClient, HttpResponseCache
+from jp_dict.parsing.jisho.jisho_structs import JishoSearchHtmlParser, DictionaryEntry, DictionaryEntryList
+from jp_dict.parsing.jisho.jisho_matches import SearchWordMatches, SearchWordMatchesHandler, \
+    DictionaryEntryMatch, DictionaryEntryMatchList, DictionaryEntryMatchIdMap
+from jp_dict.parsing.parse_manager import ParserManager
+
+# Prunes synthetic search word matches, links them to Kotobank pages served from a raw html cache,
+# and then re-prunes after changing a few of them. Checks that unchanged entries keep their ids and links,
+# and that the non-forced parse_kotobank only fetches what the changed entries need.
+test_dir = os.path.dirname(os.path.abspath(__file__))
+found_html = open(f'{test_dir}/../kotobank/fixtures/encyclopedia.html', 'rb').read()
+not_found_html = open(f'{test_dir}/../kotobank/fixtures/not_found.html', 'rb').read()
+query = JishoSearchHtmlParser.from_html(open(f'{test_dir}/../jisho/fixtures/multiple_results.html', 'rb').read(), url='https://jisho.org/search/fixture').parse(history_group_id=0)
+base_entry_dicts = [entry.to_dict() for entry in query.exact_matches + query.nonexact_matches]
+num_search_words = 3000
+work_dir = 'content_id_benchmark'
+rng = random.Random(0)
+
+entry_dicts = []
+for i in range(num_search_words // 2):
+    entry_dict = copy.deepcopy(base_entry_dicts[i % len(base_entry_dicts)])
+    entry_dict['word_representation']['writing'] = f'単語{i}'
+    entry_dict['word_representation']['reading'] = f'たんご{i % (num_search_words // 4)}'
+    entry_dicts.append(entry_dict)
+sw_entry_indices = {f'検索{i}': [rng.randrange(len(entry_dicts)) for _ in range(1 if rng.random() < 0.7 else 2)] for i in range(num_search_words)}
+
+def save_matches(path: str):
+    SearchWordMatchesHandler([
+        SearchWordMatches(
+            search_word=search_word,
+            matches=DictionaryEntryList([DictionaryEntry.from_dict(entry_dicts[idx]) for idx in entry_indices]),
+            history_group_id=i
+        )
+        for i, (search_word, entry_indices) in enumerate(sw_entry_indices.items())
+    ]).save_to_path(path, overwrite=True)
+
+def store_kotobank_pages(entry_match_list: DictionaryEntryMatchList):
+    raw_html_cache = HttpResponseCache(f'{work_dir}/raw_html_cache', ttl=None)
+    for entry_match in entry_match_list:
+        search_queries = entry_match.search_words + [entry_match.entry.word_representation.writing, entry_match.entry.word_representation.reading]
+        for other_form in entry_match.entry.meaning_section.other_forms or []:
+            search_queries.extend([other_form.writing, other_form.reading])
+        for search_query in search_queries:
+            url = f'https://kotobank.jp/word/{search_query}'
+            if search_query is not None and raw_html_cache.load_entry(url) is None:
+                found = random.Random(search_query).random() < 0.4
+                raw_html_cache.store(url=url, status=200 if found else 404, data=found_html if found else not_found_html, headers={'Content-Type': 'text/html'})
+
+def get_manager() -> ParserManager:
+    # Reloaded like a separate run would, so that the metadata carries over.
+    os.makedirs(f'{work_dir}/browser_history', exist_ok=True)
+    if os.path.isfile(f'{work_dir}/manager.json'):
+        manager = ParserManager.load_from_path(f'{work_dir}/manager.json')
+        manager._http_client = HttpClient(cache=HttpResponseCache(manager.raw_html_cache_dir, ttl=None))
+        return manager
+    manager = ParserManager(
+        browser_history_dir=f'{work_dir}/browser_history',
+        combined_history_path=f'{work_dir}/combined_history.json',
+        jisho_grouped_history_path=f'{work_dir}/jisho_grouped_history.json',
+        jisho_parse_dump_dir=f'{work_dir}/jisho_parse_dump',
+        jisho_matches_path=f'{work_dir}/jisho_matches.json',
+        jisho_pruned_entries_path=f'{work_dir}/jisho_pruned_entries.json',
+        kotobank_parse_dump_dir=f'{work_dir}/kotobank_parse_dump',
+        kotobank_temp_map_dir=f'{work_dir}/kotobank_temp_map',
+        combined_kotobank_dump_path=f'{work_dir}/combined_kotobank.json',
+        jisho_kotobank_combined_dump_path=f'{work_dir}/jisho_kotobank_combined.json',
+        anki_export_dir_for_filter=f'{work_dir}/anki_export',
+        filter_sorted_results_dump_path=f'{work_dir}/filter_sorted_results.json',
+        koohii_parse_dump_dir=f'{work_dir}/koohii_parse_dump',
+        koohii_combined_dump_path=f'{work_dir}/koohii_combined.json',
+        filtered_koohii_dump_path=f'{work_dir}/filtered_koohii.json',
+        manager_save_path=f'{work_dir}/manager.json',
+        raw_html_cache_dir=f'{work_dir}/raw_html_cache',
+        raw_html_cache_ttl=None
+    )
+    manager._http_client = HttpClient(cache=HttpResponseCache(manager.raw_html_cache_dir, ttl=None))
+    return manager
+
+def load_links(manager: ParserManager) -> dict:
+    return {item.id: item.linked_kotobank_queries for item in DictionaryEntryMatchList.load_from_path(manager.jisho_pruned_entries_path)}
+
+manager = get_manager()
+save_matches(manager.jisho_matches_path)
+t0 = time.time()
+manager.prune_jisho_entry_matches(force=True, show_pbar=False)
+logger.cyan(f'{num_search_words} search words: pruned in {round(time.time() - t0, 3)}s')
+entry_match_list = DictionaryEntryMatchList.load_from_path(manager.jisho_pruned_entries_path)
+assert all([item.id == DictionaryEntryMatch.get_content_id(item.entry.content_hash) for item in entry_match_list])
+assert entry_match_list.get_content_hashes() == {item.id: item.entry.content_hash for item in entry_match_list}
+store_kotobank_pages(entry_match_list)
+t0 = time.time()
+manager.parse_kotobank(force=True, show_pbar=False)
+logger.cyan(f'{len(entry_match_list)} entries: linked in {round(time.time() - t0, 3)}s, {manager.http_client.cache.stats.hits} pages')
+first_links = load_links(manager)
+
+# Change the senses of a few entries, give a few entries another search word and drop a few search words.
+changed_entry_indices = rng.sample(range(len(entry_dicts)), 20)
+for idx in changed_entry_indices:
+    entry_dicts[idx]['meaning_section']['meaning_groups'][0]['meaning_list'][0]['meaning_text'] += ' (revised)'
+for i in range(20):
+    sw_entry_indices[f'新しい検索{i}'] = [rng.randrange(len(entry_dicts))]
+for search_word in rng.sample(sorted(sw_entry_indices.keys()), 20):
+    del sw_entry_indices[search_word]
+save_matches(manager.jisho_matches_path)
+
+manager = get_manager()
+t0 = time.time()
+manager.prune_jisho_entry_matches(force=True, show_pbar=False)
+logger.cyan(f're-pruned in {round(time.time() - t0, 3)}s')
+id_map = DictionaryEntryMatchIdMap.load_from_path(manager.jisho_pruned_entries_id_map_path)
+entry_match_list = DictionaryEntryMatchList.load_from_path(manager.jisho_pruned_entries_path)
+assert all([old_id == new_id for old_id, new_id in id_map.id_map.items()])
+assert set(id_map.id_map.values()) | set(id_map.added_ids) == set(entry_match_list.ids)
+assert set(id_map.id_map.keys()) | set(id_map.removed_ids) == set(first_links.keys())
+store_kotobank_pages(entry_match_list)
+t0 = time.time()
+manager._parse_kotobank(show_pbar=False)
+logger.cyan(
+    f'{len(id_map.added_ids)} added and {len(id_map.removed_ids)} removed entries: '
+    f'relinked in {round(time.time() - t0, 3)}s, {manager.http_client.cache.stats.hits} pages'
+)
+incremental_links = load_links(manager)
+
+manager = get_manager()
+manager.parse_kotobank(force=True, show_pbar=False)
+assert incremental_links == load_links(manager)
+
+# Entries pruned by older versions were numbered in processing order. Their links are carried over through the id map.
+legacy_dicts = json.load(open(manager.jisho_pruned_entries_path, 'r'))
+for i, item_dict in enumerate(legacy_dicts):
+    item_dict['id'] = i
+json.dump(legacy_dicts, open(manager.jisho_pruned_entries_path, 'w'), indent=2, ensure_ascii=False)
+manager = get_manager()
+manager.prune_jisho_entry_matches(force=True, show_pbar=False)
+id_map = DictionaryEntryMatchIdMap.load_from_path(manager.jisho_pruned_entries_id_map_path)
+assert len(id_map.added_ids) == 0 and len(id_map.removed_ids) == 0
+assert {id_map.id_map[i]: item_dict['linked_kotobank_queries'] for i, item_dict in enumerate(legacy_dicts)} == incremental_links
+manager._parse_kotobank(show_pbar=False)
+assert manager.http_client.cache.stats.hits == 0
+assert load_links(manager) == incremental_links
+shutil.rmtree(work_dir)
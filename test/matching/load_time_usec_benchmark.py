@@ -0,0 +1,57 @@
+import os
+import time
+import random
+from logger import logger
+from common_utils.base.basic import BasicLoadableHandler
+from jp_dict.parsing.browser_history import CommonBrowserHistoryItemGroup, CommonBrowserHistoryItemGroupList
+from jp_dict.parsing.jisho.jisho_structs import JishoSearchHtmlParser
+from jp_dict.parsing.jisho.jisho_matches import DictionaryEntryMatch, DictionaryEntryMatchList
+
+# Times DictionaryEntryMatchList.load_time_usec with the id index against the old linear get(id=...),
+# and checks that id lookups notice changes made to the lists.
+fixture_path = f'{os.path.dirname(os.path.abspath(__file__))}/../jisho/fixtures/multiple_results.html'
+fixture_html = open(fixture_path, 'rb').read()
+entry = JishoSearchHtmlParser.from_html(fixture_html, url='https://jisho.org/search/fixture').parse(history_group_id=0).exact_matches[0]
+rng = random.Random(0)
+
+for num_groups in [1000, 5000]:
+    history = CommonBrowserHistoryItemGroupList([
+        CommonBrowserHistoryItemGroup(
+            title=f'単語{i} - Jisho.org', url=f'https://jisho.org/search/単語{i}',
+            client_id='client', time_usec=[1600000000000000 + i], id=i
+        ) for i in range(num_groups)
+    ])
+    rng.shuffle(history.obj_list)
+    entry_matches = DictionaryEntryMatchList([
+        DictionaryEntryMatch(entry=entry, search_words=[f'単語{i}'], history_group_id_list=[i], id=i)
+        for i in range(num_groups)
+    ])
+
+    t0 = time.time()
+    entry_matches.load_time_usec(browser_history=history, show_pbar=False)
+    logger.cyan(f'{num_groups} groups: indexed load_time_usec in {round(time.time() - t0, 3)}s')
+    indexed_result = [item.search_words_time_usec for item in entry_matches]
+
+    t0 = time.time()
+    for item in entry_matches:
+        for search_word, history_id in zip(item.search_words, item.history_group_id_list):
+            item.search_words_time_usec[search_word] = BasicLoadableHandler.get(history, id=history_id)[0].time_usec
+    logger.cyan(f'{num_groups} groups: linear load_time_usec in {round(time.time() - t0, 3)}s')
+    assert indexed_result == [item.search_words_time_usec for item in entry_matches]
+
+history.append(CommonBrowserHistoryItemGroup(title='new', url='new', client_id='client', time_usec=[0], id=num_groups))
+assert history.get_obj_from_id(num_groups).url == 'new'
+history.obj_list[0].id = -1
+assert history.get_obj_from_id(-1) is history[0]
+del history[0]
+assert len(history.get(id=-1)) == 0
+assert entry_matches.get_obj_from_id(5).id == 5
+# Replaced directly in obj_list, with the length unchanged.
+replaced_id = history[0].id
+history.obj_list[0] = CommonBrowserHistoryItemGroup(title='replaced', url='replaced', client_id='client', time_usec=[0], id=-2)
+assert len(history.get(id=replaced_id)) == 0
+assert history.get_obj_from_id(-2).url == 'replaced'
+# Changed in place to an id that is already indexed. Found once the index is invalidated.
+history.obj_list[1].id = 5
+history._invalidate_id_index()
+assert len(history.get(id=5)) == 2
@@ -0,0 +1,50 @@
+import os
+import copy
+import time
+import random
+from logger import logger
+from jp_dict.parsing.jisho.jisho_structs import JishoSearchHtmlParser, DictionaryEntry, DictionaryEntryList
+from jp_dict.parsing.jisho.jisho_matches import SearchWordMatches, SearchWordMatchesHandler, DictionaryEntryMatchList
+
+# Times add_pruned_matches in every mode on synthetic search word matches, where roughly half
+# of the entries are shared between search words.
+fixture_path = f'{os.path.dirname(os.path.abspath(__file__))}/../jisho/fixtures/multiple_results.html'
+fixture_html = open(fixture_path, 'rb').read()
+query = JishoSearchHtmlParser.from_html(fixture_html, url='https://jisho.org/search/fixture').parse(history_group_id=0)
+base_entry_dicts = [entry.to_dict() for entry in query.exact_matches + query.nonexact_matches]
+
+def make_handler(num_search_words: int, seed: int=0) -> SearchWordMatchesHandler:
+    rng = random.Random(seed)
+    entry_pool = []
+    for i in range(num_search_words // 2):
+        entry_dict = copy.deepcopy(base_entry_dicts[i % len(base_entry_dicts)])
+        entry_dict['word_representation']['writing'] = f'単語{i % (num_search_words // 3)}'
+        if i % 5 == 0:
+            entry_dict['meaning_section']['other_forms'] = None
+        entry_pool.append(DictionaryEntry.from_dict(entry_dict))
+    sw_matches_list = []
+    for i in range(num_search_words):
+        num_matches = 1 if rng.random() < 0.6 else rng.randint(2, 3)
+        sw_matches_list.append(
+            SearchWordMatches(
+                search_word=f'sw{i}',
+                matches=DictionaryEntryList([entry_pool[rng.randrange(len(entry_pool))] for _ in range(num_matches)]),
+                history_group_id=i
+            )
+        )
+    return SearchWordMatchesHandler(sw_matches_list)
+
+for num_search_words in [10000, 50000, 100000]:
+    handler = make_handler(num_search_words)
+    unique, non_unique = handler.unique, handler.non_unique
+    for unique_mode, non_unique_mode in [(0, 1), (0, 2), (2, 2)]:
+        entry_match_list = DictionaryEntryMatchList()
+        t0 = time.time()
+        entry_match_list.add_pruned_matches(handler=unique, mode=unique_mode, show_pbar=False)
+        entry_match_list.add_pruned_matches(handler=non_unique, mode=non_unique_mode, show_pbar=False)
+        elapsed = time.time() - t0
+        assert sum([len(item.search_words) for item in entry_match_list]) == num_search_words
+        logger.cyan(
+            f'{num_search_words} search words, modes ({unique_mode}, {non_unique_mode}): '
+            f'{len(entry_match_list)} entries in {round(elapsed, 3)}s'
+        )
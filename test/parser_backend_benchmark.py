@@ -0,0 +1,38 @@
+import os
+import glob
+import time
+from logger import logger
+from jp_dict.parsing.jisho.jisho_structs import JishoSearchHtmlParser
+from jp_dict.parsing.kotobank.kotobank_structs import KotobankWordHtmlParser
+from jp_dict.parsing.util.soup_utils import html_parser_backends
+
+# Compares the per-page parse time of each backend on the fixture pages, and checks that the outputs are identical.
+# Real pages carry far more navigation, scripts and footer markup than the fixtures,
+# so every page is also measured with extra markup outside of the parsed area.
+test_dir = os.path.dirname(os.path.abspath(__file__))
+num_repeats = 20
+padding = ''.join([f'<div class="footer-links"><ul>{"<li><a href=/x>link</a></li>" * 20}</ul></div>' for i in range(200)]).encode('utf-8')
+
+def parse_jisho(html: bytes, backend: str) -> dict:
+    return JishoSearchHtmlParser.from_html(html, url='https://jisho.org/search/fixture', backend=backend).parse(history_group_id=0).to_dict()
+
+def parse_kotobank(html: bytes, backend: str) -> dict:
+    return KotobankWordHtmlParser.from_html(html, url='https://kotobank.jp/word/fixture', backend=backend).parse().to_dict()
+
+cases = [(path, parse_jisho) for path in sorted(glob.glob(f'{test_dir}/jisho/fixtures/*.html'))] \
+    + [(path, parse_kotobank) for path in sorted(glob.glob(f'{test_dir}/kotobank/fixtures/*.html'))]
+for path, parse_func in cases:
+    html = open(path, 'rb').read()
+    for padded in [False, True]:
+        page = html.replace(b'</body>', padding + b'</body>') if padded else html
+        outputs = {}
+        times = {}
+        for backend in html_parser_backends:
+            t0 = time.time()
+            for i in range(num_repeats):
+                outputs[backend] = parse_func(page, backend)
+            times[backend] = (time.time() - t0) / num_repeats
+        for backend in html_parser_backends:
+            assert outputs[backend] == outputs['html.parser'], f'{backend} output differs for {path}'
+        time_str = ', '.join([f'{backend}: {round(times[backend] * 1000, 2)}ms' for backend in html_parser_backends])
+        logger.cyan(f"{os.path.basename(path)}{' (padded)' if padded else ''} {round(len(page) / 1024, 1)}KB - {time_str}")
@@ -0,0 +1,164 @@
+import os
+import time
+import shutil
+import threading
+from logger import logger
+from jp_dict.parsing.pipeline import PipelineStage, Pipeline
+
+# Runs a small pipeline of file stages and checks the dependency order, when stages are skipped,
+# and how forced, ignored and failing stages are reported.
+work_dir = 'pipeline_test'
+events = []
+events_lock = threading.Lock()
+fail_stages = set()
+prefix = 'count: '
+
+def read(name: str) -> str:
+    return open(f'{work_dir}/{name}', 'r').read()
+
+def write(name: str, text: str):
+    with open(f'{work_dir}/{name}', 'w') as f:
+        f.write(text)
+
+def stage_func(name: str, func):
+    def run(force: bool):
+        with events_lock:
+            events.append(('start', name, force))
+        time.sleep(0.1)
+        if name in fail_stages:
+            raise RuntimeError(f'{name} failed')
+        func()
+        with events_lock:
+            events.append(('end', name, force))
+    return run
+
+def append_extra():
+    # Like combine_chrome_history, a later stage that adds to the output of an earlier stage.
+    if not read('a.txt').endswith('+extra'):
+        write('a.txt', read('a.txt') + '+extra')
+
+def write_other():
+    os.makedirs(f'{work_dir}/other', exist_ok=True)
+    write('other/d.txt', read('other_src.txt')[::-1])
+
+def get_pipeline() -> Pipeline:
+    return Pipeline(
+        stages=[
+            PipelineStage(name='load', func=stage_func('load', lambda: write('a.txt', read('src.txt').upper())), inputs=[f'{work_dir}/src.txt'], outputs=[f'{work_dir}/a.txt']),
+            PipelineStage(name='append', func=stage_func('append', append_extra), inputs=[None], outputs=[f'{work_dir}/a.txt']),
+            PipelineStage(name='count', func=stage_func('count', lambda: write('b.txt', str(len(read('a.txt'))))), inputs=[f'{work_dir}/a.txt'], outputs=[f'{work_dir}/b.txt']),
+            PipelineStage(name='report', func=stage_func('report', lambda: write('c.txt', prefix + read('b.txt'))), inputs=[f'{work_dir}/b.txt'], outputs=[f'{work_dir}/c.txt'], params={'prefix': prefix}),
+            PipelineStage(name='other', func=stage_func('other', write_other), inputs=[f'{work_dir}/other_src.txt'], outputs=[f'{work_dir}/other'])
+        ],
+        state_path=f'{work_dir}/state.json'
+    )
+
+def run(expected_statuses: dict, force: list=None, ignore: list=None) -> list:
+    events.clear()
+    report_list = get_pipeline().run(force=force, ignore=ignore)
+    statuses = {report.name: report.status for report in report_list}
+    assert statuses == expected_statuses, statuses
+    return list(events)
+
+def check_order(run_events: list, dependencies: dict):
+    positions = {(event, name): i for i, (event, name, _) in enumerate(run_events)}
+    for name, dep_names in dependencies.items():
+        for dep_name in dep_names:
+            if ('start', name) in positions and ('end', dep_name) in positions:
+                assert positions[('end', dep_name)] < positions[('start', name)], (dep_name, name)
+
+shutil.rmtree(work_dir, ignore_errors=True)
+os.makedirs(work_dir)
+write('src.txt', 'abc')
+write('other_src.txt', 'xyz')
+
+dependencies = get_pipeline().get_dependencies()
+assert dependencies == {'load': [], 'append': ['load'], 'count': ['load', 'append'], 'report': ['count'], 'other': []}, dependencies
+
+all_ran = {'load': 'ran', 'append': 'ran', 'count': 'ran', 'report': 'ran', 'other': 'ran'}
+all_hit = {name: 'hit' for name in all_ran.keys()}
+run_events = run(all_ran)
+check_order(run_events, dependencies)
+# The independent stage runs alongside the first stage.
+assert run_events.index(('start', 'other', False)) < run_events.index(('end', 'load', False))
+assert read('c.txt') == 'count: 9'
+
+# The appended output of load is recorded, so nothing reruns.
+assert run(all_hit) == []
+
+# A newer mtime with the same content is still a hit.
+os.utime(f'{work_dir}/src.txt', ns=(time.time_ns() + 10**9, time.time_ns() + 10**9))
+run(all_hit)
+
+# Same length, so the output of count doesn't change and report is skipped.
+write('src.txt', 'abd')
+run_events = run({'load': 'ran', 'append': 'ran', 'count': 'ran', 'report': 'hit', 'other': 'hit'})
+check_order(run_events, dependencies)
+assert read('a.txt') == 'ABD+extra'
+
+# A longer input changes every stage after it.
+write('src.txt', 'abcd')
+run({'load': 'ran', 'append': 'ran', 'count': 'ran', 'report': 'ran', 'other': 'hit'})
+assert read('c.txt') == 'count: 10'
+
+# Params and missing outputs
+prefix = 'length: '
+run({'load': 'hit', 'append': 'hit', 'count': 'hit', 'report': 'ran', 'other': 'hit'})
+assert read('c.txt') == 'length: 10'
+os.remove(f'{work_dir}/c.txt')
+run({'load': 'hit', 'append': 'hit', 'count': 'hit', 'report': 'ran', 'other': 'hit'})
+write('other/e.txt', 'new file')
+run({'load': 'hit', 'append': 'hit', 'count': 'hit', 'report': 'hit', 'other': 'ran'})
+
+# Forced stages get force=True. The rest only run when their inputs changed.
+run_events = run({'load': 'hit', 'append': 'hit', 'count': 'forced', 'report': 'hit', 'other': 'hit'}, force=['count'])
+assert run_events == [('start', 'count', True), ('end', 'count', True)]
+
+# Ignored stages don't run, so the stages after them only see what is already on disk.
+write('src.txt', 'abcde')
+run({'load': 'ignored', 'append': 'hit', 'count': 'hit', 'report': 'hit', 'other': 'hit'}, ignore=['load'])
+run({'load': 'ran', 'append': 'ran', 'count': 'ran', 'report': 'ran', 'other': 'hit'})
+assert read('c.txt') == 'length: 11'
+
+# A failed stage blocks the stages that depend on it, raises after the other stages finish,
+# and runs again the next time.
+write('src.txt', 'abcdef')
+fail_stages.add('count')
+events.clear()
+try:
+    get_pipeline().run()
+    assert False, 'the failed stage should raise'
+except RuntimeError:
+    pass
+started_names = [name for event, name, _ in events if event == 'start']
+assert 'count' in started_names and 'report' not in started_names, started_names
+fail_stages.clear()
+run({'load': 'hit', 'append': 'hit', 'count': 'ran', 'report': 'ran', 'other': 'hit'})
+assert read('c.txt') == 'length: 12'
+
+# A change in a force input runs the stage with force=True, a change in its other inputs doesn't.
+# Without a record, every input is new, so the first run is forced too.
+write('ext.txt', 'ext')
+ext_pipeline = lambda: Pipeline(
+    stages=[
+        PipelineStage(
+            name='ext', func=stage_func('ext', lambda: write('f.txt', read('a.txt') + read('ext.txt'))),
+            inputs=[f'{work_dir}/a.txt', f'{work_dir}/ext.txt'], outputs=[f'{work_dir}/f.txt'], force_inputs=[f'{work_dir}/ext.txt']
+        )
+    ],
+    state_path=f'{work_dir}/ext_state.json'
+)
+for update, expected_event in [
+    (lambda: None, ('start', 'ext', True)),
+    (lambda: write('ext.txt', 'ext2'), ('start', 'ext', True)),
+    (lambda: write('a.txt', 'changed'), ('start', 'ext', False))
+]:
+    update()
+    events.clear()
+    ext_pipeline().run()
+    assert events[0] == expected_event, (events, expected_event)
+events.clear()
+ext_pipeline().run()
+assert events == []
+shutil.rmtree(work_dir)
+logger.green('pipeline: ok')
@@ -0,0 +1,53 @@
+import os
+import copy
+import time
+import random
+from logger import logger
+from jp_dict.parsing.jisho.jisho_structs import JishoSearchHtmlParser
+from jp_dict.parsing.jisho.jisho_matches import DictionaryEntryMatch
+from jp_dict.parsing.combined.combined_structs import CombinedResult, CombinedResultList
+
+# Compares recommended_sort with the five stable sorts it replaced, and checks that the
+# top-k selection gives the head of the full order.
+fixture_path = f'{os.path.dirname(os.path.abspath(__file__))}/../jisho/fixtures/multiple_results.html'
+entry = JishoSearchHtmlParser.from_html(open(fixture_path, 'rb').read(), url='https://jisho.org/search/fixture').parse(history_group_id=0).exact_matches[0]
+num_results = 5000
+rng = random.Random(0)
+
+def old_recommended_sort(results: CombinedResultList):
+    results.sort(attr_name='first_search_localtime')
+    results.sort_by_wanikani(wanikani_first=True, reverse=False)
+    results.sort_by_jlpt(jlpt_first=True, reverse=True)
+    results.sort(attr_name='is_common_word', reverse=True)
+    results.sort(attr_name='search_word_hit_count', reverse=True)
+
+results = CombinedResultList()
+for i in range(num_results):
+    entry_match = DictionaryEntryMatch(id=i, entry=copy.deepcopy(entry), search_words=[f'単語{i}'], history_group_id_list=[i])
+    entry_match.entry.word_representation.writing = f'単語{i}'
+    concept_labels = entry_match.entry.concept_labels
+    concept_labels.is_common = rng.random() < 0.5
+    concept_labels.jlpt_level = rng.choice([None, None, 1, 2, 3, 4, 5])
+    concept_labels.wanikani_level = rng.choice([None, None, None] + list(range(1, 61)))
+    # Few distinct hit counts and times, so that every tiebreak is exercised.
+    entry_match.search_words_time_usec = {f'単語{i}': [1600000000000000 + rng.randrange(50) * 10**6 for _ in range(rng.randint(1, 4))]}
+    results.append(CombinedResult(jisho_result=entry_match))
+
+old_results = CombinedResultList(list(results.obj_list))
+t0 = time.time()
+old_recommended_sort(old_results)
+logger.cyan(f'{num_results} results: sequential stable sorts in {round(time.time() - t0, 3)}s')
+
+new_results = CombinedResultList(list(results.obj_list))
+t0 = time.time()
+new_results.recommended_sort()
+logger.cyan(f'{num_results} results: composite key sort in {round(time.time() - t0, 3)}s')
+assert [result.id for result in new_results] == [result.id for result in old_results]
+
+for k in [0, 1, 100, num_results, num_results + 10]:
+    t0 = time.time()
+    top_k = results.get_recommended_top_k(k)
+    elapsed = time.time() - t0
+    assert [result.id for result in top_k] == [result.id for result in old_results][:k]
+    if k == 100:
+        logger.cyan(f'top {k} of {num_results} in {round(elapsed, 3)}s')